@@ -23,13 +23,15 @@ import numpy as np
 from rlgraph import get_backend
 from rlgraph.components import Component, Exploration, PreprocessorStack, Synchronizable, Policy, Optimizer, \
     ContainerMerger, ContainerSplitter
+from rlgraph.agents.observe_buffer import ObserveBuffer
 from rlgraph.graphs.graph_builder import GraphBuilder
 from rlgraph.graphs.graph_executor import GraphExecutor
 from rlgraph.spaces import Space, ContainerSpace
 from rlgraph.utils.decorators import rlgraph_api, graph_fn
 from rlgraph.utils.input_parsing import parse_execution_spec, parse_observe_spec, parse_update_spec, \
     parse_value_function_spec
-from rlgraph.utils.ops import flatten_op
+from rlgraph.utils.ops import flatten_op, unflatten_op
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.specifiable import Specifiable
 
 if get_backend() == "tf":
@@ -173,6 +175,8 @@ class Agent(Specifiable):
         self.terminals_buffer = defaultdict(list)
 
         self.observe_spec = parse_observe_spec(observe_spec)
+        # Array-backed buffers for `observe_envs`, created on first use.
+        self.observe_buffer = None
 
         # Global time step counter.
         self.timesteps = 0
@@ -341,7 +345,12 @@ class Agent(Specifiable):
         """
         Builds the internal graph from the RLGraph meta-graph via the graph executor..
         """
-        return self.graph_executor.build(root_components, input_spaces, **kwargs)
+        build_result = self.graph_executor.build(root_components, input_spaces, **kwargs)
+
+        # Sample ahead from the memory while updates run.
+        if self.update_spec["prefetch_batches"] > 0 and getattr(self, "memory", None) is not None:
+            self.memory.start_prefetching(self.update_spec["batch_size"], self.update_spec["prefetch_batches"])
+        return build_result
 
     def build(self, build_options=None):
         """
@@ -530,14 +539,91 @@ class Agent(Specifiable):
                 self.reset_env_buffers(env_id)
         else:
             if not batched:
-                preprocessed_states, _ = self.preprocessed_state_space.force_batch(preprocessed_states)
-                next_states, _ = self.preprocessed_state_space.force_batch(next_states)
-                actions, _ = self.action_space.force_batch(actions)
+                preprocessed_states = self._force_batch(self.preprocessed_state_space, preprocessed_states)
+                next_states = self._force_batch(self.preprocessed_state_space, next_states)
+                actions = self._force_batch(self.action_space, actions)
                 rewards = [rewards]
                 terminals = [terminals]
 
             self._observe_graph(preprocessed_states, actions, internals, rewards, next_states, terminals)
 
+    def observe_envs(self, preprocessed_states, actions, internals, rewards, next_states, terminals, env_ids):
+        """
+        Observes one experience tuple for each of several environments at once. With buffering enabled, records
+        are written into array-backed per-environment buffers and the buffer of an environment is sent through
+        the graph once it is full or reaches a terminal (see `observe`).
+
+        Args:
+            preprocessed_states (Union[dict,ndarray,list]): Batch of preprocessed states (one per environment),
+                or a list of per-environment states.
+            actions (Union[dict,ndarray,list]): Batch of actions or list of per-environment actions.
+            internals (Optional[list]): Internal states. Must be empty, not supported by the buffers.
+            rewards (Union[ndarray,list]): One reward per environment.
+            next_states (Union[dict,ndarray,list]): Batch of preprocessed next states or list of per-environment
+                next states.
+            terminals (Union[ndarray,list]): One terminal flag per environment.
+            env_ids (List[str]): Environment ids, one per record.
+        """
+        if internals:
+            raise RLGraphError("`observe_envs` does not support internal states, use `observe` instead.")
+
+        if self.observe_spec["buffer_enabled"] is False:
+            if isinstance(preprocessed_states, list):
+                preprocessed_states = self._stack(self.preprocessed_state_space, preprocessed_states)
+                next_states = self._stack(self.preprocessed_state_space, next_states)
+            if isinstance(actions, list):
+                actions = self._stack(self.action_space, actions)
+            self._observe_graph(preprocessed_states, actions, [], rewards, next_states, terminals)
+            return
+
+        if self.observe_buffer is None:
+            self.observe_buffer = ObserveBuffer(
+                self.observe_spec["buffer_size"], self.preprocessed_state_space, self.action_space
+            )
+        buffer = self.observe_buffer
+        rows = buffer.get_rows(env_ids)
+        flush_rows = buffer.add(rows, preprocessed_states, actions, rewards, next_states, terminals)
+        for row in flush_rows:
+            states_, actions_, rewards_, next_states_, terminals_ = buffer.get_records(row)
+            if not terminals_[-1]:
+                self.logger.warning(
+                    "Buffer of size {} of Agent '{}' may be too small! Had to add artificial terminal=True "
+                    "to end.".format(self.observe_spec["buffer_size"], self)
+                )
+                terminals_[-1] = True
+            self._observe_graph(
+                preprocessed_states=states_, actions=actions_, internals=[], rewards=rewards_,
+                next_states=next_states_, terminals=terminals_
+            )
+            buffer.reset(row)
+
+    @staticmethod
+    def _force_batch(space, sample):
+        """
+        Adds a batch rank of 1 to an unbatched sample (as `space.force_batch`), without copying Box samples.
+        """
+        if isinstance(space, ContainerSpace):
+            return space.force_batch(sample)[0]
+        sample = np.asarray(sample)
+        if sample.ndim == len(space.shape):
+            return sample[np.newaxis]
+        return sample
+
+    @staticmethod
+    def _stack(space, samples):
+        """
+        Stacks a list of per-environment samples into one batch. Container samples (nested Dicts and Tuples)
+        are stacked per primitive sub-space.
+        """
+        if isinstance(space, ContainerSpace):
+            flat_samples = [flatten_op(sample) for sample in samples]
+            return unflatten_op({
+                key: Agent._stack(sub_space, [sample[key] for sample in flat_samples])
+                for key, sub_space in space.flatten().items()
+            })
+        # Per-environment samples may come with a batch rank of 1.
+        return np.stack([np.reshape(sample, space.shape) for sample in samples])
+
     def _observe_graph(self, preprocessed_states, actions, internals, rewards, next_states, terminals):
         """
         This methods defines the actual call to the computational graph by executing
@@ -633,6 +719,8 @@ class Agent(Specifiable):
         Things that need to be cleaned up should be placed into this function, e.g. closing sessions
         and other open connections.
         """
+        if getattr(self, "memory", None) is not None:
+            self.memory.stop_prefetching()
         self.graph_executor.terminate()
 
     def call_api_method(self, op, inputs=None, return_ops=None):
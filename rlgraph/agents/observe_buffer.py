@@ -0,0 +1,153 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import numpy as np
+
+from rlgraph.spaces import ContainerSpace
+from rlgraph.utils import util
+from rlgraph.utils.ops import flatten_op
+
+
+class ObserveBuffer(object):
+    """
+    Array-backed per-environment experience buffers for `Agent.observe_envs`.
+
+    Each buffered value is stored in one [num_envs, buffer_size, ...] array with one write position per
+    environment. One time step of several environments is written with a single (fancy-indexed) assignment per
+    value, and the records of an environment are read back as slices of its row.
+    """
+    def __init__(self, buffer_size, state_space, action_space):
+        """
+        Args:
+            buffer_size (int): Maximum number of records per environment.
+            state_space (Space): The preprocessed state space.
+            action_space (Space): The action space.
+        """
+        self.buffer_size = buffer_size
+        self.state_space = state_space
+        self.action_space = action_space
+        self.flat_state_space = state_space.flatten(scope_separator_at_start=False) \
+            if isinstance(state_space, ContainerSpace) else None
+        self.flat_action_space = action_space.flatten() if isinstance(action_space, ContainerSpace) else None
+
+        # Env id -> row.
+        self.env_rows = {}
+        self.positions = np.zeros(shape=(0,), dtype=np.int64)
+        self.states = self._allocate(self.flat_state_space or state_space, 0)
+        self.next_states = self._allocate(self.flat_state_space or state_space, 0)
+        self.actions = self._allocate(self.flat_action_space or action_space, 0)
+        self.rewards = np.zeros(shape=(0, buffer_size))
+        self.terminals = np.zeros(shape=(0, buffer_size), dtype=np.bool_)
+
+    def _allocate(self, space, num_rows):
+        if isinstance(space, dict):
+            return {key: self._allocate(sub_space, num_rows) for key, sub_space in space.items()}
+        return np.zeros(
+            shape=(num_rows, self.buffer_size) + tuple(space.shape), dtype=util.convert_dtype(space.dtype, to="np")
+        )
+
+    def get_rows(self, env_ids):
+        """
+        Returns:
+            np.ndarray: The buffer row of each environment. Rows for new environments are added.
+        """
+        new_env_ids = [env_id for env_id in env_ids if env_id not in self.env_rows]
+        if len(new_env_ids) > 0:
+            num_rows = len(self.env_rows)
+            for i, env_id in enumerate(new_env_ids):
+                self.env_rows[env_id] = num_rows + i
+            self._grow(len(new_env_ids))
+        return np.array([self.env_rows[env_id] for env_id in env_ids])
+
+    def _grow(self, num_new_rows):
+        def grow(array):
+            if isinstance(array, dict):
+                return {key: grow(value) for key, value in array.items()}
+            return np.concatenate([array, np.zeros(shape=(num_new_rows,) + array.shape[1:], dtype=array.dtype)])
+
+        self.positions = grow(self.positions)
+        self.states = grow(self.states)
+        self.next_states = grow(self.next_states)
+        self.actions = grow(self.actions)
+        self.rewards = grow(self.rewards)
+        self.terminals = grow(self.terminals)
+
+    def add(self, rows, states, actions, rewards, next_states, terminals):
+        """
+        Writes one record for each of the given rows.
+
+        Args:
+            rows (np.ndarray): Buffer rows (see `get_rows`), each at most once.
+            states (Union[np.ndarray,dict,list]): Batch of states (or list of per-environment states).
+            actions (Union[np.ndarray,dict,list]): Batch of actions (or list of per-environment actions).
+            rewards (Union[np.ndarray,list]): Rewards.
+            next_states (Union[np.ndarray,dict,list]): Batch of next states (or list of per-environment states).
+            terminals (Union[np.ndarray,list]): Terminal flags.
+
+        Returns:
+            np.ndarray: The rows which are full or reached a terminal and have to be flushed.
+        """
+        positions = self.positions[rows]
+        self._write(self.states, rows, positions, states, self.flat_state_space, False)
+        self._write(self.next_states, rows, positions, next_states, self.flat_state_space, False)
+        self._write(self.actions, rows, positions, actions, self.flat_action_space, True)
+        self.rewards[rows, positions] = rewards
+        self.terminals[rows, positions] = terminals
+        self.positions[rows] = positions + 1
+        return rows[self.terminals[rows, positions] | (positions + 1 >= self.buffer_size)]
+
+    @staticmethod
+    def _write(arrays, rows, positions, values, flat_space, scope_separator_at_start):
+        def write(array, value):
+            # Per-environment samples may come with a batch rank of 1.
+            array[rows, positions] = np.reshape(value, (len(rows),) + array.shape[2:])
+
+        if flat_space is None:
+            write(arrays, values)
+        elif isinstance(values, (list, tuple)):
+            # Per-environment containers.
+            values = [flatten_op(value, scope_separator_at_start=scope_separator_at_start) for value in values]
+            for key, array in arrays.items():
+                write(array, [value[key] for value in values])
+        else:
+            values = flatten_op(values, scope_separator_at_start=scope_separator_at_start)
+            for key, array in arrays.items():
+                write(array, values[key])
+
+    def get_records(self, row):
+        """
+        Returns:
+            tuple: States, actions, rewards, next states and terminals of a row as slices of the buffer.
+        """
+        position = self.positions[row]
+
+        def read(array):
+            if isinstance(array, dict):
+                return {key: value[row, :position] for key, value in array.items()}
+            return array[row, :position]
+
+        return read(self.states), read(self.actions), read(self.rewards), read(self.next_states), \
+            read(self.terminals)
+
+    def reset(self, row=None):
+        """
+        Discards the records of one row (or all rows if None).
+        """
+        if row is None:
+            self.positions[:] = 0
+        else:
+            self.positions[row] = 0
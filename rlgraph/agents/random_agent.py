@@ -30,7 +30,7 @@ class RandomAgent(Agent):
 
     def get_action(self, states, internals=None, use_exploration=False, apply_preprocessing=True, extra_returns=None,
                    time_percentage=None):
-        a = self.action_space_batched.sample(size=len(states[0]))
+        a = self.action_space_batched.sample(size=len(states))
         if extra_returns is not None and "preprocessed_states" in extra_returns:
             return a, states
         else:
@@ -1230,6 +1230,14 @@ class Component(Specifiable):
             # PyTorchVariable is used to store torch parameters (e.g. layers).
             if isinstance(variable, PyTorchVariable):
                 return variable.get_value()
+            # Preallocated tensors (e.g. memories) hold one row per index.
+            elif isinstance(variable, torch.Tensor):
+                if indices is None:
+                    return variable
+                if TraceContext.DEFINE_BY_RUN_CONTEXT == "building" and shape is not None and len(indices) == 0:
+                    return torch.zeros(shape, dtype=dtype)
+                values = variable.index_select(0, torch.as_tensor(indices, dtype=torch.long))
+                return values if dtype is None else values.to(dtype)
             # Lists or numpy arrays may be used to store mutable state that does not need
             # tensor operations.
             elif isinstance(variable, list) or isinstance(variable, np.ndarray):
@@ -18,6 +18,7 @@ from __future__ import division
 from __future__ import print_function
 
 from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree
+from rlgraph.components.helpers.replay_prefetcher import ReplayPrefetcher
 from rlgraph.components.helpers.segment_tree import SegmentTree
 from rlgraph.components.helpers.softmax import SoftMax
 from rlgraph.components.helpers.v_trace_function import VTraceFunction
@@ -26,5 +27,5 @@ from rlgraph.components.helpers.clipping import Clipping
 from rlgraph.components.helpers.generalized_advantage_estimation import GeneralizedAdvantageEstimation
 
 
-__all__ = ["MemSegmentTree", "SegmentTree", "SoftMax", "VTraceFunction", "SequenceHelper",
+__all__ = ["MemSegmentTree", "ReplayPrefetcher", "SegmentTree", "SoftMax", "VTraceFunction", "SequenceHelper",
            "GeneralizedAdvantageEstimation", "Clipping"]
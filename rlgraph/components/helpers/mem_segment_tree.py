@@ -19,8 +19,17 @@ from __future__ import print_function
 
 import operator
 
+import numpy as np
+
 from rlgraph.utils.rlgraph_errors import RLGraphError
 
+# Maps the python reduce ops supported by the tree to their element-wise numpy counterparts.
+_NUMPY_REDUCE_OPS = {
+    operator.add: np.add,
+    min: np.minimum,
+    max: np.maximum
+}
+
 
 class MemSegmentTree(object):
     """
@@ -29,6 +38,10 @@ class MemSegmentTree(object):
     Note: The pure TensorFlow segment tree is much slower because variable updating is expensive,
     and in scenarios like Ape-X, memory and update are separated processes, so there is little to be gained
     from inserting into the graph.
+
+    The tree is stored in a flat numpy array. Besides the scalar `insert` and `index_of_prefixsum`
+    methods, `insert_batch` and `index_of_prefixsum_batch` process whole batches level by level
+    so the per-element Python loop is replaced by one vectorized op per tree level.
     """
 
     def __init__(
@@ -41,13 +54,17 @@ class MemSegmentTree(object):
         Helper to represent a segment tree.
 
         Args:
-            values (list): Storage for the segment tree.
-            capacity (int): Capacity of segment tree.
+            values (Union[list,np.ndarray]): Storage for the segment tree. Will be converted to a float numpy
+                array of length 2 * capacity.
+            capacity (int): Capacity of segment tree. Must be a power of 2.
             operator (callable): Reduce operation of the segment tree.
         """
-        self.values = values
+        self.values = np.asarray(values, dtype=np.float64)
         self.capacity = capacity
         self.operator = operator
+        if self.operator not in _NUMPY_REDUCE_OPS:
+            raise RLGraphError("Unsupported segment tree operator. Supported ops are [add, min, max].")
+        self.np_operator = _NUMPY_REDUCE_OPS[self.operator]
 
     def insert(self, index, element):
         """
@@ -72,6 +89,32 @@ class MemSegmentTree(object):
             )
             index = index >> 1
 
+    def insert_batch(self, indices, elements):
+        """
+        Inserts a batch of elements into the segment tree. Parent nodes are recomputed level by level
+        for all affected positions at once.
+
+        If an index occurs more than once, the last element for that index is kept, matching
+        a sequence of `insert` calls.
+
+        Args:
+            indices (Union[list,np.ndarray]): Insertion indices.
+            elements (Union[list,np.ndarray]): Elements to insert, one per index.
+        """
+        indices = np.asarray(indices, dtype=np.int64) + self.capacity
+        if indices.size == 0:
+            return
+        self.values[indices] = elements
+
+        indices = np.unique(indices >> 1)
+        while indices[0] >= 1:
+            update_indices = 2 * indices
+            self.values[indices] = self.np_operator(
+                self.values[update_indices],
+                self.values[update_indices + 1]
+            )
+            indices = np.unique(indices >> 1)
+
     def get(self, index):
         """
         Reads an item from the segment tree.
@@ -84,6 +127,18 @@ class MemSegmentTree(object):
         """
         return self.values[self.capacity + index]
 
+    def get_batch(self, indices):
+        """
+        Reads a batch of items from the segment tree.
+
+        Args:
+            indices (Union[list,np.ndarray]): Indices to read.
+
+        Returns:
+            np.ndarray: The elements.
+        """
+        return self.values[self.capacity + np.asarray(indices, dtype=np.int64)]
+
     def index_of_prefixsum(self, prefix_sum):
         """
         Identifies the highest index which satisfies the condition that the sum
@@ -107,6 +162,32 @@ class MemSegmentTree(object):
                 index = update_index + 1
         return index - self.capacity
 
+    def index_of_prefixsum_batch(self, prefix_sums):
+        """
+        Vectorized version of `index_of_prefixsum`: Descends the tree for all prefix sums at once,
+        one level per iteration.
+
+        Args:
+            prefix_sums (Union[list,np.ndarray]): Upper bounds on the prefixes we are allowed to select.
+
+        Returns:
+            np.ndarray: Indices satisfying the prefix sum condition, one per prefix sum.
+        """
+        prefix_sums = np.array(prefix_sums, dtype=np.float64)
+        assert np.all(prefix_sums >= 0) and np.all(prefix_sums <= self.get_sum() + 1e-5)
+        indices = np.ones_like(prefix_sums, dtype=np.int64)
+
+        # All leaves are at the same depth because capacity is a power of 2.
+        level_capacity = 1
+        while level_capacity < self.capacity:
+            update_indices = 2 * indices
+            left_values = self.values[update_indices]
+            go_right = left_values <= prefix_sums
+            prefix_sums -= np.where(go_right, left_values, 0.0)
+            indices = update_indices + go_right
+            level_capacity *= 2
+        return indices - self.capacity
+
     def reduce(self, start, limit, reduce_op=operator.add):
         """
         Applies an operation to specified segment.
@@ -173,6 +254,12 @@ class MinSumSegmentTree(object):
             min_tree,
             capacity,
     ):
+        """
+        Args:
+            sum_tree (MemSegmentTree): Segment tree using the add operator.
+            min_tree (MemSegmentTree): Segment tree using the min operator.
+            capacity (int): Capacity of both segment trees.
+        """
         self.sum_segment_tree = sum_tree
         self.min_segment_tree = min_tree
         self.capacity = capacity
@@ -198,3 +285,27 @@ class MinSumSegmentTree(object):
             self.min_segment_tree.values[index] = min(self.min_segment_tree.values[update_index],
                                                       self.min_segment_tree.values[update_index + 1])
             index = index >> 1
+
+    def insert_batch(self, indices, elements):
+        """
+        Inserts a batch of elements into both segment trees, updating each tree level once for
+        all affected positions.
+
+        Args:
+            indices (Union[list,np.ndarray]): Insertion indices.
+            elements (Union[list,np.ndarray]): Elements to insert, one per index.
+        """
+        indices = np.asarray(indices, dtype=np.int64) + self.capacity
+        if indices.size == 0:
+            return
+        sum_values = self.sum_segment_tree.values
+        min_values = self.min_segment_tree.values
+        sum_values[indices] = elements
+        min_values[indices] = elements
+
+        indices = np.unique(indices >> 1)
+        while indices[0] >= 1:
+            update_indices = 2 * indices
+            sum_values[indices] = sum_values[update_indices] + sum_values[update_indices + 1]
+            min_values[indices] = np.minimum(min_values[update_indices], min_values[update_indices + 1])
+            indices = np.unique(indices >> 1)
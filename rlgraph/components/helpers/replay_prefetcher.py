@@ -0,0 +1,100 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+from threading import Thread, Lock, Event
+
+from six.moves import queue
+
+
+class ReplayPrefetcher(object):
+    """
+    Samples batches from an in-memory replay ahead of time on a background thread.
+
+    The sampling thread pushes into a bounded queue, so at most `num_batches` batches are ever
+    sampled ahead of the consumer. Memory reads of the sampling thread and memory writes
+    (inserts, priority updates) must all hold `lock`.
+    """
+    # Seconds to wait before polling a memory which cannot serve a batch yet.
+    POLL_INTERVAL = 0.001
+
+    def __init__(self, sample_fn, num_records, num_batches=2):
+        """
+        Args:
+            sample_fn (callable): Called with `num_records` while holding `lock`. Returns a sampled batch
+                or None if the memory cannot serve a batch yet.
+            num_records (int): Number of records per prefetched batch.
+            num_batches (int): Maximum number of batches sampled ahead.
+        """
+        self.sample_fn = sample_fn
+        self.num_records = num_records
+        self.num_batches = num_batches
+
+        self.lock = Lock()
+        self.queue = queue.Queue(maxsize=num_batches)
+        self.stopped = Event()
+        self.thread = Thread(target=self._run)
+        # Terminate when host process terminates.
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            with self.lock:
+                batch = self.sample_fn(self.num_records)
+            if batch is None:
+                time.sleep(self.POLL_INTERVAL)
+                continue
+            # Blocks while `num_batches` batches are waiting (backpressure).
+            while not self.stopped.is_set():
+                try:
+                    self.queue.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def get(self):
+        """
+        Returns:
+            Optional[any]: The oldest prefetched batch or None if no batch is ready.
+        """
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def stop(self):
+        """
+        Stops the sampling thread and discards all prefetched batches.
+        """
+        self.stopped.set()
+        self.thread.join()
+        while self.get() is not None:
+            pass
+
+
+class NoLock(object):
+    """
+    Stands in for the prefetcher lock while no prefetcher is running.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
@@ -27,6 +27,7 @@ from rlgraph.components.layers.preprocessing.preprocess_layer import PreprocessL
 from rlgraph.spaces.space_utils import sanity_check_space
 from rlgraph.utils.decorators import rlgraph_api
 from rlgraph.utils.ops import FlattenedDataOp, unflatten_op
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.util import get_rank, force_list
 
 if get_backend() == "tf":
@@ -72,13 +73,18 @@ class Sequence(PreprocessLayer):
         else:
             self.out_data_format = out_data_format
 
-        # The sequence-buffer where we store previous inputs.
+        # The sequence-buffer where we store previous inputs (python: dict of ring-buffers per flat-key).
         self.buffer = None
         # The index into the buffer's.
         self.index = None
         # The output spaces after preprocessing (per flat-key).
         self.output_spaces = None
-        if self.backend == "python" or get_backend() == "python" or get_backend() == "pytorch":
+        # Python: Per flat-key, per batch-slot write position into the buffer (-1 = refill the slot with its next
+        # input).
+        self.slot_positions = None
+        # Python: Batch-slots the next call is restricted to (None for all slots).
+        self.active_slots = None
+        if get_backend() == "pytorch":
             self.deque = deque([], maxlen=self.sequence_length)
 
     def get_preprocessed_space(self, space):
@@ -111,7 +117,8 @@ class Sequence(PreprocessLayer):
         self.output_spaces = self.get_preprocessed_space(in_space)
         self.index = self.get_variable(name="index", dtype="int", initializer=-1, trainable=False)
 
-        if get_backend() == "tf":
+        # Python Sequences allocate their buffers (per flat-key) on the first call.
+        if get_backend() == "tf" and self.backend != "python":
             self.buffer = self.get_variable(
                 name="buffer", trainable=False, from_space=in_space,
                 add_batch_rank=self.batch_size if in_space.has_batch_rank is not False else False,
@@ -125,6 +132,63 @@ class Sequence(PreprocessLayer):
         elif get_backend() == "tf":
             return tf.variables_initializer([self.index])
 
+    def reset_slots(self, slots):
+        """
+        Python only: Resets the sequences of some batch-slots (e.g. the environments whose episode ended), leaving
+        the other slots untouched. The next input for a reset slot fills its entire sequence.
+
+        Args:
+            slots (Union[np.ndarray,List[int]]): The indices (or a boolean mask) of the batch-slots to reset.
+        """
+        if self.slot_positions is not None:
+            for slot_positions in self.slot_positions.values():
+                slot_positions[slots] = -1
+
+    def _python_sequence(self, key, inputs, after_reset):
+        """
+        Pushes a batch into the ring-buffer (of shape [sequence-length, batch, ...]) of one flat-key and gathers
+        the sequences (oldest first) of the pushed slots.
+
+        Args:
+            key (str): The flat-key of the inputs.
+            inputs (np.ndarray): One input per batch-slot or, if `self.active_slots` is set, one input per active
+                slot.
+            after_reset (bool): Whether this is the first call after `reset`.
+
+        Returns:
+            np.ndarray: The sequences of shape [len(inputs), ..., sequence-length] (added rank) or
+                [len(inputs), ..., last-dim * sequence-length] (concatenated).
+        """
+        buffer = self.buffer.get(key, None)
+        if self.active_slots is None:
+            if buffer is None or buffer.shape[1:] != inputs.shape:
+                buffer = self.buffer[key] = np.empty((self.sequence_length,) + inputs.shape, dtype=inputs.dtype)
+                self.slot_positions[key] = np.full(len(inputs), -1, dtype=np.int64)
+            elif after_reset:
+                self.slot_positions[key][:] = -1
+            slots = np.arange(len(inputs))
+        else:
+            if buffer is None or after_reset:
+                raise RLGraphError("Sequence must be called on all batch-slots before calling it on some of them.")
+            slots = np.arange(len(self.slot_positions[key]))[self.active_slots]
+
+        slot_positions = self.slot_positions[key]
+        positions = (slot_positions[slots] + 1) % self.sequence_length
+        buffer[positions, slots] = inputs
+        refill = slot_positions[slots] == -1
+        if np.any(refill):
+            buffer[:, slots[refill]] = inputs[refill]
+        slot_positions[slots] = positions
+
+        # Sequence item n of each slot sits n + 1 positions after the slot's last write.
+        order = (positions + 1 + np.arange(self.sequence_length)[:, np.newaxis]) % self.sequence_length
+        sequence = buffer[order, slots]
+        if self.add_rank:
+            return np.moveaxis(sequence, 0, -1)
+        # Concat the sequence items in the last rank.
+        else:
+            return np.concatenate(sequence, axis=-1)
+
     @rlgraph_api(flatten_ops=True, split_ops=False)
     def _graph_fn_call(self, inputs):
         """
@@ -141,24 +205,22 @@ class Sequence(PreprocessLayer):
         """
         # A normal (index != -1) assign op.
         if self.backend == "python" or get_backend() == "python":
-            if self.index == -1:
-                for _ in range_(self.sequence_length):
-                    self.deque.append(inputs)
-            else:
-                self.deque.append(inputs)
-            self.index = (self.index + 1) % self.sequence_length
-
-            if self.add_rank:
-                sequence = np.stack(self.deque, axis=-1)
-            # Concat the sequence items in the last rank.
-            else:
-                sequence = np.concatenate(self.deque, axis=-1)
-
-            # TODO move into transpose component.
-            if self.in_data_format == "channels_last" and self.out_data_format == "channels_first":
-                sequence = sequence.transpose((0, 3, 2, 1))
-
-            return sequence
+            if self.buffer is None:
+                self.buffer = {}
+                self.slot_positions = {}
+            after_reset = self.index == -1
+            sequences = FlattenedDataOp()
+            for key, value in (inputs.items() if isinstance(inputs, dict) else [("", inputs)]):
+                sequence = self._python_sequence(key, np.asarray(value), after_reset)
+
+                # TODO move into transpose component.
+                if self.in_data_format == "channels_last" and self.out_data_format == "channels_first":
+                    sequence = sequence.transpose((0, 3, 2, 1))
+                sequences[key] = sequence
+            if self.active_slots is None:
+                self.index = (self.index + 1) % self.sequence_length
+
+            return sequences if isinstance(inputs, dict) else sequences[""]
         elif get_backend() == "pytorch":
             if self.index == -1:
                 for _ in range_(self.sequence_length):
@@ -18,7 +18,6 @@ from __future__ import absolute_import, division, print_function
 import operator
 
 import numpy as np
-from six.moves import xrange as range_
 from rlgraph import get_backend
 from rlgraph.utils import util, DataOpDict
 from rlgraph.utils.define_by_run_ops import define_by_run_unflatten
@@ -38,11 +37,14 @@ class MemPrioritizedReplay(Memory):
     API:
         update_records(indices, update) -> Updates the given indices with the given priority scores.
     """
+    supports_prefetching = True
+
     def __init__(self, capacity=1000, next_states=True, alpha=1.0, beta=0.0):
         super(MemPrioritizedReplay, self).__init__()
 
-        self.memory_values = []
         self.index = 0
+        # Total number of inserted records, used to detect overwritten slots in prefetched batches.
+        self.num_inserted = 0
         self.capacity = capacity
 
         self.size = 0
@@ -60,9 +62,9 @@ class MemPrioritizedReplay(Memory):
             self.priority_capacity *= 2
 
         # Create segment trees, initialize with neutral elements.
-        sum_values = [0.0 for _ in range_(2 * self.priority_capacity)]
+        sum_values = np.zeros(shape=(2 * self.priority_capacity,))
         sum_segment_tree = MemSegmentTree(sum_values, self.priority_capacity, operator.add)
-        min_values = [float('inf') for _ in range_(2 * self.priority_capacity)]
+        min_values = np.full(shape=(2 * self.priority_capacity,), fill_value=float('inf'))
         min_segment_tree = MemSegmentTree(min_values, self.priority_capacity, min)
 
         self.merged_segment_tree = MinSumSegmentTree(
@@ -77,70 +79,89 @@ class MemPrioritizedReplay(Memory):
             return
         num_records = len(records[self.terminal_key])
 
+        with self._lock():
+            self._insert_records(records, num_records)
+
+        return None
+
+    def _insert_records(self, records, num_records):
+        insert_indices = np.arange(start=self.index, stop=self.index + num_records) % self.capacity
         if num_records == 1:
-            if self.index >= self.size:
-                self.memory_values.append(records)
-            else:
-                self.memory_values[self.index] = records
             self.merged_segment_tree.insert(self.index, self.default_new_weight)
         else:
-            insert_indices = np.arange(start=self.index, stop=self.index + num_records) % self.capacity
-            i = 0
-            for insert_index in insert_indices:
-                self.merged_segment_tree.insert(insert_index, self.default_new_weight)
-                record = {}
-                for name, record_values in records.items():
-                    record[name] = record_values[i]
-                if insert_index >= self.size:
-                    self.memory_values.append(record)
-                else:
-                    self.memory_values[insert_index] = record
-                i += 1
+            self.merged_segment_tree.insert_batch(
+                insert_indices, np.full(shape=(num_records,), fill_value=self.default_new_weight)
+            )
+        self._write_records(insert_indices, records)
 
         # Update indices
         self.index = (self.index + num_records) % self.capacity
         self.size = min(self.size + num_records, self.capacity)
-
-        return None
+        self.num_inserted += num_records
 
     @rlgraph_api
     def _graph_fn_get_records(self, num_records=1):
-        available_records = min(num_records, self.size)
-        indices = []
-        prob_sum = self.merged_segment_tree.sum_segment_tree.get_sum(0, self.size - 1)
-        samples = np.random.random(size=(available_records,)) * prob_sum
-        for sample in samples:
-            indices.append(self.merged_segment_tree.sum_segment_tree.index_of_prefixsum(prefix_sum=sample))
-
-        sum_prob = self.merged_segment_tree.sum_segment_tree.get_sum() + SMALL_NUMBER
-        min_prob = self.merged_segment_tree.min_segment_tree.get_min_value() / sum_prob
-        max_weight = (min_prob * self.size) ** (-self.beta)
-        weights = []
-        for index in indices:
-            sample_prob = self.merged_segment_tree.sum_segment_tree.get(index) / sum_prob
-            weight = (sample_prob * self.size) ** (-self.beta)
-            weights.append(weight / max_weight)
+        prefetched = self._get_prefetched_records(num_records)
+        if prefetched is None:
+            with self._lock():
+                records, indices, weights = self._sample_records(num_records)
+        else:
+            records, indices, weights = prefetched
 
         if get_backend() == "pytorch":
             indices = torch.tensor(indices)
             weights = torch.tensor(weights)
-        else:
-            indices = np.asarray(indices)
-            weights = np.asarray(weights)
+        return records, indices, weights
+
+    def _sample_records(self, num_records):
+        available_records = min(num_records, self.size)
+        prob_sum = self.merged_segment_tree.sum_segment_tree.get_sum(0, self.size - 1)
+        samples = np.random.random(size=(available_records,)) * prob_sum
+        indices = self.merged_segment_tree.sum_segment_tree.index_of_prefixsum_batch(prefix_sums=samples)
 
         records = DataOpDict()
         for name, variable in self.memory.items():
             records[name] = self.read_variable(variable, indices, dtype=
             util.convert_dtype(self.flat_record_space[name].dtype, to="pytorch"))
         records = define_by_run_unflatten(records)
-        return records, indices, weights
+        return records, indices, self._importance_weights(indices)
+
+    def _importance_weights(self, indices):
+        sum_prob = self.merged_segment_tree.sum_segment_tree.get_sum() + SMALL_NUMBER
+        min_prob = self.merged_segment_tree.min_segment_tree.get_min_value() / sum_prob
+        max_weight = (min_prob * self.size) ** (-self.beta)
+        sample_probs = self.merged_segment_tree.sum_segment_tree.get_batch(indices) / sum_prob
+        return (sample_probs * self.size) ** (-self.beta) / max_weight
+
+    def _prefetch_records(self, num_records):
+        if self.size < num_records:
+            return None
+        return self.num_inserted, self._sample_records(num_records)
+
+    def _get_prefetched_records(self, num_records):
+        prefetched = super(MemPrioritizedReplay, self)._get_prefetched_records(num_records)
+        if prefetched is None:
+            return None
+        num_inserted, (records, indices, _) = prefetched
+        with self._lock():
+            # Slots overwritten since sampling now hold other records, which must not receive this
+            # batch's priority updates: discard the batch.
+            num_overwritten = self.num_inserted - num_inserted
+            if num_overwritten >= self.capacity or \
+                    np.any((indices - num_inserted) % self.capacity < num_overwritten):
+                return None
+            # Weights reflect priority updates written after sampling.
+            return records, indices, self._importance_weights(indices)
 
     @rlgraph_api(must_be_complete=False)
     def _graph_fn_update_records(self, indices, update):
-        for index, loss in zip(indices, update):
-            priority = np.power(loss, self.alpha)
-            self.merged_segment_tree.insert(index, priority)
-            self.max_priority = max(self.max_priority, priority)
+        if len(indices) == 0:
+            return
+        priorities = np.power(np.asarray(update), self.alpha)
+        with self._lock():
+            self.merged_segment_tree.insert_batch(np.asarray(indices), priorities)
+            self.max_priority = max(self.max_priority, np.max(priorities))
+        return None
 
     def get_state(self):
         return {
@@ -15,9 +15,15 @@
 
 from __future__ import absolute_import, division, print_function
 
+from rlgraph import get_backend
 from rlgraph.utils.ops import FLATTEN_SCOPE_PREFIX
 from rlgraph.components.component import Component, rlgraph_api
-from rlgraph.utils import FlattenedDataOp
+from rlgraph.components.helpers.replay_prefetcher import ReplayPrefetcher, NoLock
+from rlgraph.utils import FlattenedDataOp, util
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+if get_backend() == "pytorch":
+    import torch
 
 
 class Memory(Component):
@@ -28,6 +34,9 @@ class Memory(Component):
         insert_records(records) -> Triggers an insertion of records into the memory.
         get_records(num_records) -> Returns `num_records` records from the memory.
     """
+    # Whether `get_records` can be served by a background sampler (see `start_prefetching`).
+    supports_prefetching = False
+
     def __init__(self, capacity=1000, scope="memory", **kwargs):
         """
         Args:
@@ -46,6 +55,9 @@ class Memory(Component):
         # Use this to get batch size.
         self.terminal_key = FLATTEN_SCOPE_PREFIX + "terminals"
 
+        # Optional background sampler (define-by-run only).
+        self.prefetcher = None
+
     def create_variables(self, input_spaces, action_space=None):
         # Store our record-space for convenience.
         self.record_space = input_spaces["records"]
@@ -62,6 +74,50 @@ class Memory(Component):
         # Number of elements present.
         self.size = self.get_variable(name="size", dtype=int, trainable=False, initializer=0)
 
+        if get_backend() == "pytorch":
+            self._preallocate_memory()
+
+    def _preallocate_memory(self):
+        """
+        Replaces the per-slot lists of a define-by-run memory with one preallocated tensor per flat record key,
+        so batches are written with a single `index_copy_` and read with a single `index_select`.
+        """
+        tensors = {}
+        for name, variable in self.memory.items():
+            space = self.flat_record_space[name]
+            tensors[id(variable)] = torch.zeros(
+                size=(self.capacity,) + tuple(space.shape), dtype=util.convert_dtype(space.dtype, to="pytorch")
+            )
+        for name in self.memory:
+            self.memory[name] = tensors[id(self.memory[name])]
+        # Keep the variable registry pointing to the live storage.
+        for key, variable in self.variable_registry.items():
+            if id(variable) in tensors:
+                self.variable_registry[key] = tensors[id(variable)]
+
+    def _write_records(self, indices, records):
+        """
+        Writes a batch of flat records into the given memory slots. If the batch is larger than the memory,
+        only its last `capacity` records are written.
+
+        Args:
+            indices (Union[np.ndarray,torch.Tensor]): Slot index per record.
+            records (FlattenedDataOp): Batched record values per flat key.
+        """
+        num_records = len(indices)
+        offset = max(0, num_records - self.capacity)
+        indices = indices[offset:]
+        for name, variable in self.memory.items():
+            values = records[name][offset:]
+            if get_backend() == "pytorch" and isinstance(variable, torch.Tensor):
+                if isinstance(values, (list, tuple)) and len(values) > 0 and isinstance(values[0], torch.Tensor):
+                    values = torch.stack(values)
+                values = torch.as_tensor(values, dtype=variable.dtype).reshape((-1,) + tuple(variable.shape[1:]))
+                variable.index_copy_(0, torch.as_tensor(indices, dtype=torch.long), values)
+            else:
+                for i, value in zip(indices, values):
+                    variable[i] = value
+
     @rlgraph_api(flatten_ops=True)
     def _graph_fn_insert_records(self, records):
         """
@@ -99,6 +155,69 @@ class Memory(Component):
         """
         pass
 
+    def start_prefetching(self, num_records, num_batches=2):
+        """
+        Starts sampling batches of `num_records` records on a background thread, so `get_records` calls with
+        that batch size return a batch which is already sampled and stacked.
+
+        Args:
+            num_records (int): Number of records per batch.
+            num_batches (int): Maximum number of batches to sample ahead.
+        """
+        if get_backend() != "pytorch":
+            raise RLGraphError("Prefetching records is only supported in define-by-run (pytorch) mode.")
+        if not self.supports_prefetching:
+            raise RLGraphError("Memory {} does not support prefetching records.".format(type(self).__name__))
+        self.stop_prefetching()
+        self.prefetcher = ReplayPrefetcher(self._prefetch_records, num_records, num_batches)
+
+    def stop_prefetching(self):
+        """
+        Stops the background sampler, if any.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+            self.prefetcher = None
+
+    def _lock(self):
+        """
+        Returns:
+            The lock that guards memory contents against the background sampler.
+        """
+        return self.prefetcher.lock if self.prefetcher is not None else NoLock()
+
+    def _sample_records(self, num_records):
+        """
+        Samples records, indices and importance weights in define-by-run mode. Callers must hold `self._lock()`.
+
+        Args:
+            num_records (int): Number of records to sample.
+
+        Returns:
+            tuple: Records, indices and importance weights as returned by `get_records`.
+        """
+        raise NotImplementedError
+
+    def _prefetch_records(self, num_records):
+        """
+        Called by the background sampler holding the lock.
+
+        Returns:
+            Optional[tuple]: Sampled batch or None if the memory holds fewer than `num_records` records.
+        """
+        if self.size < num_records:
+            return None
+        return self._sample_records(num_records)
+
+    def _get_prefetched_records(self, num_records):
+        """
+        Returns:
+            Optional[tuple]: A prefetched batch or None if none can be used to serve `num_records`.
+        """
+        if self.prefetcher is None or self.prefetcher.num_records != num_records:
+            return None
+        return self.prefetcher.get()
+
     def _read_records(self, indices):
         """
         Obtains record values for the provided indices.
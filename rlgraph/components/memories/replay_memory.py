@@ -36,6 +36,8 @@ class ReplayMemory(Memory):
     """
     Implements a standard replay memory to sample randomized batches.
     """
+    supports_prefetching = True
+
     def __init__(
         self,
         capacity=1000,
@@ -87,11 +89,10 @@ class ReplayMemory(Memory):
                 return tf.no_op()
         elif get_backend() == "pytorch":
             update_indices = torch.arange(self.index, self.index + num_records) % self.capacity
-            for key in self.memory:
-                for i, val in zip(update_indices, records[key]):
-                    self.memory[key][i] = val
-            self.index = (self.index + num_records) % self.capacity
-            self.size = min(self.size + num_records, self.capacity)
+            with self._lock():
+                self._write_records(update_indices, records)
+                self.index = (self.index + num_records) % self.capacity
+                self.size = min(self.size + num_records, self.capacity)
             return None
 
     @rlgraph_api
@@ -107,20 +108,30 @@ class ReplayMemory(Memory):
             # Return default importance weight one.
             return self._read_records(indices=indices), indices, tf.ones_like(tensor=indices, dtype=tf.float32)
         elif get_backend() == "pytorch":
-            indices = []
-            if self. size > 0:
-                indices = np.random.choice(np.arange(0, self.size), size=int(num_records))
-                indices = (self.index - 1 - indices) % self.capacity
-            records = DataOpDict()
-            for name, variable in self.memory.items():
-                records[name] = self.read_variable(variable, indices, dtype=
-                                                   util.convert_dtype(self.flat_record_space[name].dtype, to="pytorch"),
-                                                   shape=self.flat_record_space[name].shape)
-            records = define_by_run_unflatten(records)
-            weights = torch.ones(indices.shape, dtype=torch.float32) if len(indices) > 0 \
-                else torch.ones(1, dtype=torch.float32)
+            # Records are copies, so batches sampled ahead stay valid when their slots are overwritten.
+            prefetched = self._get_prefetched_records(num_records)
+            if prefetched is None:
+                with self._lock():
+                    records, indices, weights = self._sample_records(num_records)
+            else:
+                records, indices, weights = prefetched
             return records, indices, weights
 
+    def _sample_records(self, num_records):
+        indices = []
+        if self.size > 0:
+            indices = np.random.choice(np.arange(0, self.size), size=int(num_records))
+            indices = (self.index - 1 - indices) % self.capacity
+        records = DataOpDict()
+        for name, variable in self.memory.items():
+            records[name] = self.read_variable(variable, indices, dtype=
+                                               util.convert_dtype(self.flat_record_space[name].dtype, to="pytorch"),
+                                               shape=self.flat_record_space[name].shape)
+        records = define_by_run_unflatten(records)
+        weights = torch.ones(indices.shape, dtype=torch.float32) if len(indices) > 0 \
+            else torch.ones(1, dtype=torch.float32)
+        return records, indices, weights
+
     def get_state(self):
         return {
             "index": self.index,
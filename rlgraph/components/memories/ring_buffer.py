@@ -150,10 +150,10 @@ class RingBuffer(Memory):
 
             # Episodes previously existing in the range we inserted to as indicated
             # by count of terminals in the that slice.
-            episodes_in_insert_range = 0
             # Count terminals in inserted range.
-            for index in update_indices:
-                episodes_in_insert_range += int(self.memory[self.terminal_key][index])
+            episodes_in_insert_range = int(torch.sum(self.read_variable(
+                self.memory[self.terminal_key], update_indices, dtype=torch.int32
+            )))
             num_episode_update = self.num_episodes - episodes_in_insert_range + inserted_episodes
             self.episode_indices[:self.num_episodes - episodes_in_insert_range] = \
                 self.episode_indices[episodes_in_insert_range:self.num_episodes]
@@ -163,8 +163,8 @@ class RingBuffer(Memory):
             slice_start = self.num_episodes - episodes_in_insert_range
             slice_end = num_episode_update
 
-            byte_terminals = records[self.terminal_key].byte()
-            mask = torch.masked_select(update_indices, byte_terminals)
+            bool_terminals = records[self.terminal_key].bool()
+            mask = torch.masked_select(update_indices, bool_terminals)
             self.episode_indices[slice_start:slice_end] = mask
 
             # Update indices.
@@ -173,9 +173,7 @@ class RingBuffer(Memory):
             self.size = min(self.size + num_records, self.capacity)
 
             # Updates all the necessary sub-variables in the record.
-            for key in self.memory:
-                for i, val in zip(update_indices, records[key]):
-                    self.memory[key][i] = val
+            self._write_records(update_indices, records)
 
             # The TF version returns no-op, return None so return-val inference system does not throw error.
             return None
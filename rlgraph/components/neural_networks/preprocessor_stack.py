@@ -23,6 +23,7 @@ from rlgraph import get_backend
 from rlgraph.components.layers.preprocessing import PreprocessLayer
 from rlgraph.components.neural_networks.stack import Stack
 from rlgraph.utils.decorators import rlgraph_api, graph_fn
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.util import default_dict
 
 if get_backend() == "tf":
@@ -75,6 +76,50 @@ class PreprocessorStack(Stack):
             reset_op = self._graph_fn_reset(*resets)
             return reset_op
 
+    def reset_slots(self, slots):
+        """
+        Python only: Resets the per-slot state (e.g. Sequence histories) of some batch-slots, leaving the other
+        slots untouched. Used to preprocess the states of many environments in one batch, resetting only the
+        environments whose episode ended.
+
+        Args:
+            slots (Union[np.ndarray,List[int]]): The indices (or a boolean mask) of the batch-slots to reset.
+        """
+        self._check_python("reset_slots")
+        for preprocess_layer in self._preprocess_layers():
+            if hasattr(preprocess_layer, "reset_slots"):
+                preprocess_layer.reset_slots(slots)
+
+    def preprocess_slots(self, inputs, slots):
+        """
+        Python only: Preprocesses inputs for some batch-slots only. Per-slot state of the other slots is not
+        advanced.
+
+        Args:
+            inputs (np.ndarray): One input per slot in `slots`.
+            slots (Union[np.ndarray,List[int]]): The indices (or a boolean mask) of the batch-slots `inputs`
+                belong to.
+
+        Returns:
+            np.ndarray: The preprocessed inputs.
+        """
+        self._check_python("preprocess_slots")
+        layers = [layer for layer in self._preprocess_layers() if hasattr(layer, "active_slots")]
+        for preprocess_layer in layers:
+            preprocess_layer.active_slots = slots
+        try:
+            return self.preprocess(inputs)
+        finally:
+            for preprocess_layer in layers:
+                preprocess_layer.active_slots = None
+
+    def _preprocess_layers(self):
+        return [layer for layer in self.sub_components.values() if not re.search(r'^\.helper-', layer.scope)]
+
+    def _check_python(self, method_name):
+        if not (self.backend == "python" or get_backend() == "python"):
+            raise RLGraphError("`{}` is only supported for python PreprocessorStacks.".format(method_name))
+
     @graph_fn
     def _graph_fn_reset(self, *preprocessor_resets):
         if get_backend() == "tf":
@@ -53,6 +53,9 @@ class SequentialVectorEnv(VectorEnv):
             state_space=self.environments[0].state_space, action_space=self.environments[0].action_space
         )
 
+        # (Index, action) of steps started via `step_async`.
+        self.pending_steps = []
+
         self.async_reset = async_reset
         if self.async_reset:
             self.resetter = ThreadedResetter(env_spec, num_background_envs)
@@ -88,6 +91,25 @@ class SequentialVectorEnv(VectorEnv):
             infos.append(info)
         return states, rewards, terminals, infos
 
+    def step_async(self, actions, env_indices=None):
+        if env_indices is None:
+            env_indices = range_(self.num_environments)
+        self.pending_steps.extend(zip(env_indices, actions))
+
+    def step_wait(self, min_ready=None, timeout=None):
+        # Environments are stepped here one after another, so all pending steps finish.
+        pending_steps = sorted(self.pending_steps, key=lambda index_and_action: index_and_action[0])
+        self.pending_steps = []
+        env_indices, states, rewards, terminals, infos = [], [], [], [], []
+        for i, action in pending_steps:
+            state, reward, terminal, info = self.environments[i].step(action)
+            env_indices.append(i)
+            states.append(state)
+            rewards.append(reward)
+            terminals.append(terminal)
+            infos.append(info)
+        return env_indices, states, rewards, terminals, infos
+
     def render(self, index=0):
         self.environments[index].render()
 
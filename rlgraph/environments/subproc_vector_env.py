@@ -0,0 +1,344 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import multiprocessing
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from multiprocessing.sharedctypes import RawArray
+
+import numpy as np
+
+from rlgraph.environments import VectorEnv, Environment
+from rlgraph.spaces import ContainerSpace
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class SubprocVectorEnv(VectorEnv):
+    """
+    Multi-environment class which runs groups of sub-environments in worker processes.
+
+    Each step is one broadcast of actions to all processes followed by one gather of rewards and terminals.
+    Observations of (non-container) state spaces are written by the processes directly into a shared-memory
+    array and are not pickled.
+
+    With `step_async`/`step_wait`, results are returned per process as soon as it finishes, so use one process
+    per sub-environment (the default) for per-environment readiness.
+    """
+    def __init__(self, num_environments, env_spec, num_processes=None, start_method=None):
+        """
+        Args:
+            num_environments (int): Number of sub-environments.
+            env_spec (Union[dict,callable]): Environment spec or callable returning a new environment. With
+                start methods other than "fork", callables must be picklable.
+            num_processes (Optional[int]): Number of worker processes the sub-environments are split over.
+                Defaults to one process per sub-environment.
+            start_method (Optional[str]): Multiprocessing start method ("fork", "spawn", "forkserver").
+                Defaults to the platform default.
+        """
+        # Local instance to infer spaces from, never stepped.
+        self.env = make_env(env_spec)
+        super(SubprocVectorEnv, self).__init__(
+            num_environments=num_environments,
+            state_space=self.env.state_space, action_space=self.env.action_space
+        )
+
+        num_processes = min(num_processes or num_environments, num_environments)
+        self.env_groups = [list(group) for group in np.array_split(np.arange(num_environments), num_processes)]
+        # Sub-env index -> (process, index within process).
+        self.env_locations = [(p, i) for p, group in enumerate(self.env_groups) for i in range(len(group))]
+
+        self.shared_states = None
+        self.states = None
+        if not isinstance(self.state_space, ContainerSpace):
+            shape = (num_environments,) + tuple(self.state_space.shape)
+            dtype = np.dtype(self.state_space.dtype)
+            self.shared_states = RawArray("b", int(np.prod(shape)) * dtype.itemsize)
+            self.states = np.frombuffer(self.shared_states, dtype=dtype).reshape(shape)
+
+        context = multiprocessing.get_context(start_method) if start_method is not None else multiprocessing
+        self.pipes = []
+        self.processes = []
+        for group in self.env_groups:
+            pipe, worker_pipe = context.Pipe()
+            process = context.Process(
+                target=run_env_process,
+                args=(worker_pipe, pipe, env_spec, group, self.shared_states, self.states_shape_and_dtype())
+            )
+            # Terminate when host process terminates.
+            process.daemon = True
+            process.start()
+            worker_pipe.close()
+            self.pipes.append(pipe)
+            self.processes.append(process)
+
+        # Env indices per step command in flight, per process (commands are answered in order).
+        self.pending = [deque() for _ in self.processes]
+        # Received step results not yet returned by `step_wait`.
+        self.finished = []
+        self.closed = False
+
+    def states_shape_and_dtype(self):
+        if self.states is None:
+            return None
+        return self.states.shape, self.states.dtype.str
+
+    def get_env(self, index=0):
+        """
+        Returns:
+            Environment: A local environment built from the same spec. Sub-environments live in the worker
+                processes, this instance is never stepped.
+        """
+        return self.env
+
+    def seed(self, seed=None):
+        return [s for process in range(len(self.processes)) for s in self._call(process, "seed", seed)]
+
+    def reset(self, index=0):
+        process, env_index = self.env_locations[index]
+        state = self._call(process, "reset", env_index)
+        return self.states[index].copy() if self.states is not None else state
+
+    def reset_all(self):
+        for process in range(len(self.processes)):
+            self._collect_pending(process)
+        for pipe in self.pipes:
+            pipe.send(("reset_all", None))
+        states = [s for group_states in self._receive_all() for s in group_states]
+        return self.states.copy() if self.states is not None else states
+
+    def step(self, actions, **kwargs):
+        if any(self.pending) or self.finished:
+            raise RLGraphError("Cannot `step` all environments while asynchronous steps are in flight.")
+        for pipe, group in zip(self.pipes, self.env_groups):
+            pipe.send(("step", [(i, actions[env_index]) for i, env_index in enumerate(group)]))
+        states, rewards, terminals, infos = [], [], [], []
+        for group_states, group_rewards, group_terminals, group_infos in self._receive_all():
+            states.extend(group_states)
+            rewards.extend(group_rewards)
+            terminals.extend(group_terminals)
+            infos.extend(group_infos)
+        if self.states is not None:
+            # Copy out, the next step overwrites the shared block.
+            states = self.states.copy()
+        return states, rewards, terminals, infos
+
+    def step_async(self, actions, env_indices=None):
+        if env_indices is None:
+            env_indices = range(self.num_environments)
+        in_flight = set(i for pending in self.pending for indices in pending for i in indices)
+        in_flight.update(i for result in self.finished for i in result[0])
+        commands = [[] for _ in self.processes]
+        for env_index, action in zip(env_indices, actions):
+            if env_index in in_flight:
+                raise RLGraphError("Environment {} already has a step in flight.".format(env_index))
+            process, i = self.env_locations[env_index]
+            commands[process].append((env_index, i, action))
+        for process, command in enumerate(commands):
+            if len(command) > 0:
+                self.pipes[process].send(("step", [(i, action) for _, i, action in command]))
+                self.pending[process].append([env_index for env_index, _, _ in command])
+
+    def step_wait(self, min_ready=None, timeout=None):
+        num_ready = sum(len(result[0]) for result in self.finished)
+        if min_ready is None:
+            min_ready = num_ready + sum(len(indices) for pending in self.pending for indices in pending)
+        while num_ready < min_ready:
+            waiting = [self.pipes[process] for process in range(len(self.processes)) if self.pending[process]]
+            ready_pipes = wait(waiting, timeout)
+            if len(ready_pipes) == 0:
+                break
+            for pipe in ready_pipes:
+                num_ready += len(self._collect(self.pipes.index(pipe)))
+
+        finished, self.finished = self.finished, []
+        env_indices, states, rewards, terminals, infos = [], [], [], [], []
+        for result in finished:
+            for value, values in zip(result, (env_indices, states, rewards, terminals, infos)):
+                values.extend(value)
+        order = np.argsort(env_indices)
+        return ([env_indices[i] for i in order], [states[i] for i in order], [rewards[i] for i in order],
+                [terminals[i] for i in order], [infos[i] for i in order])
+
+    def _collect(self, process):
+        """
+        Receives the oldest outstanding step result of a process.
+
+        Returns:
+            List[int]: The env indices of the received result.
+        """
+        env_indices = self.pending[process].popleft()
+        group_states, rewards, terminals, infos = self._receive(self.pipes[process])
+        if self.states is not None:
+            # Copy out now, later commands to this process may overwrite the rows.
+            group_states = list(self.states[env_indices])
+        self.finished.append((env_indices, group_states, rewards, terminals, infos))
+        return env_indices
+
+    def _collect_pending(self, process):
+        while self.pending[process]:
+            self._collect(process)
+
+    def _call(self, process, command, data):
+        """
+        Sends a synchronous command to a process once its outstanding step results are received.
+        """
+        self._collect_pending(process)
+        self.pipes[process].send((command, data))
+        return self._receive(self.pipes[process])
+
+    def render(self, index=0):
+        process, env_index = self.env_locations[index]
+        self._call(process, "render", env_index)
+
+    def terminate(self, index=0):
+        process, env_index = self.env_locations[index]
+        self._call(process, "terminate", env_index)
+
+    def terminate_all(self):
+        if self.closed:
+            return
+        for process in range(len(self.processes)):
+            self._collect_pending(process)
+        for pipe in self.pipes:
+            pipe.send(("close", None))
+        results = [pipe.recv() for pipe in self.pipes]
+        for process in self.processes:
+            process.join()
+        self.env.terminate()
+        self.closed = True
+        for result in results:
+            self._check(result)
+
+    @staticmethod
+    def _receive(pipe):
+        return SubprocVectorEnv._check(pipe.recv())
+
+    def _receive_all(self):
+        """
+        Receives the reply to a broadcast command from every process before raising any process' error, so
+        no reply is left unread in a pipe.
+
+        Returns:
+            list: The reply of each process.
+        """
+        return [self._check(result) for result in [pipe.recv() for pipe in self.pipes]]
+
+    @staticmethod
+    def _check(result):
+        if isinstance(result, EnvProcessError):
+            raise RLGraphError("Error in sub-environment process:\n{}".format(result.trace))
+        return result
+
+    def __str__(self):
+        return "SubprocVectorEnv({} x {}, processes={})".format(
+            self.num_environments, self.env, len(self.processes)
+        )
+
+
+class EnvProcessError(object):
+    """
+    Carries the traceback of an exception raised inside an environment process.
+    """
+    def __init__(self, trace):
+        self.trace = trace
+
+
+def make_env(env_spec):
+    if isinstance(env_spec, dict):
+        return Environment.from_spec(env_spec)
+    elif hasattr(env_spec, '__call__'):
+        return env_spec()
+    else:
+        raise ValueError("Env_spec must be either a dict containing an environment spec or a callable"
+                         "returning a new environment object.")
+
+
+def run_env_process(pipe, parent_pipe, env_spec, env_indices, shared_states, states_shape_and_dtype):
+    """
+    Command loop of one environment process. Errors are sent as reply to the failed command and the loop keeps
+    serving commands until "close".
+
+    Args:
+        pipe (Connection): This process' end of the command pipe.
+        parent_pipe (Connection): The parent's end of the pipe (closed here).
+        env_spec (Union[dict,callable]): Spec for the sub-environments.
+        env_indices (List[int]): Global indices of the sub-environments hosted by this process.
+        shared_states (Optional[RawArray]): Shared observation block or None to return states through the pipe.
+        states_shape_and_dtype (Optional[tuple]): Shape and dtype string of the shared observation block.
+    """
+    parent_pipe.close()
+    states = None
+    if shared_states is not None:
+        shape, dtype = states_shape_and_dtype
+        states = np.frombuffer(shared_states, dtype=np.dtype(dtype)).reshape(shape)
+
+    def write(env_index, state):
+        if states is None:
+            return state
+        states[env_indices[env_index]] = state
+        return None
+
+    envs = []
+    # Reported in reply to every command, so replies stay in order with the parent's requests.
+    creation_error = None
+    try:
+        envs = [make_env(env_spec) for _ in env_indices]
+    except Exception:
+        creation_error = EnvProcessError(traceback.format_exc())
+
+    try:
+        while True:
+            command, data = pipe.recv()
+            if command == "close":
+                try:
+                    for env in envs:
+                        env.terminate()
+                    pipe.send(None)
+                except Exception:
+                    pipe.send(EnvProcessError(traceback.format_exc()))
+                break
+            elif creation_error is not None:
+                pipe.send(creation_error)
+                continue
+            # Errors are sent as reply to the failed command, the process keeps serving later commands.
+            try:
+                if command == "step":
+                    # (Index within this process, action) per environment to step.
+                    results = [envs[i].step(action) for i, action in data]
+                    pipe.send((
+                        [write(i, result[0]) for (i, _), result in zip(data, results)],
+                        [result[1] for result in results],
+                        [result[2] for result in results],
+                        [result[3] for result in results]
+                    ))
+                elif command == "reset":
+                    pipe.send(write(data, envs[data].reset()))
+                elif command == "reset_all":
+                    pipe.send([write(i, env.reset()) for i, env in enumerate(envs)])
+                elif command == "seed":
+                    pipe.send([env.seed(data) for env in envs])
+                elif command == "render":
+                    pipe.send(envs[data].render())
+                elif command == "terminate":
+                    pipe.send(envs[data].terminate())
+            except Exception:
+                pipe.send(EnvProcessError(traceback.format_exc()))
+    except (KeyboardInterrupt, EOFError):
+        pass
@@ -55,5 +55,33 @@ class VectorEnv(Environment):
         """
         raise NotImplementedError
 
+    def step_async(self, actions, env_indices=None):
+        """
+        Starts stepping the given sub-environments and returns without waiting for their results.
+
+        Args:
+            actions (any): One action per sub-environment in `env_indices`.
+            env_indices (Optional[List[int]]): Sub-environments to step. None for all sub-environments.
+                Sub-environments must not have a step in flight.
+        """
+        raise NotImplementedError
+
+    def step_wait(self, min_ready=None, timeout=None):
+        """
+        Waits for steps started via `step_async` and returns the results of all sub-environments finished
+        by then.
+
+        Args:
+            min_ready (Optional[int]): Minimum number of finished sub-environments to wait for. None to wait for
+                all steps in flight.
+            timeout (Optional[float]): Maximum number of seconds to wait. May return fewer than `min_ready`
+                results when exceeded.
+
+        Returns:
+            tuple: Sub-environment indices (ascending), states, rewards, terminals and infos of the finished
+                sub-environments.
+        """
+        raise NotImplementedError
+
     def terminate_all(self):
         raise NotImplementedError
@@ -17,9 +17,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import random
+import time
 from threading import Thread
 
+import numpy as np
 from six.moves import queue
 
 from rlgraph import get_distributed_backend
@@ -28,7 +29,8 @@ from rlgraph.environments import Environment
 from rlgraph.execution.ray import RayValueWorker
 from rlgraph.execution.ray.apex.ray_memory_actor import RayMemoryActor
 from rlgraph.execution.ray.ray_executor import RayExecutor
-from rlgraph.execution.ray.ray_util import create_colocated_ray_actors, RayTaskPool, RayWeight
+from rlgraph.execution.ray.ray_util import create_colocated_ray_actors, RayTaskPool, RayWeightSync, \
+    CompressedArray, TransportCodec, wait_any, ReplayShardRouter
 from rlgraph.spaces import Dict
 
 if get_distributed_backend() == "ray":
@@ -72,8 +74,26 @@ class ApexExecutor(RayExecutor):
         self.num_cpus_per_replay_actor = self.executor_spec.get("num_cpus_per_replay_actor",
                                                                 self.replay_sampling_task_depth)
 
+        # Minimum number of learner batches per memory shard coalesced into one priority update call.
+        self.priority_update_batches = self.executor_spec.get("priority_update_batches", 1)
+        # Memory actor -> list of (indices, loss per item) not yet sent.
+        self.pending_priority_updates = {}
+
+        # Maximum seconds the main loop blocks waiting for any task to complete.
+        self.task_wait_timeout = self.executor_spec.get("task_wait_timeout", 0.1)
+
+        # Whether to place all replay memories on the driver node (else Ray places them).
+        self.colocate_replay_memories = self.executor_spec.get("colocate_replay_memories", True)
+        # Whether sample workers insert into replay memories on their own node if there are any.
+        self.replay_locality = self.executor_spec.get("replay_locality", True)
+
         # How often weights are synced to remote workers.
         self.weight_sync_steps = self.executor_spec["weight_sync_steps"]
+        # Versioned weight broadcast, optionally quantized (e.g. "float16") and/or sending deltas.
+        self.weight_sync = RayWeightSync(
+            dtype=self.executor_spec.get("weight_sync_dtype", None),
+            delta=self.executor_spec.get("weight_sync_delta", False)
+        )
 
         # Necessary for target network updates.
         self.weight_syncs_executed = 0
@@ -133,11 +153,16 @@ class ApexExecutor(RayExecutor):
         self.apex_replay_spec["sample_batch_size"] = self.agent_config["update_spec"]["batch_size"]
         self.logger.info("Sampling batch size {}".format(self.apex_replay_spec["sample_batch_size"]))
 
-        self.ray_local_replay_memories = create_colocated_ray_actors(
-            cls=RayMemoryActor.as_remote(num_cpus=self.num_cpus_per_replay_actor),
-            config=self.apex_replay_spec,
-            num_agents=self.num_replay_workers
-        )
+        if self.colocate_replay_memories:
+            self.ray_local_replay_memories = create_colocated_ray_actors(
+                cls=RayMemoryActor.as_remote(num_cpus=self.num_cpus_per_replay_actor),
+                config=self.apex_replay_spec,
+                num_agents=self.num_replay_workers
+            )
+        else:
+            replay_memory_cls = RayMemoryActor.as_remote(num_cpus=self.num_cpus_per_replay_actor)
+            self.ray_local_replay_memories = [replay_memory_cls.remote(self.apex_replay_spec)
+                                              for _ in range(self.num_replay_workers)]
 
         # Create remote workers for data collection.
         self.worker_spec["worker_sample_size"] = self.worker_sample_size
@@ -148,6 +173,19 @@ class ApexExecutor(RayExecutor):
             # *args
             self.worker_spec, self.environment_spec, self.worker_frame_skip
         )
+
+        # Route env samples to replay memories by node and fill level.
+        self.replay_router = ReplayShardRouter(
+            shards=self.ray_local_replay_memories,
+            shard_hosts=ray.get([ray_memory.get_host.remote() for ray_memory in self.ray_local_replay_memories]),
+            shard_capacity=shard_size,
+            locality=self.replay_locality
+        )
+        worker_hosts = ray.get([ray_worker.get_host.remote() for ray_worker in self.ray_env_sample_workers])
+        for ray_worker, host in zip(self.ray_env_sample_workers, worker_hosts):
+            self.replay_router.add_worker(ray_worker, host)
+        self.logger.info("{} of {} sample workers insert into replay memories on their node.".format(
+            self.replay_router.num_local_workers(), self.num_sample_workers))
         self.init_tasks()
 
     def init_tasks(self):
@@ -162,9 +200,9 @@ class ApexExecutor(RayExecutor):
 
         # Env interaction tasks via RayWorkers which each
         # have a local agent.
-        weights = RayWeight(self.local_agent.get_weights())
+        self.weight_sync.publish(self.local_agent.get_weights())
         for ray_worker in self.ray_env_sample_workers:
-            ray_worker.set_weights.remote(weights)
+            self.weight_sync.sync(ray_worker)
             self.steps_since_weights_synced[ray_worker] = 0
 
             self.logger.info("Synced worker {} weights, initializing sample tasks.".format(
@@ -172,6 +210,25 @@ class ApexExecutor(RayExecutor):
             for _ in range(self.env_interaction_task_depth):
                 self.env_sample_tasks.add_task(ray_worker, ray_worker.execute_and_get_with_count.remote())
 
+    def execute_workload(self, workload):
+        self.update_worker.reset_stats()
+        # Resets the ingest rate window.
+        self.replay_router.get_ingest_rates()
+        result = super(ApexExecutor, self).execute_workload(workload)
+        # Do not hold back priority updates of a partial coalescing batch past the end of the workload.
+        self._send_priority_updates(min_batches=1)
+        result["replay_ingest_rates"] = self.replay_router.get_ingest_rates()
+        self.logger.info("Replay memory ingest rates (records/s): {}".format(
+            ", ".join("{:.1f}".format(rate) for rate in result["replay_ingest_rates"])))
+        learner_stats = self.update_worker.get_stats()
+        self.logger.info("Learner utilization: {:.2%} updating, {:.2%} waiting for batches, {:.2%} loading "
+                         "batches ({} updates, mean update time {} s).".format(
+                             learner_stats["learner_utilization"], learner_stats["learner_wait_fraction"],
+                             learner_stats["learner_load_fraction"], learner_stats["learner_updates"],
+                             learner_stats["mean_learner_update_time"]))
+        result.update(learner_stats)
+        return result
+
     def _execute_step(self):
         """
         Executes a workload on Ray. The main loop performs the following
@@ -188,28 +245,30 @@ class ApexExecutor(RayExecutor):
         discarded = 0
         queue_inserts = 0
         rewards = []
-        weights = None
-
-        # 1. Fetch results from RayWorkers.
-        completed_sample_tasks = list(self.env_sample_tasks.get_completed())
-        sample_batch_metrics = ray.get([task[1][1] for task in completed_sample_tasks])
-        for i, (ray_worker, (env_sample_obj_id, sample_size)) in enumerate(completed_sample_tasks):
-            # Randomly add env sample to a local replay actor.
-            random.choice(self.ray_local_replay_memories).observe.remote(env_sample_obj_id)
-            sample_steps = sample_batch_metrics[i]["batch_size"]
-            if len(sample_batch_metrics[i]["last_rewards"]) > 0:
-                rewards.extend(sample_batch_metrics[i]["last_rewards"])
+
+        # Block until any sample or replay task completes instead of polling.
+        wait_any([self.env_sample_tasks, self.prioritized_replay_tasks], num_returns=1,
+                 timeout=self.task_wait_timeout)
+
+        # 1. Fetch results from RayWorkers (metrics of all completed tasks in one call).
+        for ray_worker, (env_sample_obj_id, _), sample_batch_metrics in \
+                self.env_sample_tasks.fetch_completed(result_index=1):
+            sample_steps = sample_batch_metrics["batch_size"]
+            # Add env sample to a replay memory, preferably on the worker's node.
+            self.replay_router.route(ray_worker, sample_steps).observe.remote(env_sample_obj_id)
+            if len(sample_batch_metrics["last_rewards"]) > 0:
+                rewards.extend(sample_batch_metrics["last_rewards"])
             env_steps += sample_steps
 
             self.steps_since_weights_synced[ray_worker] += sample_steps
             if self.steps_since_weights_synced[ray_worker] >= self.weight_sync_steps:
-                if weights is None or self.update_worker.update_done:
+                # Publish a new version (one shared object) only if the learner updated since the last one.
+                if self.update_worker.update_done:
                     self.update_worker.update_done = False
-                    weights = ray.put(RayWeight(self.local_agent.get_weights()))
+                    self.weight_sync.publish(self.local_agent.get_weights())
                 # self.logger.debug("Syncing weights for worker {}".format(self.worker_ids[ray_worker]))
-                # self.logger.debug("Weights type: {}, weights = {}".format(type(weights), weights))
-                ray_worker.set_weights.remote(weights)
-                self.weight_syncs_executed += 1
+                if self.weight_sync.sync(ray_worker):
+                    self.weight_syncs_executed += 1
                 self.steps_since_weights_synced[ray_worker] = 0
 
             # Reschedule environment samples.
@@ -220,76 +279,184 @@ class ApexExecutor(RayExecutor):
             # Immediately schedule new batch sampling tasks on these workers.
             self.prioritized_replay_tasks.add_task(ray_memory, ray_memory.get_batch.remote())
 
-            # Retrieve results via id.
-            # self.logger.info("replay task obj id {}".format(replay_remote_task))
             if self.discard_queued_samples and self.update_worker.input_queue.full():
                 discarded += 1
             else:
-                sampled_batch = ray.get(object_ids=replay_remote_task)
-                # Pass to the agent doing the actual updates.
+                # Pass to the agent doing the actual updates. Its loader thread fetches the batch, so the
+                # main loop does not block on the transfer.
                 # The ray worker is passed along because we need to update its priorities later in the subsequent
                 # task (see loop below).
-                # Copy due to memory leaks in Ray, see https://github.com/ray-project/ray/pull/3484/
-                self.update_worker.input_queue.put((ray_memory, sampled_batch and sampled_batch.copy()))
+                self.update_worker.input_queue.put((ray_memory, replay_remote_task))
                 queue_inserts += 1
 
         # 3. Update priorities on priority sampling workers using loss values produced by update worker.
         while not self.update_worker.output_queue.empty():
             ray_memory, indices, loss_per_item = self.update_worker.output_queue.get()
-            # self.logger.info('indices = {}'.format(batch["indices"]))
-            # self.logger.info('loss = {}'.format(loss_per_item))
-
-            ray_memory.update_priorities.remote(indices, loss_per_item)
+            if ray_memory not in self.pending_priority_updates:
+                self.pending_priority_updates[ray_memory] = []
+            self.pending_priority_updates[ray_memory].append((indices, loss_per_item))
             # len of loss per item is update count.
             update_steps += len(indices)
 
+        self._send_priority_updates(min_batches=self.priority_update_batches)
+
         return env_steps, update_steps, {
             "discarded": discarded,
             "queue_inserts": queue_inserts,
             "rewards": rewards
         }
 
+    def _send_priority_updates(self, min_batches):
+        """
+        Coalesces the pending priority updates per memory shard into one remote call.
+
+        Args:
+            min_batches (int): Only send the updates of shards with at least this many pending update batches.
+        """
+        for ray_memory in list(self.pending_priority_updates.keys()):
+            updates = self.pending_priority_updates[ray_memory]
+            if len(updates) >= min_batches:
+                ray_memory.update_priorities.remote(
+                    np.concatenate([indices for indices, _ in updates]),
+                    np.concatenate([loss_per_item for _, loss_per_item in updates])
+                )
+                del self.pending_priority_updates[ray_memory]
+
 
 class UpdateWorker(Thread):
     """
     Executes learning separate from the main event loop as described in the Ape-X paper.
     Communicates with the main thread via a queue.
+
+    Updates are pipelined: a loader thread fetches the next sampled batch from the object store and
+    decompresses transport-compressed states into a preallocated buffer while the learner updates
+    on the current batch. Buffers are double-buffered, so the loader runs at most one batch ahead.
     """
 
-    def __init__(self, agent, in_queue_size):
+    def __init__(self, agent, in_queue_size, num_batch_buffers=2):
         """
         Initializes the worker with a RLGraph agent and queues for
 
         Args:
             agent (Agent): RLGraph agent used to execute local updates.
-            input_queue (queue.Queue): Input queue the worker will use to poll samples.
-            output_queue (queue.Queue): Output queue the worker will use to push results of local
-                update computations.
+            in_queue_size (int): Maximum number of (memory actor, sampled batch object id) tuples waiting in
+                `input_queue`.
+            num_batch_buffers (int): Number of preallocated batch buffers cycled between the loader and
+                the learner.
         """
         super(UpdateWorker, self).__init__()
 
         # Agent to use for updating.
         self.agent = agent
+        # (Memory actor, object id of a sampled batch) tuples pushed by the main thread.
         self.input_queue = queue.Queue(maxsize=in_queue_size)
+        # (Memory actor, indices, loss per item) tuples for priority updates.
         self.output_queue = queue.Queue()
-
+        # Fetched and decompressed batches ready for the learner.
+        self.ready_queue = queue.Queue()
+        # Decompression buffers (dicts of key -> array) not in use by the loader or the learner.
+        self.free_buffers = queue.Queue()
+        for _ in range(num_batch_buffers):
+            self.free_buffers.put({})
+
+        self.loader = Thread(target=self._run_loader)
         # Terminate when host process terminates.
+        self.loader.daemon = True
         self.daemon = True
 
         # Flag for main thread.
         self.update_done = False
 
+        # Instrumentation (seconds).
+        self.stats_start = time.perf_counter()
+        self.update_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.load_seconds = 0.0
+        self.updates = 0
+
     def run(self):
+        self.loader.start()
         while True:
             self.step()
 
+    def _run_loader(self):
+        while True:
+            self.load()
+
+    def load(self):
+        """
+        Fetches the next sampled batch and stages it for the learner.
+        """
+        memory_actor, batch_id = self.input_queue.get()
+        buffers = self.free_buffers.get()
+        start = time.perf_counter()
+        sample_batch = ray.get(object_ids=batch_id)
+        if sample_batch is None:
+            self.free_buffers.put(buffers)
+            return
+        sample_batch = self.stage_batch(sample_batch, buffers)
+        self.load_seconds += time.perf_counter() - start
+        self.ready_queue.put((memory_actor, sample_batch, buffers))
+
+    @staticmethod
+    def stage_batch(sample_batch, buffers):
+        """
+        Decompresses transport-compressed values of a sampled batch into reused buffers.
+
+        Args:
+            sample_batch (dict): Sampled batch, values may be CompressedArrays.
+            buffers (dict): Buffers to decompress into by key. Missing or mismatching buffers are
+                (re)allocated.
+
+        Returns:
+            dict: The staged batch.
+        """
+        # Copy due to memory leaks in Ray, see https://github.com/ray-project/ray/pull/3484/
+        staged = sample_batch.copy()
+        for key, value in sample_batch.items():
+            if isinstance(value, CompressedArray):
+                out = buffers.get(key)
+                if out is None or out.shape != tuple(value.shape) or out.dtype != np.dtype(value.dtype):
+                    out = np.empty(shape=value.shape, dtype=value.dtype)
+                    buffers[key] = out
+                staged[key] = TransportCodec.decompress(value, out=out)
+        return staged
+
     def step(self):  # TODO: time-percentage calculation missing here
         # Fetch input for update:
         # Replay memory used.
-        memory_actor, sample_batch = self.input_queue.get()
+        start = time.perf_counter()
+        memory_actor, sample_batch, buffers = self.ready_queue.get()
+        update_start = time.perf_counter()
+        self.wait_seconds += update_start - start
+
+        losses = self.agent.update(batch=sample_batch)  # TODO: pass in time-percentage
+        # Just pass back indices for updating.
+        self.output_queue.put((memory_actor, sample_batch["indices"], losses[1]))
+        self.update_done = True
+        # The update has consumed the batch, its buffers may be refilled.
+        self.free_buffers.put(buffers)
+        self.update_seconds += time.perf_counter() - update_start
+        self.updates += 1
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: Learner instrumentation since the last `reset_stats` call: fraction of time spent updating
+                (utilization), waiting for batches, and loading batches on the loader thread.
+        """
+        elapsed = (time.perf_counter() - self.stats_start) or 1e-10
+        return dict(
+            learner_updates=self.updates,
+            learner_utilization=self.update_seconds / elapsed,
+            learner_wait_fraction=self.wait_seconds / elapsed,
+            learner_load_fraction=self.load_seconds / elapsed,
+            mean_learner_update_time=self.update_seconds / max(self.updates, 1)
+        )
 
-        if sample_batch is not None:
-            losses = self.agent.update(batch=sample_batch)  # TODO: pass in time-percentage
-            # Just pass back indices for updating.
-            self.output_queue.put((memory_actor, sample_batch["indices"], losses[1]))
-            self.update_done = True
+    def reset_stats(self):
+        self.stats_start = time.perf_counter()
+        self.update_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.load_seconds = 0.0
+        self.updates = 0
@@ -19,19 +19,29 @@ from __future__ import print_function
 
 import numpy as np
 import operator
-from six.moves import xrange as range_
+from six import string_types
 
 from rlgraph.utils import SMALL_NUMBER
 from rlgraph.utils.specifiable import Specifiable
 from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree, MinSumSegmentTree
-from rlgraph.execution.ray.ray_util import ray_decompress
+from rlgraph.execution.ray.ray_util import ray_decompress_frames
 
 
 class ApexMemory(Specifiable):
     """
     Apex prioritized replay implementing compression.
+
+    Records are either kept as a list of record tuples, or, if `columnar_storage` is set, in one preallocated
+    numpy array per field (states, actions, rewards, terminals, next_states, weights). Container actions are
+    stored as one array per action key. Columnar storage avoids per-record Python objects and turns
+    reads into a single gather per column.
+
+    If `deduplicate_frames` is set, identical compressed states and frames (as produced by
+    `ray_compress_frames`) are interned on insert so states, next states and overlapping frame stacks
+    reference one stored copy of each frame. Frames are freed once no record references them anymore.
     """
-    def __init__(self, state_space=None, action_space=None, capacity=1000, alpha=1.0, beta=1.0):
+    def __init__(self, state_space=None, action_space=None, capacity=1000, alpha=1.0, beta=1.0,
+                 columnar_storage=False, deduplicate_frames=False, frame_cache_size=10000, stratified_sampling=False):
         """
         Args:
             state_space (dict): State spec.
@@ -39,6 +49,15 @@ class ApexMemory(Specifiable):
             capacity (int): Max capacity.
             alpha (float): Initial weight.
             beta (float): Prioritisation factor.
+            columnar_storage (bool): If true, store records in preallocated per-field numpy arrays instead
+                of a list of record tuples. Column shapes and dtypes of states and actions are taken from the
+                first inserted record, compressed states are kept in object arrays.
+            deduplicate_frames (bool): If true, intern compressed states and frames so each distinct frame
+                is stored once.
+            frame_cache_size (int): Max number of recently inserted frames to look up duplicates in.
+            stratified_sampling (bool): If true, split the total priority mass into `num_records` equal segments
+                and draw one sample per segment (as in the prioritized replay paper) instead of drawing all
+                samples uniformly over the whole mass.
         """
         super(ApexMemory, self).__init__()
 
@@ -47,11 +66,23 @@ class ApexMemory(Specifiable):
         self.container_actions = isinstance(action_space, dict)
         self.memory_values = []
         self.index = 0
+        # Total number of inserted records, used to detect overwritten slots in pre-sampled batches.
+        self.num_inserted = 0
         self.capacity = capacity
         self.size = 0
         self.max_priority = 1.0
         self.alpha = alpha
         self.beta = beta
+        self.stratified_sampling = stratified_sampling
+
+        self.columnar_storage = columnar_storage
+        # Dict of column arrays, allocated on the first insert in columnar mode.
+        self.columns = None
+
+        self.deduplicate_frames = deduplicate_frames
+        self.frame_cache_size = frame_cache_size
+        # Maps compressed frames to their stored instance.
+        self.frame_cache = {}
 
         self.default_new_weight = np.power(self.max_priority, self.alpha)
         self.priority_capacity = 1
@@ -59,9 +90,9 @@ class ApexMemory(Specifiable):
             self.priority_capacity *= 2
 
         # Create segment trees, initialize with neutral elements.
-        sum_values = [0.0 for _ in range_(2 * self.priority_capacity)]
+        sum_values = np.zeros(shape=(2 * self.priority_capacity,))
         sum_segment_tree = MemSegmentTree(sum_values, self.priority_capacity, operator.add)
-        min_values = [float('inf') for _ in range_(2 * self.priority_capacity)]
+        min_values = np.full(shape=(2 * self.priority_capacity,), fill_value=float('inf'))
         min_segment_tree = MemSegmentTree(min_values, self.priority_capacity, min)
         self.merged_segment_tree = MinSumSegmentTree(
             sum_tree=sum_segment_tree,
@@ -72,7 +103,23 @@ class ApexMemory(Specifiable):
     def insert_records(self, record):
         # TODO: This has the record interface, but actually expects a specific structure anyway, so
         # may as well change API?
-        if self.index >= self.size:
+        if self.deduplicate_frames:
+            record = self._intern_record(record)
+        if self.columnar_storage:
+            state, action, reward, terminal, next_state, weight = record
+            if self.columns is None:
+                self._allocate_columns(state, action, next_state)
+            self.columns["states"][self.index] = state
+            if self.container_actions:
+                for name in self.action_space.keys():
+                    self.columns["actions"][name][self.index] = action[name]
+            else:
+                self.columns["actions"][self.index] = action
+            self.columns["rewards"][self.index] = reward
+            self.columns["terminals"][self.index] = terminal
+            self.columns["next_states"][self.index] = next_state
+            self.columns["weights"][self.index] = self.max_priority if weight is None else weight
+        elif self.index >= self.size:
             self.memory_values.append(record)
         else:
             self.memory_values[self.index] = record
@@ -86,6 +133,153 @@ class ApexMemory(Specifiable):
         # Update indices.
         self.index = (self.index + 1) % self.capacity
         self.size = min(self.size + 1, self.capacity)
+        self.num_inserted += 1
+
+    def insert_batch(self, records):
+        """
+        Inserts a batch of records. In columnar mode, each column is written with at most two
+        contiguous slice copies (wrapping around at capacity).
+
+        Args:
+            records (dict): Batch dict with keys "states", "actions", "rewards", "terminals", "next_states"
+                and optionally "importance_weights". Actions may be a dict of batched values per action key.
+                Missing weights default to the max priority.
+
+        Returns:
+            np.ndarray: Memory indices the records were written to.
+        """
+        num_records = len(records["rewards"])
+        if num_records == 0:
+            return np.zeros(shape=(0,), dtype=np.int64)
+        weights = records.get("importance_weights", None)
+        if weights is None:
+            weights = np.full(shape=(num_records,), fill_value=self.max_priority)
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+
+        if self.deduplicate_frames:
+            records = dict(records)
+            self._reset_frame_cache(num_records)
+            records["states"] = [self._intern_frames(state) for state in records["states"]]
+            records["next_states"] = [self._intern_frames(state) for state in records["next_states"]]
+
+        # Only the last `capacity` records survive a batch larger than the memory.
+        offset = max(num_records - self.capacity, 0)
+        start = (self.index + offset) % self.capacity
+        insert_indices = (start + np.arange(num_records - offset)) % self.capacity
+
+        if self.columnar_storage:
+            if self.columns is None:
+                if self.container_actions:
+                    first_action = {k: v[0] for k, v in records["actions"].items()}
+                else:
+                    first_action = records["actions"][0]
+                self._allocate_columns(records["states"][0], first_action, records["next_states"][0])
+            for name, column in self._flat_columns():
+                self._write_column(column, start, offset, self._flat_record_value(records, weights, name))
+        else:
+            # Extend the list to the size after this insert, so all insert indices exist.
+            new_size = min(self.size + num_records, self.capacity)
+            self.memory_values.extend([None] * (new_size - len(self.memory_values)))
+            for i in range(offset, num_records):
+                if self.container_actions:
+                    action = {k: v[i] for k, v in records["actions"].items()}
+                else:
+                    action = records["actions"][i]
+                record = (records["states"][i], action, records["rewards"][i], records["terminals"][i],
+                          records["next_states"][i], weights[i])
+                self.memory_values[insert_indices[i - offset]] = record
+
+        self.merged_segment_tree.insert_batch(insert_indices, weights[offset:] ** self.alpha)
+
+        # Update indices.
+        self.index = (self.index + num_records) % self.capacity
+        self.size = min(self.size + num_records, self.capacity)
+        self.num_inserted += num_records
+        return insert_indices
+
+    def _intern_record(self, record):
+        self._reset_frame_cache(1)
+        state, action, reward, terminal, next_state, weight = record
+        return (self._intern_frames(state), action, reward, terminal, self._intern_frames(next_state), weight)
+
+    def _reset_frame_cache(self, num_records):
+        # Bounds the cache so it only holds recently inserted frames alive.
+        if len(self.frame_cache) + num_records > self.frame_cache_size:
+            self.frame_cache = {}
+
+    def _intern_frames(self, state):
+        """
+        Returns the stored instance of a compressed state or tuple of compressed frames.
+        """
+        if isinstance(state, tuple):
+            return tuple(self._intern_frames(frame) for frame in state)
+        elif isinstance(state, (bytes, string_types)):
+            return self.frame_cache.setdefault(state, state)
+        return state
+
+    def _allocate_columns(self, state, action, next_state):
+        """
+        Preallocates one array of length capacity per field. Shapes and dtypes of states and actions are taken from
+        one record, rewards are always float and terminals bool (so e.g. an int first reward does not truncate
+        later rewards).
+        """
+        self.columns = dict(
+            states=self._allocate_column(state),
+            rewards=np.zeros(shape=(self.capacity,), dtype=np.float32),
+            terminals=np.zeros(shape=(self.capacity,), dtype=bool),
+            next_states=self._allocate_column(next_state),
+            weights=np.zeros(shape=(self.capacity,), dtype=np.float64)
+        )
+        if self.container_actions:
+            self.columns["actions"] = {name: self._allocate_column(action[name]) for name in self.action_space.keys()}
+        else:
+            self.columns["actions"] = self._allocate_column(action)
+
+    def _allocate_column(self, value):
+        # Compressed values are variable-length strings or tuples of frames -> object column.
+        if isinstance(value, (bytes, string_types, tuple)):
+            return np.empty(shape=(self.capacity,), dtype=object)
+        value = np.asarray(value)
+        return np.zeros(shape=(self.capacity,) + value.shape, dtype=value.dtype)
+
+    def _flat_columns(self):
+        """
+        Yields (name, column) pairs, with container action columns named "actions/<key>".
+        """
+        for name, column in self.columns.items():
+            if isinstance(column, dict):
+                for key, sub_column in column.items():
+                    yield "{}/{}".format(name, key), sub_column
+            else:
+                yield name, column
+
+    @staticmethod
+    def _flat_record_value(records, weights, name):
+        if name == "weights":
+            return weights
+        if "/" in name:
+            name, key = name.split("/", 1)
+            return records[name][key]
+        return records[name]
+
+    def _write_column(self, column, start, offset, values):
+        """
+        Writes values[offset:] into the column starting at `start`, wrapping around at capacity.
+        """
+        if column.dtype == object:
+            # Assign element-wise so strings and frame tuples are not broadcast into a nd-array.
+            object_values = list(values)[offset:]
+            values = np.empty(shape=(len(object_values),), dtype=object)
+            for i, value in enumerate(object_values):
+                values[i] = value
+        else:
+            values = np.asarray(values)[offset:]
+        num_values = len(values)
+        first = min(num_values, self.capacity - start)
+        column[start:start + first] = values[:first]
+        if first < num_values:
+            column[:num_values - first] = values[first:]
 
     def read_records(self, indices):
         """
@@ -97,6 +291,8 @@ class ApexMemory(Specifiable):
         Returns:
              dict: Record value dict.
         """
+        if self.columnar_storage:
+            return self._read_columns(indices)
         states = []
         if self.container_actions:
             actions = {k: [] for k in self.action_space.keys()}
@@ -107,7 +303,7 @@ class ApexMemory(Specifiable):
         next_states = []
         for index in indices:
             state, action, reward, terminal, next_state, weight = self.memory_values[index]
-            states.append(ray_decompress(state))
+            states.append(ray_decompress_frames(state))
 
             if self.container_actions:
                 for name in self.action_space.keys():
@@ -116,7 +312,7 @@ class ApexMemory(Specifiable):
                 actions.append(action)
             rewards.append(reward)
             terminals.append(terminal)
-            next_states.append(ray_decompress(next_state))
+            next_states.append(ray_decompress_frames(next_state))
 
         if self.container_actions:
             for name in self.action_space.keys():
@@ -131,25 +327,52 @@ class ApexMemory(Specifiable):
             next_states=np.asarray(next_states)
         )
 
+    def _read_columns(self, indices):
+        """
+        Reads records from columnar storage via one gather per column.
+        """
+        indices = np.asarray(indices)
+        if self.container_actions:
+            actions = {name: np.squeeze(column[indices]) for name, column in self.columns["actions"].items()}
+        else:
+            actions = self.columns["actions"][indices]
+        return dict(
+            states=self._gather_states(self.columns["states"], indices),
+            actions=actions,
+            rewards=self.columns["rewards"][indices],
+            terminals=self.columns["terminals"][indices],
+            next_states=self._gather_states(self.columns["next_states"], indices)
+        )
+
+    @staticmethod
+    def _gather_states(column, indices):
+        states = column[indices]
+        if states.dtype == object:
+            states = np.asarray([ray_decompress_frames(state) for state in states])
+        return states
+
     def get_records(self, num_records):
-        indices = []
         prob_sum = self.merged_segment_tree.sum_segment_tree.get_sum(0, self.size)
-        samples = np.random.random(size=(num_records,)) * prob_sum
-        for sample in samples:
-            indices.append(self.merged_segment_tree.sum_segment_tree.index_of_prefixsum(prefix_sum=sample))
+        if self.stratified_sampling:
+            segment_length = prob_sum / num_records
+            samples = (np.arange(num_records) + np.random.random(size=(num_records,))) * segment_length
+            # Guard against floating point drift past the total mass in the last segment.
+            samples = np.minimum(samples, prob_sum)
+        else:
+            samples = np.random.random(size=(num_records,)) * prob_sum
+        indices = self.merged_segment_tree.sum_segment_tree.index_of_prefixsum_batch(prefix_sums=samples)
 
         sum_prob = self.merged_segment_tree.sum_segment_tree.get_sum()
         min_prob = self.merged_segment_tree.min_segment_tree.get_min_value() / sum_prob + SMALL_NUMBER
         max_weight = (min_prob * self.size) ** (-self.beta)
-        weights = []
-        for index in indices:
-            sample_prob = self.merged_segment_tree.sum_segment_tree.get(index) / sum_prob
-            weight = (sample_prob * self.size) ** (-self.beta)
-            weights.append(weight / max_weight)
+        sample_probs = self.merged_segment_tree.sum_segment_tree.get_batch(indices) / sum_prob
+        weights = (sample_probs * self.size) ** (-self.beta) / max_weight
 
-        return self.read_records(indices=indices), np.asarray(indices), np.asarray(weights)
+        return self.read_records(indices=indices), indices, weights
 
     def update_records(self, indices, update):
-        for index, loss in zip(indices, update):
-            self.merged_segment_tree.insert(index, loss ** self.alpha)
-            self.max_priority = max(self.max_priority, loss)
+        if len(indices) == 0:
+            return
+        update = np.asarray(update)
+        self.merged_segment_tree.insert_batch(np.asarray(indices), update ** self.alpha)
+        self.max_priority = max(self.max_priority, np.max(update))
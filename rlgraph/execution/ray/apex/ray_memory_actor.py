@@ -17,12 +17,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from threading import Thread, Lock
+
 import numpy as np
+from six.moves import queue
+
 from rlgraph.utils import SMALL_NUMBER
-from six.moves import xrange as range_
 from rlgraph import get_distributed_backend
 from rlgraph.execution.ray.apex.apex_memory import ApexMemory
 from rlgraph.execution.ray.ray_actor import RayActor
+from rlgraph.execution.ray.ray_util import TransportCodec
 
 if get_distributed_backend() == "ray":
     import ray
@@ -31,6 +35,15 @@ if get_distributed_backend() == "ray":
 class RayMemoryActor(RayActor):
     """
     An in-memory prioritized replay worker used to accelerate memory interaction in Ape-X.
+
+    If `sample_ring_size` is set in the replay spec, a background thread keeps up to that many sampled
+    batches ready, so `get_batch` requests are answered without sampling and decompressing on the
+    request path. Ready batches may have been sampled before the latest inserts and priority updates,
+    i.e. they are at most `sample_ring_size` batches stale. Batches containing records overwritten since
+    sampling are discarded, so priority updates are never applied to the wrong records.
+
+    If `transport_codec` is set in the replay spec, sampled states and next states are compressed into one
+    CompressedArray each, which the learner decompresses off its update path.
     """
     def __init__(self, apex_replay_spec):
         """
@@ -45,6 +58,16 @@ class RayMemoryActor(RayActor):
         self.sample_batch_size = apex_replay_spec["sample_batch_size"]
         self.memory = ApexMemory(**apex_replay_spec["memory_spec"])
 
+        # Number of batches to sample ahead of time (0 = sample on request).
+        self.sample_ring_size = apex_replay_spec.get("sample_ring_size", 0)
+        self.sample_ring = None
+        self.sample_thread = None
+        # Guards the memory against concurrent access by the sampling thread.
+        self.memory_lock = Lock()
+
+        transport_codec = apex_replay_spec.get("transport_codec", None)
+        self.transport_codec = TransportCodec(transport_codec) if transport_codec is not None else None
+
     @classmethod
     def as_remote(cls, num_cpus=None, num_gpus=None):
         return ray.remote(num_cpus=num_cpus, num_gpus=num_gpus)(cls)
@@ -59,12 +82,67 @@ class RayMemoryActor(RayActor):
         """
         if self.memory.size < self.min_sample_memory_size:
             return None
+        elif self.sample_ring_size > 0:
+            if self.sample_thread is None:
+                self.start_sample_thread()
+            while True:
+                try:
+                    num_inserted, batch = self.sample_ring.get_nowait()
+                except queue.Empty:
+                    # Sampling thread fell behind, do not make the learner wait.
+                    return self._sample_batch()
+                if not self._is_overwritten(num_inserted, batch["indices"]):
+                    return batch
         else:
+            return self._sample_batch()
+
+    def _is_overwritten(self, num_inserted, indices):
+        """
+        Checks if any of the given indices was overwritten since the memory held `num_inserted` records.
+
+        Args:
+            num_inserted (int): Total number of records inserted into the memory when the indices were sampled.
+            indices (np.ndarray): Sampled memory indices.
+
+        Returns:
+            bool: True if any index now holds a different record.
+        """
+        with self.memory_lock:
+            num_overwritten = self.memory.num_inserted - num_inserted
+        if num_overwritten >= self.memory.capacity:
+            return True
+        return bool(np.any((indices - num_inserted) % self.memory.capacity < num_overwritten))
+
+    def start_sample_thread(self):
+        """
+        Starts the background thread filling the sample ring.
+        """
+        self.sample_ring = queue.Queue(maxsize=self.sample_ring_size)
+        self.sample_thread = Thread(target=self._fill_sample_ring)
+        # Terminate when host process terminates.
+        self.sample_thread.daemon = True
+        self.sample_thread.start()
+
+    def _fill_sample_ring(self):
+        while True:
+            # Blocks while the ring is full.
+            self.sample_ring.put(self._sample_batch(return_num_inserted=True))
+
+    def _sample_batch(self, return_num_inserted=False):
+        with self.memory_lock:
             batch, indices, weights = self.memory.get_records(self.sample_batch_size)
-            # Merge into one dict to only return one future in ray.
-            batch["indices"] = indices
-            batch["importance_weights"] = weights
-            return batch
+            num_inserted = self.memory.num_inserted
+        # Merge into one dict to only return one future in ray.
+        batch["indices"] = indices
+        batch["importance_weights"] = weights
+        if self.transport_codec is not None:
+            for key in ["states", "next_states"]:
+                # Container states are passed as is.
+                if isinstance(batch[key], np.ndarray):
+                    batch[key] = self.transport_codec.compress(batch[key])
+        if return_num_inserted:
+            return num_inserted, batch
+        return batch
 
     def observe(self, env_sample):
         """
@@ -72,29 +150,23 @@ class RayMemoryActor(RayActor):
 
         N.b. For performance reason, data layout is slightly different for apex.
         """
-        records = env_sample.get_batch()
-        num_records = len(records['states'])
+        self.insert_batch(env_sample.get_batch())
 
+    def insert_batch(self, records):
+        """
+        Inserts a whole worker sample batch with one vectorized reward clipping and one
+        priority update for all records.
+
+        Args:
+            records (dict): Sample batch with keys "states", "actions", "rewards", "terminals", "next_states" and
+                "importance_weights". Container actions are passed as dict of batched values per key.
+        """
         # TODO port to tf PR behaviour.
         if self.clip_rewards:
-            rewards = np.sign(records["rewards"])
-        else:
-            rewards = records["rewards"]
-        for i in range_(num_records):
-            # If Actions is dict with vectors per key, convert to single dict.
-            if isinstance(records["actions"], dict):
-                action = {k: v[i] for k, v in records["actions"].items()}
-            else:
-                action = records["actions"][i]
-
-            self.memory.insert_records((
-                records["states"][i],
-                action,
-                rewards[i],
-                records["terminals"][i],
-                records["next_states"][i],
-                records["importance_weights"][i]
-            ))
+            records = dict(records)
+            records["rewards"] = np.sign(records["rewards"])
+        with self.memory_lock:
+            self.memory.insert_batch(records)
 
     def update_priorities(self, indices, loss):
         """
@@ -106,4 +178,5 @@ class RayMemoryActor(RayActor):
             loss (ndarray):  Loss values for indices.
         """
         loss = np.abs(loss) + SMALL_NUMBER
-        self.memory.update_records(indices, loss)
+        with self.memory_lock:
+            self.memory.update_records(indices, loss)
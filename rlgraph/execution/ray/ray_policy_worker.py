@@ -23,11 +23,13 @@ from six.moves import xrange as range_
 
 from rlgraph.utils import util
 from rlgraph import get_distributed_backend
+from rlgraph.utils.rlgraph_errors import RLGraphError
+from rlgraph.environments import VectorEnv
 from rlgraph.environments.sequential_vector_env import SequentialVectorEnv
 from rlgraph.execution.environment_sample import EnvironmentSample
 from rlgraph.execution.ray import RayExecutor
 from rlgraph.execution.ray.ray_actor import RayActor
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.ray.ray_util import TransportCodec, TrajectoryBuffer
 
 if get_distributed_backend() == "ray":
     import ray
@@ -60,10 +62,19 @@ class RayPolicyWorker(RayActor):
         self.worker_executes_postprocessing = worker_spec.pop("worker_executes_postprocessing", True)
 
         self.compress = worker_spec.pop("compress_states", False)
+        # Codec used to compress all states of a sample batch at once: "none", "lz4" or "zstd".
+        self.transport_codec = TransportCodec(worker_spec.pop("transport_codec", "lz4"))
         self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         num_background_envs = worker_spec.pop("num_background_envs", 1)
 
-        self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        # Optional VectorEnv spec, e.g. dict(type="subproc-vector") to step environments in worker processes.
+        vector_env_spec = worker_spec.pop("vector_env_spec", None)
+        if vector_env_spec is None:
+            self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        else:
+            self.vector_env = VectorEnv.from_spec(
+                vector_env_spec, env_spec=env_spec, num_environments=self.num_environments
+            )
 
         # Then update agent config.
         agent_config['state_space'] = self.vector_env.state_space
@@ -79,6 +90,9 @@ class RayPolicyWorker(RayActor):
             )
             self.is_preprocessed[env_id] = False
         self.agent = self.setup_agent(agent_config, worker_spec)
+        # Version and (for delta syncs) decoded values of the weights last set, see `RayWeightSync`.
+        self.weights_version = None
+        self.weights_reference = None
         self.worker_frameskip = frameskip
 
         #  Flag for container actions.
@@ -110,6 +124,12 @@ class RayPolicyWorker(RayActor):
             shape=(self.num_environments,) + self.agent.preprocessed_state_space.shape,
             dtype=self.agent.preprocessed_state_space.dtype
         )
+        # Rollouts are written in place into preallocated [num_envs, num_timesteps, ...] arrays.
+        self.trajectory_buffer = TrajectoryBuffer(
+            self.num_environments, int(np.ceil(self.worker_sample_size / self.num_environments)),
+            self.agent.preprocessed_state_space,
+            self.agent.flat_action_space if self.container_actions else self.agent.action_space
+        )
         self.last_ep_timesteps = [0 for _ in range_(self.num_environments)]
         self.last_ep_rewards = [0 for _ in range_(self.num_environments)]
         self.last_ep_start_timestamps = [0.0 for _ in range_(self.num_environments)]
@@ -167,26 +187,9 @@ class RayPolicyWorker(RayActor):
         episodes_executed = [0] * self.num_environments
         env_frames = 0
 
-        # Final result batch.
-        if self.container_actions:
-            batch_actions = {k: [] for k in self.action_space.keys()}
-        else:
-            batch_actions = []
-        batch_states, batch_rewards, batch_next_states, batch_terminals = [], [], [], []
-
-        # Running trajectories.
-        sample_states, sample_actions, sample_rewards, sample_terminals = {}, {}, {}, {}
-
-        # Reset envs and Agent either if finished an episode in current loop or if last state
-        # from previous execution was terminal for that environment.
-        for i, env_id in enumerate(self.env_ids):
-            sample_states[env_id] = []
-            if self.container_actions:
-                sample_actions[env_id] = {k: [] for k in self.action_space.keys()}
-            else:
-                sample_actions[env_id] = []
-            sample_rewards[env_id] = []
-            sample_terminals[env_id] = []
+        # Running trajectories of all environments, one time step per loop iteration.
+        trajectories = self.trajectory_buffer
+        trajectories.reset(capacity=int(np.ceil(num_timesteps / self.num_environments)))
 
         env_states = self.last_states
         last_episode_rewards = []
@@ -244,21 +247,14 @@ class RayPolicyWorker(RayActor):
             current_iteration_time = time.perf_counter() - current_iteration_start_timestamp
 
             # Do accounting for each environment.
-            state_buffer = np.array(self.preprocessed_states_buffer)
+            trajectories.add(self.preprocessed_states_buffer, actions if self.container_actions else env_actions,
+                             step_rewards, terminals)
             for i, env_id in enumerate(self.env_ids):
                 # Set is preprocessed to False because env_states are currently NOT preprocessed.
                 self.is_preprocessed[env_id] = False
                 current_episode_timesteps[i] += 1
                 # Each position is the running episode reward of that episode. Add step reward.
                 current_episode_rewards[i] += step_rewards[i]
-                sample_states[env_id].append(state_buffer[i])
-                if self.container_actions:
-                    for name in self.action_space.keys():
-                        sample_actions[env_id][name].append(env_actions[i][name])
-                else:
-                    sample_actions[env_id].append(env_actions[i])
-                sample_rewards[env_id].append(step_rewards[i])
-                sample_terminals[env_id].append(terminals[i])
                 current_episode_sample_times[i] += current_iteration_time
 
                 # Terminate and reset episode for that environment.
@@ -272,25 +268,8 @@ class RayPolicyWorker(RayActor):
                     self.episodes_executed += 1
                     last_episode_rewards.append(current_episode_rewards[i])
 
-                    # Append to final result trajectories.
-                    batch_states.extend(sample_states[env_id])
-                    if self.agent.flat_action_space is not None:
-                        # Use actions here, not env actions.
-                        for name in self.agent.flat_action_space.keys():
-                            batch_actions[name].extend(sample_actions[env_id][name])
-                    else:
-                        batch_actions.extend(sample_actions[env_id])
-                    batch_rewards.extend(sample_rewards[env_id])
-                    batch_terminals.extend(sample_terminals[env_id])
-
-                    # Reset running trajectory for this env.
-                    sample_states[env_id] = []
-                    if self.container_actions:
-                        sample_actions[env_id] = {k: [] for k in self.action_space.keys()}
-                    else:
-                        sample_actions[env_id] = []
-                    sample_rewards[env_id] = []
-                    sample_terminals[env_id] = []
+                    # Ends the sequence, also if the episode was cut off by the time limit.
+                    trajectories.end_segment(i)
 
                     # Reset this environment and its pre-processor stack.
                     env_states[i] = self.vector_env.reset(i)
@@ -317,33 +296,17 @@ class RayPolicyWorker(RayActor):
         self.last_ep_start_timestamps = current_episode_start_timestamps
         self.last_ep_sample_times = current_episode_sample_times
 
-        # Sequence indices are the same as terminals for terminal episodes.
-        batch_sequence_indices = batch_terminals.copy()
-
-        # We already accounted for all terminated episodes. This means we only
-        # have to do accounting for any unfinished fragments.
-        for i, env_id in enumerate(self.env_ids):
-            # This env was not terminal -> need to process remaining trajectory
-            if not terminals[i]:
-                batch_states.extend(sample_states[env_id])
-                if self.agent.flat_action_space is not None:
-                    # Use actions here, not env actions.
-                    for name in self.agent.flat_action_space.keys():
-                        batch_actions[name].extend(sample_actions[env_id][name])
-                else:
-                    batch_actions.extend(sample_actions[env_id])
-                batch_rewards.extend(sample_rewards[env_id])
-                batch_terminals.extend(sample_terminals[env_id])
-
-                # Take terminals thus far - all zero.
-                batch_sequence_indices.extend(sample_terminals[env_id].copy())
-                # Set final elem to true because sub-sequence ends here.
-                batch_sequence_indices[-1] = True
+        # Sequences end with their episode or with the trajectory. Trajectories are flattened env by env, so each
+        # sequence is contiguous.
+        batch_sequence_indices = trajectories.episode_ends[:, :trajectories.num_steps].copy()
+        batch_sequence_indices[:, -1] = True
 
         # Perform final batch-processing once.
-        sample_batch, batch_size = self._process_policy_trajectories(batch_states, batch_actions,
-                                                                     batch_rewards, batch_terminals,
-                                                                     batch_sequence_indices)
+        sample_batch, batch_size = self._process_policy_trajectories(
+            trajectories.flat(trajectories.states), trajectories.flat_actions(),
+            trajectories.flat(trajectories.rewards), trajectories.flat(trajectories.terminals),
+            batch_sequence_indices.reshape(-1)
+        )
 
         total_time = (time.perf_counter() - start) or 1e-10
         self.sample_steps.append(timesteps_executed)
@@ -354,7 +317,7 @@ class RayPolicyWorker(RayActor):
         # for each worker to calculate expensive statistics now.
         return EnvironmentSample(
             sample_batch=sample_batch,
-            batch_size=len(batch_rewards),
+            batch_size=batch_size,
             metrics=dict(
                 last_rewards=last_episode_rewards,
                 runtime=total_time,
@@ -370,11 +333,18 @@ class RayPolicyWorker(RayActor):
         return sample, sample.batch_size
 
     def set_weights(self, weights):
-        policy_weights = {k: v for k,v in zip(weights.policy_vars, weights.policy_values)}
-        vf_weights = None
-        if weights.has_vf:
-            vf_weights = {k: v for k, v in zip(weights.value_function_vars, weights.value_function_values)}
+        # Skip weights already held (versioned weights only).
+        if weights.version is not None and weights.version == self.weights_version:
+            return
+        if weights.base_version is not None and weights.base_version != self.weights_version:
+            raise RLGraphError("Received delta weights for version {} but worker holds version {}.".format(
+                weights.base_version, self.weights_version
+            ))
+        policy_weights, vf_weights = weights.decode(self.weights_reference)
         self.agent.set_weights(policy_weights, value_function_weights=vf_weights)
+        self.weights_version = weights.version
+        # Keep decoded weights only if subsequent deltas are applied to them.
+        self.weights_reference = (policy_weights, vf_weights) if weights.keep_reference else None
 
     def get_workload_statistics(self):
         """
@@ -432,8 +402,9 @@ class RayPolicyWorker(RayActor):
 
         if self.compress:
             env_dtype = self.vector_env.state_space.dtype
-            states = [ray_compress(np.asarray(state, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                      for state in states]
+            states = self.transport_codec.compress(
+                np.asarray(states, dtype=util.convert_dtype(dtype=env_dtype, to='np'))
+            )
         return dict(
             states=states,
             actions=actions,
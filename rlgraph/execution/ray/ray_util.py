@@ -19,6 +19,10 @@ from __future__ import print_function
 
 import os
 import base64
+import time
+import multiprocessing.pool
+from collections import OrderedDict
+
 import numpy as np
 from six import string_types
 from rlgraph import get_distributed_backend
@@ -28,6 +32,10 @@ if get_distributed_backend() == "ray":
     import ray
     import lz4.frame
     import pyarrow
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
 
 
 # Follows utils used in Ray RLlib.
@@ -35,35 +43,198 @@ class RayWeight(object):
     """
     Wrapper to transport TF weights to deal with serialisation bugs in Ray/Arrow.
 
+    Weights can carry a version (so workers holding that version skip them), be quantized to a smaller
+    floating point dtype and be deltas relative to the weights of a previous version (see `RayWeightSync`).
+
     #TODO investigate serialisation bugs in Ray/flatten values.
     """
 
-    def __init__(self, weights):
-        self.policy_vars = []
-        self.policy_values = []
+    def __init__(self, weights, version=None, base_version=None, dtype=None, keep_reference=False):
+        """
+        Args:
+            weights (dict): Dict with "policy_weights" and optionally "value_function_weights", each mapping
+                variable names to values. For deltas, values are differences to the weights of `base_version`
+                and unchanged variables may be omitted.
+            version (Optional[int]): Version of these weights.
+            base_version (Optional[int]): If not None, the weights are deltas relative to this version.
+            dtype (Optional[str]): Floating point dtype to quantize floating point values to, e.g. "float16".
+            keep_reference (bool): Whether receivers need to keep the decoded weights as reference for
+                subsequent deltas.
+        """
+        self.version = version
+        self.base_version = base_version
+        self.keep_reference = keep_reference
+        # Variable name -> original dtype of quantized values.
+        self.original_dtypes = {}
 
-        for k, v in weights["policy_weights"].items():
-            self.policy_vars.append(k)
-            self.policy_values.append(v)
+        self.policy_vars, self.policy_values = self._encode(weights["policy_weights"], dtype)
 
         self.has_vf = False
         if "value_function_weights" in weights:
-            self.value_function_vars = []
-            self.value_function_values = []
             self.has_vf = True
-            for k, v in weights["value_function_weights"].items():
-                self.value_function_vars.append(k)
-                self.value_function_values.append(v)
+            self.value_function_vars, self.value_function_values = self._encode(
+                weights["value_function_weights"], dtype
+            )
+
+    def _encode(self, weights, dtype):
+        names = []
+        values = []
+        for k, v in weights.items():
+            if dtype is not None and isinstance(v, np.ndarray) and v.dtype.kind == "f" and v.dtype != dtype:
+                self.original_dtypes[k] = v.dtype.str
+                v = v.astype(dtype)
+            names.append(k)
+            values.append(v)
+        return names, values
+
+    def _decode(self, names, values, reference):
+        weights = {} if reference is None else dict(reference)
+        for k, v in zip(names, values):
+            if k in self.original_dtypes:
+                v = v.astype(self.original_dtypes[k])
+            weights[k] = v if reference is None else weights[k] + v
+        return weights
+
+    def decode(self, reference=None):
+        """
+        Restores the weights dicts.
+
+        Args:
+            reference (Optional[tuple]): Decoded (policy weights, value function weights) of `base_version`.
+                Required for deltas.
+
+        Returns:
+            tuple: Policy weights dict and value function weights dict (None if there is no value function).
+        """
+        if self.base_version is not None and reference is None:
+            raise RLGraphError("Delta weights of version {} require the weights of version {} as reference.".format(
+                self.version, self.base_version
+            ))
+        if self.base_version is None:
+            reference = (None, None)
+        policy_weights = self._decode(self.policy_vars, self.policy_values, reference[0])
+        vf_weights = None
+        if self.has_vf:
+            vf_weights = self._decode(self.value_function_vars, self.value_function_values, reference[1])
+        return policy_weights, vf_weights
+
+
+class RayWeightSync(object):
+    """
+    Broadcasts versioned weights from the driver to Ray workers.
+
+    Each published version is put into the object store once and shared by all workers. Workers already
+    holding the current version are skipped. Optionally, weights are quantized (`dtype`) and workers holding
+    the previous version receive deltas, from which unchanged variables are omitted.
+
+    Delta and full weights of a version decode to the same values on all workers: the driver tracks the
+    decoded weights workers hold (including quantization error of deltas) and sends those as full weights.
+    """
+
+    def __init__(self, dtype=None, delta=False):
+        """
+        Args:
+            dtype (Optional[str]): Floating point dtype to quantize weights (or deltas) to, e.g. "float16".
+            delta (bool): Whether to send deltas to workers holding the previous version.
+        """
+        self.dtype = dtype
+        self.delta = delta
+        self.version = 0
+        # Decoded weights workers hold for the current version.
+        self.reference = None
+        self.full_weights = None
+        self.delta_weights = None
+        # Worker -> version of the weights it holds.
+        self.worker_versions = {}
+
+    def publish(self, weights):
+        """
+        Publishes a new version of the weights.
+
+        Args:
+            weights (dict): Weights as returned by `Agent.get_weights()`.
+
+        Returns:
+            int: The new version.
+        """
+        self.version += 1
+        base_version = self.version - 1
+        if not self.delta:
+            self.full_weights = ray.put(RayWeight(weights, version=self.version, dtype=self.dtype))
+            return self.version
+
+        policy_weights = weights["policy_weights"]
+        vf_weights = weights.get("value_function_weights")
+        self.delta_weights = None
+        if self.reference is not None:
+            delta = dict(policy_weights=self._diff(policy_weights, self.reference[0]))
+            if vf_weights is not None:
+                delta["value_function_weights"] = self._diff(vf_weights, self.reference[1])
+            delta_weights = RayWeight(delta, version=self.version, base_version=base_version, dtype=self.dtype,
+                                      keep_reference=True)
+            self.reference = delta_weights.decode(self.reference)
+            self.delta_weights = ray.put(delta_weights)
+        else:
+            self.reference = (dict(policy_weights), None if vf_weights is None else dict(vf_weights))
+
+        # Full weights are the exact reference, so they are not quantized.
+        full = dict(policy_weights=self.reference[0])
+        if self.reference[1] is not None:
+            full["value_function_weights"] = self.reference[1]
+        self.full_weights = ray.put(RayWeight(full, version=self.version, keep_reference=True))
+        return self.version
+
+    @staticmethod
+    def _diff(weights, reference):
+        delta = {}
+        for k, v in weights.items():
+            v_delta = v - reference[k]
+            if np.any(v_delta):
+                delta[k] = v_delta
+        return delta
+
+    def is_current(self, worker):
+        return self.worker_versions.get(worker) == self.version
+
+    def sync(self, worker):
+        """
+        Sends the current weights to a worker unless it already holds them.
+
+        Args:
+            worker (RayActor): Worker with a remote `set_weights` method.
+
+        Returns:
+            bool: True if weights were sent.
+        """
+        if self.full_weights is None or self.is_current(worker):
+            return False
+        if self.delta_weights is not None and self.worker_versions.get(worker) == self.version - 1:
+            worker.set_weights.remote(self.delta_weights)
+        else:
+            worker.set_weights.remote(self.full_weights)
+        self.worker_versions[worker] = self.version
+        return True
 
 
 class RayTaskPool(object):
     """
     Manages a set of Ray tasks currently being executed (i.e. the RayAgent tasks).
+
+    Readiness is tracked incrementally: tasks known to be complete are not waited on again, and callers
+    block on `wait_any` (or the module-level `wait_any` across several pools) instead of polling. A wait collects
+    all tasks complete at its deadline, so `get_completed` after a wait only drains them without another
+    sweep over the pending tasks.
     """
 
     def __init__(self):
         self.ray_tasks = {}
         self.ray_objects = {}
+        # Object ids of tasks not known to be complete (ordered by insertion).
+        self.pending = OrderedDict()
+        # Object ids of completed tasks not yet returned, in completion order.
+        self.ready = []
+        # Whether the pending tasks were swept by a wait since the last `get_completed`.
+        self.swept = False
 
     def add_task(self, worker, ray_object_ids):
         """
@@ -79,21 +250,187 @@ class RayTaskPool(object):
             ray_object_id = ray_object_ids
         self.ray_tasks[ray_object_id] = worker
         self.ray_objects[ray_object_id] = ray_object_ids
+        self.pending[ray_object_id] = True
+
+    def __len__(self):
+        return len(self.ray_tasks)
+
+    def num_ready(self):
+        return len(self.ready)
 
-    def get_completed(self):
+    def mark_ready(self, ray_object_ids):
+        """
+        Moves tasks from pending to ready.
+
+        Args:
+            ray_object_ids (list): Object ids (as registered in `add_task`) of completed tasks.
         """
-        Waits on pending tasks and yields them upon completion.
+        for ray_object_id in ray_object_ids:
+            if self.pending.pop(ray_object_id, None) is not None:
+                self.ready.append(ray_object_id)
+
+    def wait_any(self, num_returns=1, timeout=None):
+        """
+        Blocks until at least `num_returns` tasks (at most all tasks in the pool) are complete.
+
+        Args:
+            num_returns (int): Number of completed tasks to wait for.
+            timeout (Optional[float]): Maximum number of seconds to wait. None to wait without deadline.
 
         Returns:
-            generator: Yields completed tasks.
+            int: The number of completed tasks ready to be returned.
+        """
+        return wait_any([self], num_returns=num_returns, timeout=timeout)
+
+    def get_completed(self, timeout=0.0):
         """
+        Yields completed tasks, checking all pending tasks once without blocking (by default).
 
-        pending_tasks = list(self.ray_tasks)
-        if pending_tasks:
-            # This ray function checks tasks and splits into ready and non-ready tasks.
-            ready, not_ready = ray.wait(pending_tasks, num_returns=len(pending_tasks), timeout=0.01)
-            for obj_id in ready:
-                yield (self.ray_tasks.pop(obj_id), self.ray_objects.pop(obj_id))
+        Args:
+            timeout (float): Maximum number of seconds to wait for at least one task to complete if none is.
+                Pending tasks are only swept if there was no wait since the last call.
+
+        Returns:
+            generator: Yields completed tasks as (worker, object id(s)) tuples.
+        """
+        if len(self.ready) == 0 and timeout > 0:
+            self.wait_any(num_returns=1, timeout=timeout)
+        if self.pending and not self.swept:
+            # No prior wait: One non-blocking sweep over the tasks not yet known to be complete.
+            pending_tasks = list(self.pending)
+            ready, _ = ray.wait(pending_tasks, num_returns=len(pending_tasks), timeout=0)
+            self.mark_ready(ready)
+        self.swept = False
+        ready, self.ready = self.ready, []
+        for obj_id in ready:
+            yield (self.ray_tasks.pop(obj_id), self.ray_objects.pop(obj_id))
+
+    def fetch_completed(self, result_index=0, timeout=0.0):
+        """
+        Returns all completed tasks and their results, fetched with one `ray.get` call.
+
+        Args:
+            result_index (int): For tasks with multiple object ids, the index of the object id whose result
+                to fetch.
+            timeout (float): See `get_completed`.
+
+        Returns:
+            list: (worker, object id(s), result) tuples of the completed tasks.
+        """
+        completed = list(self.get_completed(timeout=timeout))
+        if len(completed) == 0:
+            return []
+        object_ids = [ray_object_ids[result_index] if isinstance(ray_object_ids, list) else ray_object_ids
+                      for _, ray_object_ids in completed]
+        results = ray.get(object_ids)
+        return [(worker, ray_object_ids, result) for (worker, ray_object_ids), result in zip(completed, results)]
+
+
+def wait_any(task_pools, num_returns=1, timeout=None):
+    """
+    Blocks until at least `num_returns` tasks in any of the given pools are complete (or all tasks are),
+    then marks all tasks complete at that point as ready.
+
+    Args:
+        task_pools (List[RayTaskPool]): Pools to wait on.
+        num_returns (int): Number of completed tasks to wait for, summed over all pools.
+        timeout (Optional[float]): Maximum number of seconds to wait. None to wait without deadline.
+
+    Returns:
+        int: The number of completed tasks ready to be returned, summed over all pools.
+    """
+    num_ready = sum(pool.num_ready() for pool in task_pools)
+    owners = {}
+    for pool in task_pools:
+        for ray_object_id in pool.pending:
+            owners[ray_object_id] = pool
+    num_returns = min(num_returns, num_ready + len(owners)) - num_ready
+    if num_returns > 0:
+        ready, not_ready = ray.wait(list(owners), num_returns=num_returns, timeout=timeout)
+        # Also collect the tasks that completed alongside, so the pools need no sweep of their own.
+        if len(not_ready) > 0:
+            ready += ray.wait(not_ready, num_returns=len(not_ready), timeout=0)[0]
+        for ray_object_id in ready:
+            owners[ray_object_id].mark_ready([ray_object_id])
+        for pool in task_pools:
+            pool.swept = True
+        num_ready += len(ready)
+    return num_ready
+
+
+class ReplayShardRouter(object):
+    """
+    Routes env samples of sample workers to replay memory shards.
+
+    If locality is enabled, samples go to shards on the sample worker's node if there are any (so compressed
+    frames do not cross the network). Among the candidate shards, the one with the lowest fill level (and then
+    the fewest routed records) is chosen. Fill levels are estimated from the records routed to each shard.
+    """
+    def __init__(self, shards, shard_hosts, shard_capacity, locality=True):
+        """
+        Args:
+            shards (list): Replay memory actors.
+            shard_hosts (list): Host name of each shard.
+            shard_capacity (int): Capacity of each shard in records.
+            locality (bool): Whether to prefer shards on the sample worker's node.
+        """
+        self.shards = shards
+        self.shard_capacity = shard_capacity
+        self.locality = locality
+        self.shards_by_host = {}
+        for shard, host in zip(shards, shard_hosts):
+            self.shards_by_host.setdefault(host, []).append(shard)
+        # Sample worker -> candidate shards.
+        self.worker_shards = {}
+        # Shard -> records routed in total.
+        self.records_routed = {shard: 0 for shard in shards}
+        self.last_records_routed = dict(self.records_routed)
+        self.last_rate_time = time.time()
+
+    def add_worker(self, worker, host):
+        """
+        Registers a sample worker and its host.
+
+        Args:
+            worker (RayActor): Sample worker.
+            host (str): Host name the worker is running on.
+        """
+        local_shards = self.shards_by_host.get(host, [])
+        self.worker_shards[worker] = local_shards if self.locality and len(local_shards) > 0 else self.shards
+
+    def num_local_workers(self):
+        return sum(1 for shards in self.worker_shards.values() if shards is not self.shards)
+
+    def route(self, worker, num_records):
+        """
+        Selects the shard to insert a sample of a worker into.
+
+        Args:
+            worker (RayActor): Sample worker which produced the sample.
+            num_records (int): Number of records in the sample.
+
+        Returns:
+            RayMemoryActor: The selected shard.
+        """
+        shards = self.worker_shards.get(worker, self.shards)
+        shard = min(shards, key=lambda s: (min(self.records_routed[s], self.shard_capacity),
+                                           self.records_routed[s]))
+        self.records_routed[shard] += num_records
+        return shard
+
+    def get_ingest_rates(self):
+        """
+        Returns the ingest rate of each shard since the last call.
+
+        Returns:
+            list: Records per second routed to each shard (in the order of `shards`).
+        """
+        now = time.time()
+        elapsed = max(now - self.last_rate_time, 1e-10)
+        rates = [(self.records_routed[shard] - self.last_records_routed[shard]) / elapsed for shard in self.shards]
+        self.last_records_routed = dict(self.records_routed)
+        self.last_rate_time = now
+        return rates
 
 
 def create_colocated_ray_actors(cls, config, num_agents, max_attempts=10):
@@ -153,24 +490,336 @@ def split_local_non_local_agents(ray_agents):
     return local, non_local
 
 
-# Ported Ray compression utils, encoding apparently necessary for Redis.
+# Ported Ray compression utils. Objects are transported through the object store, so the compressed
+# bytes are returned as is (no base64 encoding).
 def ray_compress(data):
     data = pyarrow.serialize(data).to_buffer().to_pybytes()
-    data = lz4.frame.compress(data)
-    # Unclear why ascii decoding.
-    data = base64.b64encode(data).decode("ascii")
-    # data = base64.b64encode(data)
-    return data
+    return lz4.frame.compress(data)
 
 
 def ray_decompress(data):
-    if isinstance(data, bytes) or isinstance(data, string_types):
+    if isinstance(data, bytes):
+        data = lz4.frame.decompress(data)
+        data = pyarrow.deserialize(data)
+    elif isinstance(data, string_types):
+        # Legacy base64-encoded data.
         data = base64.b64decode(data)
         data = lz4.frame.decompress(data)
         data = pyarrow.deserialize(data)
     return data
 
 
+class CompressedArray(object):
+    """
+    Compressed numpy array as produced by a TransportCodec: raw compressed bytes plus the
+    metadata needed to restore the array.
+    """
+    __slots__ = ["data", "shape", "dtype", "codec"]
+
+    def __init__(self, data, shape, dtype, codec):
+        """
+        Args:
+            data (bytes): Compressed raw (C-order) array bytes.
+            shape (tuple): Shape of the array.
+            dtype (str): Numpy dtype string of the array.
+            codec (str): Name of the codec used to compress `data`.
+        """
+        self.data = data
+        self.shape = shape
+        self.dtype = dtype
+        self.codec = codec
+
+    def __getstate__(self):
+        return self.data, self.shape, self.dtype, self.codec
+
+    def __setstate__(self, state):
+        self.data, self.shape, self.dtype, self.codec = state
+
+    def __len__(self):
+        return self.shape[0]
+
+
+class TransportCodec(object):
+    """
+    Compresses whole numpy arrays (e.g. all states of a sample batch) into raw bytes for transport
+    between Ray actors and decompresses them, optionally into preallocated output buffers.
+
+    Supported codecs:
+        - "none": Arrays are passed through uncompressed (Ray transports numpy arrays without copies).
+        - "lz4": LZ4 frame compression, fast with moderate compression ratio.
+        - "zstd": Zstandard compression (requires the `zstandard` package), better ratio at higher cost.
+    """
+    CODECS = ["none", "lz4", "zstd"]
+
+    def __init__(self, codec="lz4", compression_level=None):
+        """
+        Args:
+            codec (str): One of "none", "lz4", "zstd".
+            compression_level (Optional[int]): Codec-specific compression level. Uses the codec default if None.
+        """
+        if codec not in self.CODECS:
+            raise RLGraphError("Unknown transport codec '{}'. Supported codecs are {}.".format(codec, self.CODECS))
+        if codec == "zstd" and zstandard is None:
+            raise RLGraphError("Transport codec 'zstd' requires the zstandard package: `pip install zstandard`.")
+        self.codec = codec
+        self.compression_level = compression_level
+        if codec == "zstd":
+            level = 3 if compression_level is None else compression_level
+            self.zstd_compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, array):
+        """
+        Compresses an array with one codec call.
+
+        Args:
+            array (Union[np.ndarray,list]): Array to compress, e.g. a batch of states.
+
+        Returns:
+            Union[CompressedArray,np.ndarray]: The compressed array, or the array itself for codec "none".
+        """
+        array = np.ascontiguousarray(array)
+        if self.codec == "none":
+            return array
+        raw_bytes = array.reshape(-1).view(np.uint8)
+        if self.codec == "lz4":
+            if self.compression_level is None:
+                data = lz4.frame.compress(raw_bytes)
+            else:
+                data = lz4.frame.compress(raw_bytes, compression_level=self.compression_level)
+        else:
+            data = self.zstd_compressor.compress(raw_bytes)
+        return CompressedArray(data, array.shape, array.dtype.str, self.codec)
+
+    @staticmethod
+    def decompress(compressed, out=None):
+        """
+        Decompresses an array compressed by any TransportCodec (the codec is read from the compressed array).
+
+        Args:
+            compressed (Union[CompressedArray,np.ndarray]): Compressed array. Uncompressed arrays are passed through.
+            out (Optional[np.ndarray]): Preallocated buffer (e.g. a slice of a larger batch array) to write the
+                result to. Must have the shape of the compressed array.
+
+        Returns:
+            np.ndarray: The decompressed array (`out` if given).
+        """
+        if not isinstance(compressed, CompressedArray):
+            array = np.asarray(compressed)
+        elif compressed.codec == "lz4":
+            array = np.frombuffer(lz4.frame.decompress(compressed.data, return_bytearray=True),
+                                  dtype=compressed.dtype).reshape(compressed.shape)
+        elif compressed.codec == "zstd":
+            if out is not None and out.flags.c_contiguous and out.dtype == np.dtype(compressed.dtype):
+                # Stream directly into the destination buffer without an intermediate copy.
+                out_bytes = memoryview(out.reshape(-1).view(np.uint8))
+                offset = 0
+                with zstandard.ZstdDecompressor().stream_reader(compressed.data) as reader:
+                    while offset < len(out_bytes):
+                        num_read = reader.readinto(out_bytes[offset:])
+                        if num_read == 0:
+                            break
+                        offset += num_read
+                return out
+            array = np.frombuffer(bytearray(zstandard.ZstdDecompressor().decompress(compressed.data)),
+                                  dtype=compressed.dtype).reshape(compressed.shape)
+        else:
+            array = np.frombuffer(compressed.data, dtype=compressed.dtype).reshape(compressed.shape)
+
+        if out is None:
+            return array
+        np.copyto(out, array)
+        return out
+
+
+class TrajectoryBuffer(object):
+    """
+    Preallocated rollout storage of shape [num_environments, capacity, ...] which workers fill in place, one
+    time step of all environments at a time.
+
+    Trajectories of all environments have the same length (`num_steps`), episodes ending within them are marked
+    by `episode_ends`. Flattened outputs are views of the storage if the buffer is full, so they are only valid
+    until the buffer is reset.
+    """
+    def __init__(self, num_environments, capacity, state_space, action_space):
+        """
+        Args:
+            num_environments (int): Number of environments.
+            capacity (int): Maximum number of time steps per environment.
+            state_space (Space): The (preprocessed) state space.
+            action_space (Union[Space,dict]): The action space or a dict of flat action spaces for container
+                actions.
+        """
+        self.num_environments = num_environments
+        self.state_space = state_space
+        self.action_space = action_space
+        self.container_actions = isinstance(action_space, dict)
+
+        self.capacity = 0
+        self.num_steps = 0
+        self.states = None
+        self.actions = None
+        self.rewards = None
+        self.terminals = None
+        # Terminals plus episodes cut off (e.g. by a time limit).
+        self.episode_ends = None
+        # States following the last time step of each episode and of each trajectory by (env, time step).
+        self.final_next_states = {}
+        self.allocate(capacity)
+
+    def allocate(self, capacity):
+        """
+        Reallocates the storage if `capacity` exceeds the current capacity. Stored time steps are discarded.
+        """
+        if capacity <= self.capacity:
+            return
+        self.capacity = capacity
+        shape = (self.num_environments, capacity)
+        self.states = np.zeros(shape=shape + tuple(self.state_space.shape), dtype=self.state_space.dtype)
+        if self.container_actions:
+            self.actions = {name: np.zeros(shape=shape + tuple(space.shape), dtype=space.dtype)
+                            for name, space in self.action_space.items()}
+        else:
+            self.actions = np.zeros(shape=shape + tuple(self.action_space.shape), dtype=self.action_space.dtype)
+        self.rewards = np.zeros(shape=shape)
+        self.terminals = np.zeros(shape=shape, dtype=np.bool_)
+        self.episode_ends = np.zeros(shape=shape, dtype=np.bool_)
+
+    def reset(self, capacity=None):
+        """
+        Discards all stored time steps.
+
+        Args:
+            capacity (Optional[int]): Number of time steps needed next, grows the storage if necessary.
+        """
+        if capacity is not None:
+            self.allocate(capacity)
+        self.num_steps = 0
+        self.final_next_states = {}
+
+    def add(self, states, actions, rewards, terminals):
+        """
+        Writes one time step of all environments.
+
+        Args:
+            states (np.ndarray): States acted on, one per environment.
+            actions (Union[np.ndarray,list,dict]): Actions, one per environment (or a dict of those).
+            rewards (list): Rewards, one per environment.
+            terminals (list): Terminal flags, one per environment.
+        """
+        t = self.num_steps
+        if t >= self.capacity:
+            raise RLGraphError("Trajectory buffer capacity of {} time steps exceeded.".format(self.capacity))
+        self.states[:, t] = states
+        if self.container_actions:
+            for name, action_array in self.actions.items():
+                action_array[:, t] = actions[name]
+        else:
+            self.actions[:, t] = actions
+        self.rewards[:, t] = rewards
+        self.terminals[:, t] = terminals
+        self.episode_ends[:, t] = terminals
+        self.num_steps += 1
+
+    def end_segment(self, env_index, next_state=None, episode_end=True):
+        """
+        Ends the running segment of an environment after the last written time step.
+
+        Args:
+            env_index (int): The environment.
+            next_state (Optional[np.ndarray]): The (preprocessed) state following the last time step. Only needed
+                to look up next states.
+            episode_end (bool): Whether the episode ended (False if only the trajectory ends here).
+        """
+        t = self.num_steps - 1
+        self.episode_ends[env_index, t] = self.episode_ends[env_index, t] or episode_end
+        if next_state is not None:
+            self.final_next_states[(env_index, t)] = next_state
+
+    def flat(self, array):
+        """
+        Returns:
+            np.ndarray: The stored time steps of `array` (one of the buffer's arrays), flattened env by env
+                into [num_environments * num_steps, ...]. A view if the buffer is full.
+        """
+        return array[:, :self.num_steps].reshape((-1,) + array.shape[2:])
+
+    def flat_actions(self):
+        if self.container_actions:
+            return {name: self.flat(action_array) for name, action_array in self.actions.items()}
+        return self.flat(self.actions)
+
+    def next_states(self, next_indices):
+        """
+        Looks up next states.
+
+        Args:
+            next_indices (np.ndarray): Per environment and time step, the time step whose next state to look up.
+
+        Returns:
+            np.ndarray: The next states, flattened like `flat`.
+        """
+        num_steps = self.num_steps
+        flat_indices = next_indices + num_steps * np.arange(self.num_environments)[:, None] + 1
+        next_states = self.flat(self.states)[np.minimum(flat_indices, self.num_environments * num_steps - 1)]
+        next_states = next_states.reshape((-1,) + self.states.shape[2:])
+        for (env_index, t), next_state in self.final_next_states.items():
+            # Any time step with n-step next index t uses the final next state.
+            positions = np.flatnonzero(next_indices[env_index] == t)
+            next_states[env_index * num_steps + positions] = next_state
+        return next_states
+
+
+def ray_compress_frames(states, num_frames=1, frame_cache=None, dtype=None):
+    """
+    Compresses states frame by frame so that frames shared between states (e.g. a state and the next state
+    of the previous transition, or overlapping frame stacks) are compressed once and referenced by the same
+    object.
+
+    Args:
+        states (Union[list,np.ndarray]): States to compress.
+        num_frames (int): Number of frames stacked along the last axis of each state. If > 1, each state
+            is split into `num_frames` frames.
+        frame_cache (Optional[dict]): Maps raw frame bytes to compressed frames. Pass the same dict to
+            several calls to share frames between them.
+        dtype (Optional[np.dtype]): Dtype to convert states to before compressing.
+
+    Returns:
+        list: One compressed frame per state if `num_frames` is 1, else one tuple of `num_frames` compressed
+            frames per state.
+    """
+    if frame_cache is None:
+        frame_cache = {}
+    compressed_states = []
+    for state in states:
+        state = np.asarray(state, dtype=dtype)
+        frames = np.split(state, num_frames, axis=-1) if num_frames > 1 else [state]
+        compressed_frames = []
+        for frame in frames:
+            key = frame.tobytes()
+            compressed_frame = frame_cache.get(key, None)
+            if compressed_frame is None:
+                compressed_frame = ray_compress(frame)
+                frame_cache[key] = compressed_frame
+            compressed_frames.append(compressed_frame)
+        compressed_states.append(tuple(compressed_frames) if num_frames > 1 else compressed_frames[0])
+    return compressed_states
+
+
+def ray_decompress_frames(data):
+    """
+    Decompresses a state compressed via `ray_compress_frames`, concatenating frame stacks along the last axis.
+
+    Args:
+        data (Union[str,bytes,tuple]): Compressed state or tuple of compressed frames.
+
+    Returns:
+        np.ndarray: Decompressed state.
+    """
+    if isinstance(data, tuple):
+        return np.concatenate([ray_decompress(frame) for frame in data], axis=-1)
+    return ray_decompress(data)
+
+
 # Ray's magic constant worker explorations..
 def worker_exploration(worker_index, num_workers):
     """
@@ -185,28 +834,160 @@ def worker_exploration(worker_index, num_workers):
     return 0.4 ** exponent
 
 
-def merge_samples(samples, decompress=False):
+def merge_samples(samples, decompress=False, num_threads=1):
     """
     Merges list of samples into a final batch.
+
+    Output arrays are sized from the samples' batch sizes and allocated once, each sample is copied
+    (and decompressed) into its slice.
+
     Args:
         samples (list): List of EnvironmentSamples
         decompress (bool): If true, assume states are compressed and decompress them.
+        num_threads (int): Number of threads decompressing states in parallel.
 
     Returns:
         dict: Sample batch of numpy arrays.
     """
-    batch = {}
-    sample_layout = samples[0].sample_batch
-    for key in sample_layout.keys():
-        # E.g. action dict.
-        if isinstance(sample_layout[key], dict):
-            batch[key] = {}
-            for name in sample_layout[key].keys():
-                batch[key][name] = np.concatenate([sample.sample_batch[key][name] for sample in samples])
-        else:
-            batch[key] = np.concatenate([sample.sample_batch[key] for sample in samples])
+    merger = SampleBatchMerger(capacity=sum(_num_sample_records(sample) for sample in samples),
+                               decompress=decompress, num_threads=num_threads)
+    for sample in samples:
+        merger.add(sample)
+    return merger.get_batch()
+
+
+def _num_sample_records(sample):
+    if sample.batch_size is not None:
+        return sample.batch_size
+    return len(sample.sample_batch["terminals"])
+
+
+# Thread pools for parallel decompression, by number of threads. Compression libraries release the GIL.
+_decompression_pools = {}
 
-    if decompress:
-        assert "states" in batch
-        batch["states"] = np.asarray([ray_decompress(state) for state in batch["states"]])
-    return batch
+
+def _get_decompression_pool(num_threads):
+    if num_threads not in _decompression_pools:
+        _decompression_pools[num_threads] = multiprocessing.pool.ThreadPool(processes=num_threads)
+    return _decompression_pools[num_threads]
+
+
+def _decompress_states_into(states, out):
+    for i, state in enumerate(states):
+        out[i] = ray_decompress_frames(state)
+
+
+class SampleBatchMerger(object):
+    """
+    Merges EnvironmentSamples into one sample batch as they arrive, copying (and decompressing) each sample
+    into its slice of preallocated output arrays instead of concatenating all samples at the end.
+    """
+    def __init__(self, capacity, decompress=False, num_threads=1):
+        """
+        Args:
+            capacity (int): Expected total number of records. Output arrays grow if more records are added.
+            decompress (bool): If true, assume states are compressed and decompress them.
+            num_threads (int): Number of threads decompressing into the output arrays in parallel. If 1,
+                samples are decompressed when added.
+        """
+        self.capacity = capacity
+        self.decompress = decompress
+        self.num_records = 0
+        self.batch = {}
+        self.num_threads = num_threads
+        self.pool = _get_decompression_pool(num_threads) if num_threads > 1 else None
+        # Pending asynchronous decompressions writing into the output arrays.
+        self.pending = []
+
+    def add(self, sample):
+        """
+        Copies a sample into the output arrays.
+
+        Args:
+            sample (EnvironmentSample): Sample to add.
+        """
+        sample_batch = sample.sample_batch
+        num_records = _num_sample_records(sample)
+        if num_records == 0:
+            return
+        start = self.num_records
+        end = start + num_records
+        if end > self.capacity:
+            self._grow(max(end, 2 * self.capacity))
+
+        for key, value in sample_batch.items():
+            # E.g. action dict.
+            if isinstance(value, dict):
+                columns = self.batch.setdefault(key, {})
+                for name, sub_value in value.items():
+                    self._insert(columns, name, sub_value, start, end, decompress=False)
+            else:
+                self._insert(self.batch, key, value, start, end, decompress=self.decompress and key == "states")
+        self.num_records = end
+
+    def get_batch(self):
+        """
+        Returns:
+            dict: Sample batch of numpy arrays (views of the output arrays) holding all records added so far.
+        """
+        self._wait()
+        batch = {}
+        for key, column in self.batch.items():
+            if isinstance(column, dict):
+                batch[key] = {name: sub_column[:self.num_records] for name, sub_column in column.items()}
+            else:
+                batch[key] = column[:self.num_records]
+        return batch
+
+    def _column(self, columns, key, shape, dtype):
+        if key not in columns:
+            columns[key] = np.empty(shape=(self.capacity,) + tuple(shape), dtype=dtype)
+        return columns[key]
+
+    def _insert(self, columns, key, value, start, end, decompress):
+        if isinstance(value, CompressedArray):
+            # Batch-compressed: Decompress directly into the output slice.
+            column = self._column(columns, key, value.shape[1:], value.dtype)
+            if self.pool is None:
+                TransportCodec.decompress(value, out=column[start:end])
+            else:
+                self.pending.append(self.pool.apply_async(TransportCodec.decompress, (value, column[start:end])))
+        elif decompress and not isinstance(value, np.ndarray):
+            # Individually compressed states: The first state determines shape and dtype of the output.
+            state = np.asarray(ray_decompress_frames(value[0]))
+            column = self._column(columns, key, state.shape, state.dtype)
+            column[start] = state
+            if self.pool is None:
+                _decompress_states_into(value[1:], column[start + 1:end])
+            else:
+                # Split into one chunk per thread.
+                chunk_size = max(1, int(np.ceil((len(value) - 1) / float(self.num_threads))))
+                for chunk_start in range(1, len(value), chunk_size):
+                    chunk_end = min(chunk_start + chunk_size, len(value))
+                    self.pending.append(self.pool.apply_async(_decompress_states_into, (
+                        value[chunk_start:chunk_end], column[start + chunk_start:start + chunk_end]
+                    )))
+        else:
+            value = np.asarray(value)
+            column = self._column(columns, key, value.shape[1:], value.dtype)
+            column[start:end] = value
+
+    def _wait(self):
+        for result in self.pending:
+            # Re-raises errors of the decompression.
+            result.get()
+        self.pending = []
+
+    def _grow(self, capacity):
+        self._wait()
+        def grow(column):
+            grown = np.empty(shape=(capacity,) + column.shape[1:], dtype=column.dtype)
+            grown[:self.num_records] = column[:self.num_records]
+            return grown
+
+        for key, column in self.batch.items():
+            if isinstance(column, dict):
+                self.batch[key] = {name: grow(sub_column) for name, sub_column in column.items()}
+            else:
+                self.batch[key] = grow(column)
+        self.capacity = capacity
@@ -23,12 +23,15 @@ from six.moves import xrange as range_
 
 from rlgraph.utils import util
 from rlgraph import get_distributed_backend
+from rlgraph.utils.numpy import n_step_discount
+from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.util import SMALL_NUMBER
+from rlgraph.environments import VectorEnv
 from rlgraph.environments.sequential_vector_env import SequentialVectorEnv
 from rlgraph.execution.environment_sample import EnvironmentSample
 from rlgraph.execution.ray import RayExecutor
 from rlgraph.execution.ray.ray_actor import RayActor
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.ray.ray_util import ray_compress, ray_compress_frames, TrajectoryBuffer
 
 if get_distributed_backend() == "ray":
     import ray
@@ -61,11 +64,21 @@ class RayValueWorker(RayActor):
         self.worker_sample_size = worker_spec.pop("worker_sample_size") * self.num_environments
         self.worker_executes_postprocessing = worker_spec.pop("worker_executes_postprocessing", True)
         self.n_step_adjustment = worker_spec.pop("n_step_adjustment", 1)
+        # Compress each distinct frame once and share it between states and next states (and between
+        # overlapping frame stacks if states stack `num_stacked_frames` frames along their last axis).
+        self.deduplicate_frames = worker_spec.pop("deduplicate_frames", False)
+        self.num_stacked_frames = worker_spec.pop("num_stacked_frames", 1)
         self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         num_background_envs = worker_spec.pop("num_background_envs", 1)
 
-        # TODO from spec once we decided on generic vectorization.
-        self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        # Optional VectorEnv spec, e.g. dict(type="subproc-vector") to step environments in worker processes.
+        vector_env_spec = worker_spec.pop("vector_env_spec", None)
+        if vector_env_spec is None:
+            self.vector_env = SequentialVectorEnv(self.num_environments, env_spec, num_background_envs)
+        else:
+            self.vector_env = VectorEnv.from_spec(
+                vector_env_spec, env_spec=env_spec, num_environments=self.num_environments
+            )
 
         # Then update agent config.
         agent_config['state_space'] = self.vector_env.state_space
@@ -98,6 +111,9 @@ class RayValueWorker(RayActor):
             )
             self.is_preprocessed[env_id] = False
         self.agent = self.setup_agent(agent_config, worker_spec)
+        # Version and (for delta syncs) decoded values of the weights last set, see `RayWeightSync`.
+        self.weights_version = None
+        self.weights_reference = None
         self.worker_frameskip = frameskip
 
         #  Flag for container actions.
@@ -129,6 +145,12 @@ class RayValueWorker(RayActor):
             shape=(self.num_environments,) + self.agent.preprocessed_state_space.shape,
             dtype=self.agent.preprocessed_state_space.dtype
         )
+        # Rollouts are written in place into preallocated [num_envs, num_timesteps, ...] arrays.
+        self.trajectory_buffer = TrajectoryBuffer(
+            self.num_environments, int(np.ceil(self.worker_sample_size / self.num_environments)),
+            self.agent.preprocessed_state_space,
+            self.agent.flat_action_space if self.container_actions else self.agent.action_space
+        )
         self.last_ep_timesteps = [0 for _ in range_(self.num_environments)]
         self.last_ep_rewards = [0 for _ in range_(self.num_environments)]
         self.last_ep_start_timestamps = [0.0 for _ in range_(self.num_environments)]
@@ -203,28 +225,11 @@ class RayValueWorker(RayActor):
         episodes_executed = [0 for _ in range_(self.num_environments)]
         env_frames = 0
         last_episode_rewards = []
-        # Final result batch.
-        if self.container_actions:
-            batch_actions = {k: [] for k in self.action_space.keys()}
-        else:
-            batch_actions = []
-        batch_states, batch_rewards, batch_next_states, batch_terminals = [], [], [], []
-
-        # Running trajectories.
-        sample_states, sample_actions, sample_rewards, sample_terminals = {}, {}, {}, {}
+        # Running trajectories of all environments, one time step per loop iteration.
+        trajectories = self.trajectory_buffer
+        trajectories.reset(capacity=int(np.ceil(num_timesteps / self.num_environments)))
         next_states = [np.zeros_like(self.last_states) for _ in range_(self.num_environments)]
 
-        # Reset envs and Agent either if finished an episode in current loop or if last state
-        # from previous execution was terminal for that environment.
-        for i, env_id in enumerate(self.env_ids):
-            sample_states[env_id] = []
-            if self.container_actions:
-                sample_actions[env_id] = {k: [] for k in self.action_space.keys()}
-            else:
-                sample_actions[env_id] = []
-            sample_rewards[env_id] = []
-            sample_terminals[env_id] = []
-
         env_states = self.last_states
         current_episode_rewards = self.last_ep_rewards
         current_episode_timesteps = self.last_ep_timesteps
@@ -279,22 +284,14 @@ class RayValueWorker(RayActor):
             current_iteration_time = time.perf_counter() - current_iteration_start_timestamp
 
             # Do accounting for each environment.
-            state_buffer = np.array(self.preprocessed_states_buffer)
+            trajectories.add(self.preprocessed_states_buffer, actions if self.container_actions else env_actions,
+                             step_rewards, terminals)
             for i, env_id in enumerate(self.env_ids):
                 # Set is preprocessed to False because env_states are currently NOT preprocessed.
                 self.is_preprocessed[env_id] = False
                 current_episode_timesteps[i] += 1
                 # Each position is the running episode reward of that episode. Add step reward.
                 current_episode_rewards[i] += step_rewards[i]
-                sample_states[env_id].append(state_buffer[i])
-
-                if self.container_actions:
-                    for name in self.action_space.keys():
-                        sample_actions[env_id][name].append(env_actions[i][name])
-                else:
-                    sample_actions[env_id].append(env_actions[i])
-                sample_rewards[env_id].append(step_rewards[i])
-                sample_terminals[env_id].append(terminals[i])
                 current_episode_sample_times[i] += current_iteration_time
 
                 # Terminate and reset episode for that environment.
@@ -307,43 +304,11 @@ class RayValueWorker(RayActor):
                     self.episodes_executed += 1
                     last_episode_rewards.append(current_episode_rewards[i])
 
-                    env_sample_states = sample_states[env_id]
-                    # Get next states for this environment's trajectory.
-                    env_sample_next_states = env_sample_states[1:]
-
                     next_state, _ = self.agent.state_space.force_batch(next_states[i])
                     if self.preprocessors[env_id] is not None:
                         next_state = self.preprocessors[env_id].preprocess(next_state)
-
-                    # Extend because next state has a batch dim.
-                    env_sample_next_states.extend(next_state)
-
-                    # Post-process this trajectory via n-step discounting.
-                    # print("processing terminal episode of length:", len(env_sample_states))
-                    post_s, post_a, post_r, post_next_s, post_t = self._truncate_n_step(env_sample_states,
-                        sample_actions[env_id], sample_rewards[env_id], env_sample_next_states,
-                        sample_terminals[env_id], was_terminal=True)
-
-                    # Append to final result trajectories.
-                    batch_states.extend(post_s)
-                    if self.agent.flat_action_space is not None:
-                        # Use actions here, not env actions.
-                        for name in self.agent.flat_action_space.keys():
-                            batch_actions[name].extend(post_a[name])
-                    else:
-                        batch_actions.extend(post_a)
-                    batch_rewards.extend(post_r)
-                    batch_next_states.extend(post_next_s)
-                    batch_terminals.extend(post_t)
-
-                    # Reset running trajectory for this env.
-                    sample_states[env_id] = []
-                    if self.container_actions:
-                        sample_actions[env_id] = {k: [] for k in self.action_space.keys()}
-                    else:
-                        sample_actions[env_id] = []
-                    sample_rewards[env_id] = []
-                    sample_terminals[env_id] = []
+                    # Remove the batch dim.
+                    trajectories.end_segment(i, next_state[0], episode_end=True)
 
                     # Reset this environment and its pre-processor stack.
                     env_states[i] = self.vector_env.reset(i)
@@ -373,11 +338,8 @@ class RayValueWorker(RayActor):
         # We already accounted for all terminated episodes. This means we only
         # have to do accounting for any unfinished fragments.
         for i, env_id in enumerate(self.env_ids):
-            # This env was not terminal -> need to process remaining trajectory
-            if not terminals[i]:
-                env_sample_states = sample_states[env_id]
-                # Get next states for this environment's trajectory.
-                env_sample_next_states = env_sample_states[1:]
+            # This env's episode is still running -> need to process remaining trajectory
+            if not trajectories.episode_ends[i, trajectories.num_steps - 1]:
                 next_state, _ = self.agent.state_space.force_batch(next_states[i])
                 if self.preprocessors[env_id] is not None:
                     next_state = self.preprocessors[env_id].preprocess(next_state)
@@ -385,25 +347,11 @@ class RayValueWorker(RayActor):
                     # by adding to buffer.
                     self.preprocessed_states_buffer[i] = np.array(next_state)
                     self.is_preprocessed[env_id] = True
-
-                # Extend because next state has a batch dim.
-                env_sample_next_states.extend(next_state)
-                post_s, post_a, post_r, post_next_s, post_t = self._truncate_n_step(env_sample_states,
-                    sample_actions[env_id], sample_rewards[env_id], env_sample_next_states,
-                    sample_terminals[env_id], was_terminal=False)
-
-                batch_states.extend(post_s)
-                if self.agent.flat_action_space is not None:
-                    # Use actions here, not env actions.
-                    for name in self.agent.flat_action_space.keys():
-                        batch_actions[name].extend(post_a[name])
-                else:
-                    batch_actions.extend(post_a)
-                batch_rewards.extend(post_r)
-                batch_next_states.extend(post_next_s)
-                batch_terminals.extend(post_t)
+                trajectories.end_segment(i, next_state[0], episode_end=False)
 
         # Perform final batch-processing once.
+        batch_states, batch_actions, batch_rewards, batch_next_states, batch_terminals = \
+            self._truncate_n_step(trajectories)
         sample_batch, batch_size = self._batch_process_sample(batch_states, batch_actions,
                                                               batch_rewards, batch_next_states, batch_terminals)
 
@@ -435,11 +383,18 @@ class RayValueWorker(RayActor):
         return sample, {"batch_size": sample.batch_size, "last_rewards": sample.metrics["last_rewards"]}
 
     def set_weights(self, weights):
-        policy_weights = {k: v for k,v in zip(weights.policy_vars, weights.policy_values)}
-        vf_weights = None
-        if weights.has_vf:
-            vf_weights = {k: v for k, v in zip(weights.value_function_vars, weights.value_function_values)}
+        # Skip weights already held (versioned weights only).
+        if weights.version is not None and weights.version == self.weights_version:
+            return
+        if weights.base_version is not None and weights.base_version != self.weights_version:
+            raise RLGraphError("Received delta weights for version {} but worker holds version {}.".format(
+                weights.base_version, self.weights_version
+            ))
+        policy_weights, vf_weights = weights.decode(self.weights_reference)
         self.agent.set_weights(policy_weights, value_function_weights=vf_weights)
+        self.weights_version = weights.version
+        # Keep decoded weights only if subsequent deltas are applied to them.
+        self.weights_reference = (policy_weights, vf_weights) if weights.keep_reference else None
 
     def get_workload_statistics(self):
         """
@@ -481,54 +436,35 @@ class RayValueWorker(RayActor):
             mean_worker_env_frames_per_second=sum(adjusted_frames) / sum(self.sample_times)
         )
 
-    def _truncate_n_step(self, states, actions, rewards, next_states, terminals, was_terminal=True):
+    def _truncate_n_step(self, trajectories):
         """
-        Computes n-step truncation for exactly one episode segment of one environment.
+        Computes n-step truncation for the trajectories of all environments at once.
+
+        Args:
+            trajectories (TrajectoryBuffer): The trajectories with all segments ended.
 
         Returns:
-             n-step truncated (shortened) version.
+             tuple: n-step truncated (shortened) states, actions, rewards, next states and terminals.
         """
-        if self.n_step_adjustment > 1:
-            new_len = len(states) - self.n_step_adjustment + 1
-
-            # There are 2 cases. If the trajectory did not end in a terminal,
-            # we just have to move states forward and truncate.
-            if was_terminal:
-                # We know the ONLY last terminal is True.
-                terminal_position = len(rewards) - 1
-                for i in range(len(rewards)):
-                    for j in range(1, self.n_step_adjustment):
-                        # Outside sample data. Stop inner loop and set truncate = True
-                        if i + j >= len(next_states):
-                            break
-                        # Normal case: No terminal ahead (so far) in n-step sequence.
-                        if i + j < terminal_position:
-                            next_states[i] = next_states[i + j]
-                            rewards[i] += self.discount ** j * rewards[i + j]
-                        # Terminal ahead: Don't go beyond it.
-                        # Repeat it for the remaining n-steps and always assume r=0.0.
-                        else:
-                            next_states[i] = next_states[terminal_position]
-                            terminals[i] = True
-                            if i + j <= terminal_position:
-                                rewards[i] += self.discount ** j * rewards[i + j]
+        num_steps = trajectories.num_steps
+        # Windows stop at episode ends (also if cut off by the episode time limit). Windows needing time steps
+        # after the end of a running episode's trajectory are dropped.
+        rewards, next_indices, terminals, complete = n_step_discount(
+            trajectories.rewards[:, :num_steps], trajectories.terminals[:, :num_steps], self.n_step_adjustment,
+            self.discount, episode_ends=trajectories.episode_ends[:, :num_steps]
+        )
+        complete = complete.reshape(-1)
+        states = trajectories.flat(trajectories.states)
+        actions = trajectories.flat_actions()
+        next_states = trajectories.next_states(next_indices)
+        rewards, terminals = rewards.reshape(-1), terminals.reshape(-1)
+        if not np.all(complete):
+            states, next_states, rewards, terminals = \
+                states[complete], next_states[complete], rewards[complete], terminals[complete]
+            if self.container_actions:
+                actions = {name: action_array[complete] for name, action_array in actions.items()}
             else:
-                # We know this segment does not contain any terminals so we simply have to adjust next
-                # states and rewards.
-                for i in range_(len(rewards) - self.n_step_adjustment + 1):
-                    for j in range_(1, self.n_step_adjustment):
-                        next_states[i] = next_states[i + j]
-                        rewards[i] += self.discount ** j * rewards[i + j]
-
-                if self.agent.flat_action_space is not None:
-                    for arr in [states, rewards, next_states, terminals]:
-                        del arr[new_len:]
-                    # Delete container actions separately.
-                    for name in self.agent.flat_action_space.keys():
-                        del actions[name][new_len:]
-                else:
-                    for arr in [states, actions, rewards, next_states, terminals]:
-                        del arr[new_len:]
+                actions = actions[complete]
 
         return states, actions, rewards, next_states, terminals
 
@@ -563,12 +499,21 @@ class RayValueWorker(RayActor):
             )
             weights = np.abs(loss_per_item) + SMALL_NUMBER
         env_dtype = self.vector_env.state_space.dtype
-        compressed_states = [ray_compress(np.asarray(state, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                             for state in states]
+        if self.deduplicate_frames:
+            # Next-state frames are looked up in the frame cache, so only frames never seen as part of
+            # a state are compressed again.
+            frame_cache = {}
+            np_dtype = util.convert_dtype(dtype=env_dtype, to='np')
+            compressed_states = ray_compress_frames(states, self.num_stacked_frames, frame_cache, dtype=np_dtype)
+            compressed_next_states = ray_compress_frames(next_states, self.num_stacked_frames, frame_cache,
+                                                         dtype=np_dtype)
+        else:
+            compressed_states = [ray_compress(np.asarray(state, dtype=util.convert_dtype(dtype=env_dtype, to='np')))
+                                 for state in states]
 
-        compressed_next_states = compressed_states[self.n_step_adjustment:] + \
-                                 [ray_compress(np.asarray(next_s,dtype=util.convert_dtype(dtype=env_dtype, to='np')))
-                                  for next_s in next_states[-self.n_step_adjustment:]]
+            compressed_next_states = compressed_states[self.n_step_adjustment:] + \
+                                     [ray_compress(np.asarray(next_s,dtype=util.convert_dtype(dtype=env_dtype, to='np')))
+                                      for next_s in next_states[-self.n_step_adjustment:]]
         if self.container_actions:
             for name in self.action_space.keys():
                 actions[name] = np.array(actions[name])
@@ -17,12 +17,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import numpy as np
+
 from rlgraph.environments import Environment
 from rlgraph.execution.ray.ray_policy_worker import RayPolicyWorker
 
 from rlgraph import get_distributed_backend
 from rlgraph.execution.ray.ray_executor import RayExecutor
-from rlgraph.execution.ray.ray_util import merge_samples, RayWeight
+from rlgraph.execution.ray.ray_util import RayWeightSync, SampleBatchMerger
 
 if get_distributed_backend() == "ray":
     import ray
@@ -66,6 +68,24 @@ class SyncBatchExecutor(RayExecutor):
         # These are the tasks actually interacting with the environment.
         self.worker_sample_size = self.executor_spec["num_worker_samples"]
 
+        # Versioned weight broadcast, optionally quantized (e.g. "float16") and/or sending deltas.
+        self.weight_sync = RayWeightSync(
+            dtype=self.executor_spec.get("weight_sync_dtype", None),
+            delta=self.executor_spec.get("weight_sync_delta", False)
+        )
+
+        # Rounds of sample tasks (one task per worker each) needed to form an update batch.
+        self.num_sample_rounds = int(np.ceil(
+            self.update_batch_size / float(self.num_sample_workers * self.worker_sample_size)
+        ))
+        # If true, workers collect the next batch with the previous weights while the learner updates, i.e.
+        # update batches are sampled with weights one step stale.
+        self.async_sampling = self.executor_spec.get("async_sampling", False)
+        # Threads decompressing sample states into the update batch.
+        self.num_decompression_threads = self.executor_spec.get("num_decompression_threads", 1)
+        # Pending sample tasks of the next update batch.
+        self.sample_tasks = []
+
         assert not ray_spec, "ERROR: ray_spec still contains items: {}".format(ray_spec)
         self.logger.info("Setting up execution for Apex executor.")
         self.setup_execution()
@@ -91,35 +111,22 @@ class SyncBatchExecutor(RayExecutor):
 
         - Sync weights to policy workers.
         - Schedule a set of samples
-        - Wait until enough samples tasks are complete to form an update batch
-        - Merge samples
+        - Merge samples into the update batch as sample tasks complete
         - Perform local update(s)
+
+        With `async_sampling`, the samples of the next step are scheduled before the update.
         """
-        # Env steps done during this rollout.
-        env_steps = 0
+        # 1. Sync local learners weights to remote workers and schedule samples (in async mode, the samples
+        # of this step were already scheduled during the last step).
+        if not self.async_sampling or len(self.sample_tasks) == 0:
+            self._schedule_samples()
 
-        # 1. Sync local learners weights to remote workers.
-        weights = ray.put(RayWeight(self.local_agent.get_weights()))
-        for ray_worker in self.ray_env_sample_workers:
-            ray_worker.set_weights.remote(weights)
-
-        # 2. Schedule samples and fetch results from RayWorkers.
-        sample_batches = []
-        num_samples = 0
-        while num_samples < self.update_batch_size:
-            batches = ray.get([worker.execute_and_get_timesteps.remote(self.worker_sample_size)
-                              for worker in self.ray_env_sample_workers])
-            # Each batch has exactly worker_sample_size length.
-            num_samples += len(batches) * self.worker_sample_size
-            sample_batches.extend(batches)
-
-        env_steps += num_samples
-        # 3. Merge samples
-        rewards = []
-        for sample in sample_batches:
-            if len(sample.metrics["last_rewards"]) > 0:
-                rewards.extend(sample.metrics["last_rewards"])
-        batch = merge_samples(sample_batches, decompress=self.compress_states)
+        # 2. Fetch samples as they complete and merge them into the update batch.
+        batch, env_steps, rewards = self._collect_samples()
+
+        # 3. In async mode, workers sample the next batch with the current weights while the learner updates.
+        if self.async_sampling:
+            self._schedule_samples()
 
         # 4. Update from merged batch.
         self.local_agent.update(batch, apply_postprocessing=False)
@@ -129,4 +136,41 @@ class SyncBatchExecutor(RayExecutor):
             "rewards": rewards
         }
 
+    def _schedule_samples(self):
+        """
+        Syncs the local learner's weights to the sample workers and schedules enough sample tasks
+        to form an update batch.
+        """
+        self.weight_sync.publish(self.local_agent.get_weights())
+        for ray_worker in self.ray_env_sample_workers:
+            self.weight_sync.sync(ray_worker)
+        for _ in range(self.num_sample_rounds):
+            self.sample_tasks.extend([worker.execute_and_get_timesteps.remote(self.worker_sample_size)
+                                      for worker in self.ray_env_sample_workers])
+
+    def _collect_samples(self):
+        """
+        Waits for the scheduled sample tasks and merges their samples into preallocated arrays as they arrive.
 
+        Returns:
+            tuple: Merged sample batch, number of env steps sampled, last rewards of finished episodes.
+        """
+        merger = SampleBatchMerger(capacity=len(self.sample_tasks) * self.worker_sample_size,
+                                   decompress=self.compress_states, num_threads=self.num_decompression_threads)
+        rewards = []
+        env_steps = 0
+        pending = self.sample_tasks
+        self.sample_tasks = []
+        while pending:
+            ready, pending = ray.wait(pending, num_returns=1)
+            # Also fetch all other completed tasks in the same call.
+            if pending:
+                more_ready, pending = ray.wait(pending, num_returns=len(pending), timeout=0)
+                ready.extend(more_ready)
+            for sample in ray.get(ready):
+                merger.add(sample)
+                # Each batch has exactly worker_sample_size length.
+                env_steps += self.worker_sample_size
+                if len(sample.metrics["last_rewards"]) > 0:
+                    rewards.extend(sample.metrics["last_rewards"])
+        return merger.get_batch(), env_steps, rewards
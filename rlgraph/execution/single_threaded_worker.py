@@ -29,7 +29,20 @@ from rlgraph.utils.util import default_dict
 
 class SingleThreadedWorker(Worker):
 
-    def __init__(self, preprocessing_spec=None, worker_executes_preprocessing=True, **kwargs):
+    def __init__(self, preprocessing_spec=None, worker_executes_preprocessing=True, min_ready_envs=None,
+                 batch_preprocessing=False, **kwargs):
+        """
+        Args:
+            preprocessing_spec (Optional[list]): Preprocessor specs applied by the worker if
+                `worker_executes_preprocessing` is True.
+            worker_executes_preprocessing (bool): Whether to preprocess states in the worker instead of the agent.
+            min_ready_envs (Optional[int]): If given, environments are stepped asynchronously: each iteration acts
+                only for the environments whose step has finished and continues as soon as at least
+                `min_ready_envs` environments are ready again. None to step all environments in lockstep.
+            batch_preprocessing (bool): Whether the worker preprocesses the states of all environments in one
+                call to a single preprocessor stack (holding per-environment state, e.g. Sequence histories, in
+                its batch-slots) instead of one call per environment. Requires lockstep stepping.
+        """
         super(SingleThreadedWorker, self).__init__(**kwargs)
 
         self.logger.info("Initialized single-threaded executor with {} environments '{}' and Agent '{}'".format(
@@ -40,12 +53,23 @@ class SingleThreadedWorker(Worker):
         if preprocessing_spec is None or preprocessing_spec == []:
             worker_executes_preprocessing = False
 
+        if batch_preprocessing and min_ready_envs is not None:
+            raise RLGraphError("Batched worker preprocessing (`batch_preprocessing`) requires lockstep stepping.")
+
         self.preprocessed_states_buffer = None
         self.worker_executes_preprocessing = worker_executes_preprocessing
+        self.batch_preprocessing = batch_preprocessing and worker_executes_preprocessing
+        # Single stack preprocessing all environments at once (batch-slot i = environment i).
+        self.batch_preprocessor = None
+        if self.batch_preprocessing:
+            self.batch_preprocessor = self.setup_preprocessor(
+                preprocessing_spec, self.vector_env.state_space.with_batch_rank()
+            )
+            self.batch_state_is_preprocessed = False
         if self.worker_executes_preprocessing:
             self.preprocessors = {}
             self.state_is_preprocessed = {}
-            for env_id in self.env_ids:
+            for env_id in ([] if self.batch_preprocessing else self.env_ids):
                 self.preprocessors[env_id] = self.setup_preprocessor(
                     preprocessing_spec, self.vector_env.state_space.with_batch_rank()
                 )
@@ -75,6 +99,13 @@ class SingleThreadedWorker(Worker):
         # The current state of the running episode.
         self.env_states = [None for _ in range_(self.num_environments)]
 
+        self.min_ready_envs = min_ready_envs
+        # Environments without a step in flight (all of them when stepping in lockstep).
+        self.ready_envs = list(range_(self.num_environments))
+        # The (preprocessed) state acted on and the action of the last step started per environment.
+        self.acted_states = [None for _ in range_(self.num_environments)]
+        self.acted_actions = [None for _ in range_(self.num_environments)]
+
     @staticmethod
     def setup_preprocessor(preprocessing_spec, in_space):
         if preprocessing_spec is not None:
@@ -178,6 +209,8 @@ class SingleThreadedWorker(Worker):
         num_episodes = num_episodes or 0
         max_timesteps_per_episode = [max_timesteps_per_episode or 0 for _ in range_(self.num_environments)]
         frameskip = frameskip or self.frameskip
+        if self.min_ready_envs is not None and frameskip > 1:
+            raise RLGraphError("Asynchronous environment stepping (`min_ready_envs`) does not support frameskip.")
 
         # Stats.
         timesteps_executed = 0
@@ -197,9 +230,16 @@ class SingleThreadedWorker(Worker):
                 self.episode_timesteps[i] = 0
                 self.episode_terminals[i] = False
                 self.episode_starts[i] = time.perf_counter()
-                if self.worker_executes_preprocessing:
+                if self.worker_executes_preprocessing and not self.batch_preprocessing:
                     self.state_is_preprocessed[env_id] = False
 
+            if self.batch_preprocessing:
+                self.batch_preprocessor.reset()
+                self.batch_state_is_preprocessed = False
+            if self.min_ready_envs is not None:
+                # Discard steps still in flight from a previous run.
+                self.vector_env.step_wait()
+                self.ready_envs = list(range_(self.num_environments))
             self.env_states = self.vector_env.reset_all()
             self.agent.reset()
         elif self.env_states[0] is None:
@@ -213,8 +253,21 @@ class SingleThreadedWorker(Worker):
 
             time_percentage = min(self.agent.timesteps / max_timesteps, 1.0)
 
-            if self.worker_executes_preprocessing:
-                for i, env_id in enumerate(self.env_ids):
+            ready_envs = self.ready_envs
+            num_ready = len(ready_envs)
+            if self.batch_preprocessing:
+                if self.batch_state_is_preprocessed is False:
+                    self.preprocessed_states_buffer = list(self.batch_preprocessor.preprocess(np.asarray(env_states)))
+                    self.batch_state_is_preprocessed = True
+                ready_states = self.preprocessed_states_buffer
+                actions = self.agent.get_action(
+                    states=ready_states, use_exploration=use_exploration, apply_preprocessing=False,
+                    time_percentage=time_percentage
+                )
+                preprocessed_states = np.array(ready_states)
+            elif self.worker_executes_preprocessing:
+                for i in ready_envs:
+                    env_id = self.env_ids[i]
                     state, _ = self.agent.state_space.force_batch(env_states[i])
                     if self.preprocessors[env_id] is not None:
                         if self.state_is_preprocessed[env_id] is False:
@@ -222,48 +275,69 @@ class SingleThreadedWorker(Worker):
                             self.state_is_preprocessed[env_id] = True
                     else:
                         self.preprocessed_states_buffer[i] = env_states[i]
+                ready_states = [self.preprocessed_states_buffer[i] for i in ready_envs]
                 # TODO extra returns when worker is not applying preprocessing.
                 actions = self.agent.get_action(
-                    states=self.preprocessed_states_buffer, use_exploration=use_exploration,
+                    states=ready_states, use_exploration=use_exploration,
                     apply_preprocessing=not self.worker_executes_preprocessing, time_percentage=time_percentage
                 )
-                preprocessed_states = np.array(self.preprocessed_states_buffer)
+                preprocessed_states = np.array(ready_states)
             else:
                 actions, preprocessed_states = self.agent.get_action(
-                    states=np.array(env_states), use_exploration=use_exploration,
+                    states=np.array([env_states[i] for i in ready_envs]), use_exploration=use_exploration,
                     apply_preprocessing=True, extra_returns="preprocessed_states", time_percentage=time_percentage
                 )
                 preprocessed_states = horizontalize_space_sample(
-                    self.agent.preprocessed_state_space, preprocessed_states, self.num_environments
+                    self.agent.preprocessed_state_space, preprocessed_states, num_ready
                 )
 
-            # Accumulate the reward over n env-steps (equals one action pick). n=self.frameskip.
-            env_rewards = [0 for _ in range_(self.num_environments)]
-            next_states = None
-
-            env_actions = horizontalize_space_sample(self.agent.action_space, actions, self.num_environments)
-
-            for _ in range_(frameskip):
-                next_states, step_rewards, episode_terminals, _ = self.vector_env.step(actions=env_actions)
-
-                self.env_frames += self.num_environments
-                for i, step_reward in enumerate(step_rewards):
-                    env_rewards[i] += step_reward
-                if np.any(episode_terminals):
-                    break
+            env_actions = horizontalize_space_sample(self.agent.action_space, actions, num_ready)
+            for j, i in enumerate(ready_envs):
+                self.acted_states[i] = preprocessed_states[j]
+                self.acted_actions[i] = env_actions[j]
+
+            if self.min_ready_envs is None:
+                stepped_envs = ready_envs
+                # Accumulate the reward over n env-steps (equals one action pick). n=self.frameskip.
+                env_rewards = [0 for _ in range_(self.num_environments)]
+                next_states, step_terminals = None, None
+                for _ in range_(frameskip):
+                    next_states, step_rewards, step_terminals, _ = self.vector_env.step(actions=env_actions)
+
+                    self.env_frames += self.num_environments
+                    for i, step_reward in enumerate(step_rewards):
+                        env_rewards[i] += step_reward
+                    if np.any(step_terminals):
+                        break
+            else:
+                # Step the acted-on environments in the background and continue with those finished first.
+                self.vector_env.step_async(env_actions, env_indices=ready_envs)
+                stepped_envs, next_states, env_rewards, step_terminals, _ = self.vector_env.step_wait(
+                    min_ready=self.min_ready_envs
+                )
+                self.env_frames += len(stepped_envs)
 
             # Only render once per action.
             #if self.render:
             #    self.vector_env.environments[0].render()
 
-            for i, env_id in enumerate(self.env_ids):
-                self.episode_returns[i] += env_rewards[i]
+            # j indexes the step results, i the environment.
+            observed_next_states = []
+            reset_envs = []
+            if self.batch_preprocessing:
+                # Next states of all environments (incl. terminal ones) in one call.
+                batch_next_states = list(self.batch_preprocessor.preprocess(np.asarray(next_states)))
+            for j, i in enumerate(stepped_envs):
+                env_id = self.env_ids[i]
+                episode_terminals[i] = step_terminals[j]
+                self.episode_returns[i] += env_rewards[j]
                 self.episode_timesteps[i] += 1
 
                 if 0 < max_timesteps_per_episode[i] <= self.episode_timesteps[i]:
                     episode_terminals[i] = True
-                if self.worker_executes_preprocessing:
+                if self.worker_executes_preprocessing and not self.batch_preprocessing:
                     self.state_is_preprocessed[env_id] = False
+                next_state = next_states[j]
                 # Do accounting for finished episodes.
                 if episode_terminals[i]:
                     episodes_executed += 1
@@ -282,7 +356,9 @@ class SingleThreadedWorker(Worker):
 
                     # Reset this environment and its preprocecssor stack.
                     env_states[i] = self.vector_env.reset(i)
-                    if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
+                    reset_envs.append(i)
+                    if self.worker_executes_preprocessing and not self.batch_preprocessing and \
+                            self.preprocessors[env_id] is not None:
                         self.preprocessors[env_id].reset()
                         # This re-fills the sequence with the reset state.
                         state, _ = self.agent.state_space.force_batch(env_states[i])
@@ -295,17 +371,31 @@ class SingleThreadedWorker(Worker):
                     self.episode_starts[i] = time.perf_counter()
                 else:
                     # Otherwise assign states to next states
-                    env_states[i] = next_states[i]
-
-                if self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
-                    #next_state, _ = self.agent.state_space.force_batch(env_states[i])
-                    next_states[i] = np.array(self.preprocessors[env_id].preprocess(env_states[i]))  # next_state
-                self._observe(
-                    self.env_ids[i], preprocessed_states[i], env_actions[i], env_rewards[i], next_states[i],
-                    episode_terminals[i]
-                )
+                    env_states[i] = next_state
+
+                if self.batch_preprocessing:
+                    next_state = batch_next_states[j]
+                elif self.worker_executes_preprocessing and self.preprocessors[env_id] is not None:
+                    next_state = np.array(self.preprocessors[env_id].preprocess(env_states[i]))
+                observed_next_states.append(next_state)
+            if self.batch_preprocessing:
+                self.preprocessed_states_buffer = batch_next_states
+                if len(reset_envs) > 0:
+                    # Re-fill only the reset environments' slots with their reset states.
+                    self.batch_preprocessor.reset_slots(reset_envs)
+                    reset_states = self.batch_preprocessor.preprocess_slots(
+                        np.asarray([env_states[i] for i in reset_envs]), reset_envs
+                    )
+                    for i, state in zip(reset_envs, reset_states):
+                        self.preprocessed_states_buffer[i] = state
+            self._observe(
+                [self.env_ids[i] for i in stepped_envs], [self.acted_states[i] for i in stepped_envs],
+                [self.acted_actions[i] for i in stepped_envs], env_rewards, observed_next_states,
+                [episode_terminals[i] for i in stepped_envs]
+            )
+            self.ready_envs = list(stepped_envs)
             self.update_if_necessary(time_percentage=time_percentage)
-            timesteps_executed += self.num_environments
+            timesteps_executed += len(stepped_envs)
             num_timesteps_reached = (0 < num_timesteps <= timesteps_executed)
 
             if 0 < num_episodes <= episodes_executed or num_timesteps_reached:
@@ -375,10 +465,10 @@ class SingleThreadedWorker(Worker):
     def _observe(self, env_ids, states, actions, rewards, next_states, terminals):
         #print("states={} actions={} rewards={}".format(states, actions, rewards))
         # TODO: If worker does not execute preprocessing, next state is not preprocessed here.
-        # Observe per environment.
-        self.agent.observe(
+        # Observe one step of all given environments at once.
+        self.agent.observe_envs(
             preprocessed_states=states, actions=actions, internals=[],
             rewards=rewards, next_states=next_states,
-            terminals=terminals, env_id=env_ids
+            terminals=terminals, env_ids=env_ids
         )
 
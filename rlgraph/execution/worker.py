@@ -29,7 +29,7 @@ class Worker(Specifiable):
     """
     def __init__(self, agent, env_spec=None, num_environments=1, frameskip=1, render=False,
                  worker_executes_exploration=True, exploration_epsilon=0.1, episode_finish_callback=None,
-                 max_timesteps=None):
+                 max_timesteps=None, vector_env_spec=None):
         """
         Args:
             agent (Agent): Agent to execute environment on.
@@ -37,7 +37,7 @@ class Worker(Specifiable):
             env_spec Optional[Union[callable, dict]]): Either an environment spec or a callable returning a new
                 environment.
 
-            num_environments (int): How many single Environments should be run in parallel in a SequentialVectorEnv.
+            num_environments (int): How many single Environments should be run in parallel in a VectorEnv.
 
             frameskip (int): How often actions are repeated after retrieving them from the agent.
                 This setting can be overwritten in the single calls to the different `execute_..` methods.
@@ -52,6 +52,9 @@ class Worker(Specifiable):
                 This is not a forced limit, but serves to calculate the `time_percentage` value passed into
                 the Agent for time-dependent (decay) parameter calculations.
                 If None, Worker will try to infer this value automatically.
+
+            vector_env_spec (Optional[dict]): Spec of the VectorEnv running the `num_environments` environments,
+                e.g. dict(type="subproc-vector", num_processes=4). Default: SequentialVectorEnv.
         """
         super(Worker, self).__init__()
         self.num_environments = num_environments
@@ -63,9 +66,15 @@ class Worker(Specifiable):
             self.num_environments = self.vector_env.num_environments
             self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         # `Env_spec` is for single envs inside a SequentialVectorEnv.
-        elif env_spec is not None:
+        elif env_spec is not None and vector_env_spec is None:
             self.vector_env = SequentialVectorEnv(env_spec=env_spec, num_environments=self.num_environments)
             self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
+        # `Env_spec` is for single envs inside the given VectorEnv.
+        elif env_spec is not None:
+            self.vector_env = VectorEnv.from_spec(
+                vector_env_spec, env_spec=env_spec, num_environments=self.num_environments
+            )
+            self.env_ids = ["env_{}".format(i) for i in range_(self.num_environments)]
         # No env_spec.
         else:
             self.vector_env = None
@@ -0,0 +1,160 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from rlgraph import get_backend
+from rlgraph.spaces import Space
+
+# Marks Component attributes that are not part of a build cache key.
+_NOT_SERIALIZABLE = object()
+
+
+class BuildCache(object):
+    """
+    Persists build schedules of the GraphBuilder on disk, so processes building the same graph (e.g. many Ray
+    workers with the same agent config) can replay a schedule instead of iterating the build to a fixed point.
+
+    A build schedule records the order in which Components became input- and variable-complete and, for each
+    graph_fn call, how many Components were complete at the time of the call. Op-records and Spaces hold backend
+    ops and cannot be persisted, so they are still created on every build.
+    """
+    def __init__(self, directory):
+        """
+        Args:
+            directory (str): Directory to store build schedules in. Created if it does not exist.
+        """
+        self.directory = os.path.expanduser(directory)
+        self.logger = logging.getLogger(__name__)
+
+    # Component attributes that change during a build and thus must not be part of the key.
+    BUILD_STATE_ATTRIBUTES = {"input_complete", "variable_complete", "built"}
+
+    @staticmethod
+    def get_key(root_component, input_spaces):
+        """
+        Computes the cache key of a build from the Component tree, the configuration of each Component and the
+        input Spaces.
+
+        Args:
+            root_component (Component): The root Component of the meta-graph to build.
+            input_spaces (dict): Input Spaces of the build.
+
+        Returns:
+            str: The cache key.
+        """
+        components = root_component.get_all_sub_components(exclude_self=False)
+        structure = dict(
+            backend=get_backend(),
+            components=sorted(
+                [component.global_scope, type(component).__name__, sorted(component.api_methods.keys()),
+                 BuildCache.get_component_config(component)]
+                for component in components
+            ),
+            input_spaces=sorted([name, str(space)] for name, space in input_spaces.items())
+        )
+        return hashlib.sha1(json.dumps(structure, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_component_config(component):
+        """
+        Returns the public attributes of a Component that hold simple values (numbers, strings, Spaces and
+        containers thereof). These are mostly the Component's constructor arguments (e.g. layer units, sequence
+        lengths or optimizer settings), so Components of the same class and scope but with different configs
+        get different keys.
+
+        Args:
+            component (Component): The Component to get the configuration of.
+
+        Returns:
+            dict: JSON-serializable configuration.
+        """
+        config = {}
+        for name, value in vars(component).items():
+            if name.startswith("_") or name in BuildCache.BUILD_STATE_ATTRIBUTES:
+                continue
+            value = BuildCache._to_json(value)
+            if value is not _NOT_SERIALIZABLE:
+                config[name] = value
+        return config
+
+    @staticmethod
+    def _to_json(value):
+        """
+        Converts simple values to a JSON-serializable form. Returns `_NOT_SERIALIZABLE` for values that cannot be
+        converted (e.g. other Components or backend ops).
+        """
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        elif isinstance(value, np.generic):
+            return value.item()
+        elif isinstance(value, Space):
+            return str(value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            items = [BuildCache._to_json(item) for item in value]
+            if any(item is _NOT_SERIALIZABLE for item in items):
+                return _NOT_SERIALIZABLE
+            if isinstance(value, (set, frozenset)):
+                items = sorted(items, key=lambda item: json.dumps(item, sort_keys=True))
+            return items
+        elif isinstance(value, dict):
+            items = {str(key): BuildCache._to_json(item) for key, item in value.items()}
+            if any(item is _NOT_SERIALIZABLE for item in items.values()):
+                return _NOT_SERIALIZABLE
+            return items
+        return _NOT_SERIALIZABLE
+
+    def load(self, key):
+        """
+        Loads a build schedule.
+
+        Args:
+            key (str): Cache key as returned by `get_key`.
+
+        Returns:
+            Optional[dict]: The build schedule or None if there is no (readable) schedule for the key.
+        """
+        path = os.path.join(self.directory, key + ".json")
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            self.logger.warning("Could not read build schedule {}: {}".format(path, e))
+            return None
+
+    def store(self, key, schedule):
+        """
+        Stores a build schedule. Writes are atomic, so concurrently starting processes never read partial files.
+
+        Args:
+            key (str): Cache key as returned by `get_key`.
+            schedule (dict): Build schedule.
+        """
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(schedule, f)
+        os.replace(tmp_path, os.path.join(self.directory, key + ".json"))
@@ -0,0 +1,263 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import time
+
+
+class BuildProfiler(object):
+    """
+    Profiles a GraphBuilder build broken down by Component, API-method and graph_fn.
+
+    Records timed spans for completeness checks (`build_component_when_input_complete`), API-method calls made
+    during the build and graph_fn calls. Spans nest, so besides the total time of each span, its self-time (total
+    time minus the time of nested spans) is recorded. Per Component, also records the number of build iterations
+    it was checked in and when (time and build iteration) it became input- and variable-complete.
+
+    The profile can be exported as a JSON report or as a Chrome trace (load in chrome://tracing).
+    """
+    def __init__(self):
+        self.start_time = None
+        self.end_time = None
+        # Current build iteration (0=before the first iteration of the build loop) and its start time.
+        self.iteration = 0
+        self.iteration_start = None
+        # Open spans: [category, name, start time, time of nested spans].
+        self.span_stack = []
+        self.trace_events = []
+        # Stats per category ("component", "api_method", "graph_fn"), keyed by name.
+        self.stats = dict(component={}, api_method={}, graph_fn={})
+
+    def start(self):
+        """
+        Starts profiling a new build (discarding the profile of any previous build).
+        """
+        self.__init__()
+        self.start_time = time.perf_counter()
+
+    def finish(self):
+        """
+        Ends profiling the current build.
+        """
+        self.end_time = time.perf_counter()
+        self._end_iteration(self.end_time)
+
+    def start_iteration(self, iteration):
+        """
+        Args:
+            iteration (int): The build iteration that is starting.
+        """
+        now = time.perf_counter()
+        self._end_iteration(now)
+        self.iteration = iteration
+        self.iteration_start = now
+
+    def _end_iteration(self, now):
+        if self.iteration_start is not None:
+            self._add_trace_event(
+                "iteration {}".format(self.iteration), "iteration", self.iteration_start, now - self.iteration_start,
+                thread_id=1
+            )
+            self.iteration_start = None
+
+    def begin_component_check(self, component):
+        """
+        Starts a span for a completeness check of a Component.
+
+        Args:
+            component (Component): The Component being checked.
+        """
+        stats = self._get_stats("component", component.global_scope, component)
+        if stats["last_iteration"] != self.iteration:
+            stats["build_iterations"] += 1
+            stats["last_iteration"] = self.iteration
+        if stats["first_check_time"] is None:
+            stats["first_check_time"] = time.perf_counter() - self.start_time
+        self.begin("component", component.global_scope)
+
+    def end_component_check(self, component):
+        """
+        Ends the span of a completeness check and records whether the Component has become input- or
+        variable-complete.
+
+        Args:
+            component (Component): The Component being checked.
+        """
+        self.end()
+        stats = self.stats["component"][component.global_scope]
+        for kind in ["input_complete", "variable_complete"]:
+            if stats[kind + "_iteration"] is None and getattr(component, kind) is True:
+                now = time.perf_counter()
+                stats[kind + "_iteration"] = self.iteration
+                stats[kind + "_time"] = now - self.start_time
+                self._add_trace_event(
+                    "{} {}".format(component.global_scope, kind.replace("_", "-")), kind, now, None
+                )
+
+    def begin_api_method(self, component, api_method_name):
+        """
+        Starts a span for an API-method call made during the build.
+
+        Args:
+            component (Component): The Component owning the API-method.
+            api_method_name (str): The name of the API-method.
+        """
+        self._get_stats("api_method", component.global_scope + "/" + api_method_name, component)
+        self.begin("api_method", component.global_scope + "/" + api_method_name)
+
+    def begin_graph_fn(self, component, graph_fn):
+        """
+        Starts a span for a graph_fn call.
+
+        Args:
+            component (Component): The Component owning the graph_fn.
+            graph_fn (callable): The graph_fn.
+        """
+        self._get_stats("graph_fn", component.global_scope + "/" + graph_fn.__name__, component)
+        self.begin("graph_fn", component.global_scope + "/" + graph_fn.__name__)
+
+    def count_api_method_op_record(self, component, api_method_name):
+        """
+        Counts an op-record pushed into an API-method's in-column by the build loop.
+
+        Args:
+            component (Component): The Component owning the API-method.
+            api_method_name (str): The name of the API-method.
+        """
+        self._get_stats("api_method", component.global_scope + "/" + api_method_name, component)["num_op_records"] += 1
+
+    def begin(self, category, name):
+        """
+        Starts a span. Spans must be ended (via `end`) in reverse order.
+
+        Args:
+            category (str): One of "component", "api_method" or "graph_fn".
+            name (str): The name of the span's stats entry.
+        """
+        self.span_stack.append([category, name, time.perf_counter(), 0.0])
+
+    def end(self):
+        """
+        Ends the innermost span and adds its times to the respective stats entry.
+        """
+        category, name, start, nested_time = self.span_stack.pop()
+        duration = time.perf_counter() - start
+        if len(self.span_stack) > 0:
+            self.span_stack[-1][3] += duration
+        stats = self.stats[category][name]
+        stats["num_calls"] += 1
+        stats["time"] += duration
+        stats["self_time"] += duration - nested_time
+        self._add_trace_event(name, category, start, duration)
+
+    def _get_stats(self, category, name, component):
+        stats = self.stats[category].get(name, None)
+        if stats is None:
+            stats = dict(component=component.global_scope, num_calls=0, time=0.0, self_time=0.0)
+            if category == "component":
+                stats.update(
+                    type=type(component).__name__, nesting_level=component.nesting_level, build_iterations=0,
+                    last_iteration=None, first_check_time=None, input_complete_iteration=None,
+                    input_complete_time=None, variable_complete_iteration=None, variable_complete_time=None
+                )
+            elif category == "api_method":
+                stats["num_op_records"] = 0
+            self.stats[category][name] = stats
+        return stats
+
+    def _add_trace_event(self, name, category, start, duration, thread_id=0):
+        event = dict(
+            name=name, cat=category, ts=(start - self.start_time) * 1e6, pid=os.getpid(), tid=thread_id,
+            args=dict(iteration=self.iteration)
+        )
+        # Complete event (with duration) or global instant event.
+        if duration is not None:
+            event.update(ph="X", dur=duration * 1e6)
+        else:
+            event.update(ph="i", s="g")
+        self.trace_events.append(event)
+
+    def get_report(self):
+        """
+        Returns:
+            dict: The build profile with keys:
+                - total_build_time: Time from `start` to `finish`.
+                - num_iterations: Number of iterations of the build loop.
+                - components: Stats per Component (by global scope). `self_time` contains only the time spent in
+                  completeness checks, `total_self_time` also the self-times of its API-methods and graph_fns.
+                  `input_incomplete_time` is the time from the first completeness check until the Component
+                  became input-complete (or until the end of the build).
+                - api_methods: Stats per API-method (by "[global scope]/[API-method name]").
+                - graph_fns: Stats per graph_fn (by "[global scope]/[graph_fn name]").
+        """
+        end_time = self.end_time if self.end_time is not None else time.perf_counter()
+        total_build_time = end_time - self.start_time
+
+        components = {}
+        for name, stats in self.stats["component"].items():
+            stats = {key: value for key, value in stats.items() if key != "last_iteration"}
+            stats["total_self_time"] = stats["self_time"]
+            first_check_time = stats["first_check_time"] or 0.0
+            complete_time = stats["input_complete_time"]
+            stats["input_incomplete_time"] = (complete_time if complete_time is not None else total_build_time) - \
+                first_check_time
+            components[name] = stats
+        for category in ["api_method", "graph_fn"]:
+            for stats in self.stats[category].values():
+                if stats["component"] in components:
+                    components[stats["component"]]["total_self_time"] += stats["self_time"]
+
+        return dict(
+            total_build_time=total_build_time,
+            num_iterations=self.iteration,
+            components=components,
+            api_methods=dict(self.stats["api_method"]),
+            graph_fns=dict(self.stats["graph_fn"])
+        )
+
+    def get_top_components(self, num_components=10):
+        """
+        Args:
+            num_components (int): The number of Components to return.
+
+        Returns:
+            List[Tuple[str,dict]]: The Components (global scope and stats) with the largest `total_self_time`.
+        """
+        components = self.get_report()["components"]
+        return sorted(components.items(), key=lambda item: item[1]["total_self_time"], reverse=True)[:num_components]
+
+    def export_json(self, path):
+        """
+        Writes the report (see `get_report`) as JSON.
+
+        Args:
+            path (str): The file to write to.
+        """
+        with open(path, "w") as f:
+            json.dump(self.get_report(), f, indent=2, sort_keys=True)
+
+    def export_chrome_trace(self, path):
+        """
+        Writes all spans as Chrome trace (Trace Event Format). Spans of the build loop are on thread 0, build
+        iterations on thread 1.
+
+        Args:
+            path (str): The file to write to.
+        """
+        with open(path, "w") as f:
+            json.dump(dict(traceEvents=self.trace_events, displayTimeUnit="ms"), f)
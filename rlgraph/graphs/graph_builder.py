@@ -15,6 +15,7 @@
 
 from __future__ import absolute_import, division, print_function
 
+import heapq
 import inspect
 import logging
 import re
@@ -102,6 +103,17 @@ class GraphBuilder(Specifiable):
         self.op_records_to_process = set()
         self.op_recs_depending_on_variables = set()
 
+        # Build schedule replayed from a BuildCache (None: build to a fixed point) and the schedule recorded during
+        # the current build, see `build_graph`.
+        self.build_schedule = None
+        self.input_complete_components = []
+        self.variable_complete_components = []
+        self.graph_fn_calls = []
+        self.graph_fn_call_counts = {}
+
+        # Optional BuildProfiler recording per Component/API-method/graph_fn build stats (None: no profiling).
+        self.build_profiler = None
+
         # A register for all created placeholders by name.
         self.placeholders = {}
         # Our meta-graph from which to build the graph.
@@ -109,7 +121,7 @@ class GraphBuilder(Specifiable):
 
     def build_graph_with_options(self, meta_graph, input_spaces, available_devices,
                                  device_strategy="default", default_device=None,
-                                 device_map=None, build_options=None):
+                                 device_map=None, build_options=None, build_cache=None):
         """
         Builds graph with the given options. See build doc for build details.
 
@@ -122,11 +134,12 @@ class GraphBuilder(Specifiable):
             default_device (Optional[str]): Default device identifier.
             device_map (Optional[Dict]): Dict of Component names mapped to device names to place the Component's ops.
             build_options (Optional[Dict]): Dict of build options, e.g. default device handling for TF.
+            build_cache (Optional[BuildCache]): Cache to replay a build schedule from (or store it in).
         """
         # No device context options.
         if build_options is None or "build_device_context" not in build_options:
             return self.build_graph(meta_graph, input_spaces, available_devices,
-                                    device_strategy, default_device, device_map)
+                                    device_strategy, default_device, device_map, build_cache)
         else:
             if get_backend() == "tf":
                 # Need to be fully specified to avoid errors, no defaults.
@@ -137,16 +150,16 @@ class GraphBuilder(Specifiable):
                     with tf.device(default_device_context), \
                          pin_global_variables(pin_global):
                         return self.build_graph(meta_graph, input_spaces, available_devices,
-                                                device_strategy, default_device, device_map)
+                                                device_strategy, default_device, device_map, build_cache)
                 else:
                     with tf.device(default_device_context):
                         return self.build_graph(meta_graph, input_spaces, available_devices,
-                                                device_strategy, default_device, device_map)
+                                                device_strategy, default_device, device_map, build_cache)
             else:
                 raise RLGraphError("Build options are currently only available for TensorFlow.")
 
     def build_graph(self, meta_graph, input_spaces, available_devices,
-                    device_strategy="default", default_device=None, device_map=None):
+                    device_strategy="default", default_device=None, device_map=None, build_cache=None):
         """
         The actual iterative depth-first search algorithm to build our graph from the already existing
         meta-Graph structure.
@@ -156,6 +169,10 @@ class GraphBuilder(Specifiable):
         Replaces the ops in the set with the newly reached ones and re-iterates like this until all op-records
         in the entire meta-graph have been filled with actual ops.
 
+        If a build cache holds a schedule for this build, graph_fns are called as soon as their inputs and all
+        Components that were complete at the time of the call in the recorded build are complete, instead of
+        waiting for all API-method op-records to be processed first.
+
         Args:
             meta_graph (MetaGraph): MetaGraph to build to backend graph.
             input_spaces (dict): Input spaces to build for.
@@ -164,6 +181,7 @@ class GraphBuilder(Specifiable):
             device_strategy (Optional[str]): Device strategy.
             default_device (Optional[str]): Default device identifier.
             device_map (Optional[Dict]): Dict of Component names mapped to device names to place the Component's ops.
+            build_cache (Optional[BuildCache]): Cache to replay a build schedule from (or store it in).
         """
         self.meta_graph = meta_graph
 
@@ -178,6 +196,8 @@ class GraphBuilder(Specifiable):
 
         # Set the build phase to `building`.
         self.phase = "building"
+        if self.build_profiler is not None:
+            self.build_profiler.start()
 
         # Set devices usable for this graph.
         self.available_devices = available_devices
@@ -185,6 +205,17 @@ class GraphBuilder(Specifiable):
         self.default_device = default_device
         self.device_map = device_map or {}
 
+        # Record the build schedule and replay a cached one if available.
+        cache_key = None
+        self.build_schedule = None
+        if build_cache is not None:
+            cache_key = build_cache.get_key(self.root_component, input_spaces)
+            self.build_schedule = self._index_build_schedule(build_cache.load(cache_key))
+        self.input_complete_components = []
+        self.variable_complete_components = []
+        self.graph_fn_calls = []
+        self.graph_fn_call_counts = {}
+
         # Create the first actual ops based on the input-spaces.
         # Some ops can only be created later when variable-based-Spaces are known (op_recs_depending_on_variables).
         self.build_input_space_ops(input_spaces)
@@ -200,12 +231,12 @@ class GraphBuilder(Specifiable):
             self.op_records_to_process.update(component.constant_op_records)
             self.build_component_when_input_complete(component)
 
-        op_records_list = self._sort_op_recs(self.op_records_to_process)
-
         # Re-iterate until our bag of op-recs to process is empty.
-        iterations = self._build(op_records_list)
+        iterations = self._build(self.op_records_to_process)
         time_build = time.perf_counter() - time_start
-        self.logger.info("Computation-Graph build completed in {} s ({} iterations).".format(time_build, iterations))
+        self.logger.info("Computation-Graph build completed in {} s ({} iterations{}).".format(
+            time_build, iterations, ", replayed cached schedule" if self.build_schedule is not None else ""
+        ))
 
         # Get some stats on the graph and report.
         self.num_ops = self.count_ops()
@@ -217,16 +248,28 @@ class GraphBuilder(Specifiable):
         # Sanity check the build.
         self.sanity_check_build()
 
+        if build_cache is not None and self.build_schedule is None:
+            build_cache.store(cache_key, dict(
+                input_complete_components=self.input_complete_components,
+                variable_complete_components=self.variable_complete_components,
+                graph_fn_calls=self.graph_fn_calls
+            ))
+
         # The build here is the actual build overhead, so build time minus the tensorflow calls and variable
         # creations which would have to happen either way.
         build_overhead = time_build - sum(self.graph_call_times) - sum(self.var_call_times)
 
-        return dict(
+        build_stats = dict(
             build_overhead=build_overhead,
             total_build_time=time_build,
             op_creation=sum(self.graph_call_times),
-            var_creation=sum(self.var_call_times)
+            var_creation=sum(self.var_call_times),
+            build_iterations=iterations
         )
+        if self.build_profiler is not None:
+            self.build_profiler.finish()
+            build_stats["build_profile"] = self.build_profiler.get_report()
+        return build_stats
 
     def build_input_space_ops(self, input_spaces):
         """
@@ -323,6 +366,25 @@ class GraphBuilder(Specifiable):
         return placeholder
 
     def build_component_when_input_complete(self, component, check_sub_components=True):
+        """
+        Checks whether a Component is input-complete and, if so (and not done so already), creates its variables
+        and calls its no-input graph_fns. Then checks variable-completeness and calls the graph_fns that require it.
+
+        Args:
+            component (Component): The Component to check and build.
+            check_sub_components (bool): Whether to also check the sub-Components once `component` is
+                variable-complete.
+        """
+        if self.build_profiler is None:
+            return self._build_component_when_input_complete(component, check_sub_components)
+
+        self.build_profiler.begin_component_check(component)
+        try:
+            self._build_component_when_input_complete(component, check_sub_components)
+        finally:
+            self.build_profiler.end_component_check(component)
+
+    def _build_component_when_input_complete(self, component, check_sub_components=True):
         graph_fn_requiring_var_completeness = [gf.name for gf in component.graph_fns.values() if
                                                gf.requires_variable_completeness is True]
         # Not input complete yet -> Check now.
@@ -332,6 +394,7 @@ class GraphBuilder(Specifiable):
             if component.input_complete is True:
                 self.logger.debug("Component {} is input-complete; Spaces per API-method input parameter are: {}".
                                   format(component.name, component.api_method_inputs))
+                self.input_complete_components.append(component.global_scope)
                 device = self.get_device(component, variables=True)
                 # This builds variables which would have to be done either way:
                 call_time = time.perf_counter()
@@ -360,7 +423,10 @@ class GraphBuilder(Specifiable):
                         # Keep working with the generated output ops.
                         self.op_records_to_process.update(no_in_col.out_graph_fn_column.op_records)
 
+        was_variable_complete = component.variable_complete
         if component.input_complete is True and component.check_variable_completeness():
+            if was_variable_complete is False:
+                self.variable_complete_components.append(component.global_scope)
             # The graph_fn _variables has some in-op-columns that need to be run through the function.
             for graph_fn_name in graph_fn_requiring_var_completeness:
                 graph_fn_rec = component.graph_fns[graph_fn_name]
@@ -410,6 +476,12 @@ class GraphBuilder(Specifiable):
                     op_rec_column.id, op_rec_column.graph_fn.__name__)
             )
 
+        # Record the call with the number of Components complete so far.
+        call_name = op_rec_column.component.global_scope + "/" + op_rec_column.graph_fn.__name__
+        self.graph_fn_calls.append([self._graph_fn_call_key(op_rec_column), len(self.input_complete_components),
+                                    len(self.variable_complete_components)])
+        self.graph_fn_call_counts[call_name] = self.graph_fn_call_counts.get(call_name, 0) + 1
+
         # Get the device for the ops generated in the graph_fn (None for custom device-definitions within the graph_fn).
         device = self.get_device(op_rec_column.component, variables=False)
 
@@ -503,7 +575,15 @@ class GraphBuilder(Specifiable):
             TraceContext.CONTEXT_START = call_time
 
         component.start_summary_ops_buffer()
-        ops = graph_fn(component, *args, **kwargs)
+        if self.build_profiler is not None:
+            self.build_profiler.begin_graph_fn(component, graph_fn)
+        TraceContext.CALL_CONTEXT_STACK.append("graph_fn")
+        try:
+            ops = graph_fn(component, *args, **kwargs)
+        finally:
+            TraceContext.CALL_CONTEXT_STACK.pop()
+            if self.build_profiler is not None:
+                self.build_profiler.end()
         summary_ops = component.pop_summary_ops_buffer()
         if is_build_time and TraceContext.ACTIVE_CALL_CONTEXT is True:
             self.graph_call_times.append(time.perf_counter() - TraceContext.CONTEXT_START)
@@ -994,6 +1074,8 @@ class GraphBuilder(Specifiable):
         self.device_map = device_map or {}
         self.phase = "building"
         TraceContext.DEFINE_BY_RUN_CONTEXT = "building"
+        if self.build_profiler is not None:
+            self.build_profiler.start()
 
         # TODO device strategy in pytorch?
         # Build full registry of callable methods on root component.
@@ -1016,8 +1098,7 @@ class GraphBuilder(Specifiable):
             # Check whether the Component is input-complete (and build already if it is).
             self.build_component_when_input_complete(component)
 
-        op_records_list = self._sort_op_recs(self.op_records_to_process)
-        iterations = self._build(op_records_list)
+        iterations = self._build(self.op_records_to_process)
 
         # Set execution mode in components to change `call` behaviour to direct function evaluation.
         self.root_component.propagate_sub_component_properties(properties=dict(execution_mode="define_by_run"))
@@ -1030,26 +1111,67 @@ class GraphBuilder(Specifiable):
                          format(time_build, iterations))
         build_overhead = time_build - sum(self.graph_call_times) - sum(self.var_call_times)
         TraceContext.DEFINE_BY_RUN_CONTEXT = "execution"
-        return dict(
+        build_stats = dict(
             build_overhead=build_overhead,
             total_build_time=time_build,
             op_creation=sum(self.graph_call_times),
-            var_creation=sum(self.var_call_times)
+            var_creation=sum(self.var_call_times),
+            build_iterations=iterations
         )
+        if self.build_profiler is not None:
+            self.build_profiler.finish()
+            build_stats["build_profile"] = self.build_profiler.get_report()
+        return build_stats
 
-    def _build(self, op_records_list):
+    def _build(self, op_records):
         """
         Private implementation of the main build loop. For docs, see the respective build
         methods.
+
+        Op-recs are scheduled through two heaps ordered by `_op_rec_priority`: One for the op-recs reached in the
+        previous iteration and one for graph_fn op-recs waiting for their graph_fn to become callable. Each iteration
+        pops from both in priority order. While API-method op-recs are being processed, waiting op-recs would only be
+        recycled, so they stay in their heap and an iteration only costs as much as the newly reached op-recs.
+
+        When replaying a build schedule, the schedule decides when graph_fns may be called, so newly reached op-recs
+        are pushed into the current iteration's heap right away instead of waiting for the next iteration. Only
+        op-recs that have to wait for other Components to complete start a new iteration.
+
+        Args:
+            op_records (Iterable[DataOpRecord]): The op-recs to start building with.
+
+        Returns:
+            Optional[int]: The number of build iterations or None if the build got stuck.
         """
+        # Heaps of (priority, op-rec) tuples.
+        op_records_heap = []
+        waiting_heap = []
+        waiting_op_records = set()
+        num_api_method_recs = self._push_op_recs(op_records_heap, op_records, waiting_op_records)
+        # Replaying: Process newly reached op-recs within the same iteration.
+        eager = self.build_schedule is not None
+        # Eager mode: Op-recs in `op_records_heap` and the number of API-method op-recs among them.
+        queued_op_records = set(rec for _, rec in op_records_heap)
+        num_queued_api_method_recs = num_api_method_recs
+
+        def reach(recs):
+            if not eager:
+                self.op_records_to_process.update(recs)
+                return 0
+            new_recs = [rec for rec in recs if rec not in queued_op_records]
+            queued_op_records.update(new_recs)
+            return self._push_op_recs(op_records_heap, new_recs, waiting_op_records)
+
         loop_counter = 0
-        while len(op_records_list) > 0:
+        while len(op_records_heap) > 0 or len(waiting_heap) > 0:
+            if self.build_profiler is not None:
+                self.build_profiler.start_iteration(loop_counter + 1)
             # In this iteration, do we still have API-method op-recs (which are part of columns that go into or come
             # from API-methods).
-            have_api_method_recs = any(
-                isinstance(or_.column, (DataOpRecordColumnIntoAPIMethod, DataOpRecordColumnFromAPIMethod)) for or_ in
-                op_records_list
-            )
+            have_api_method_recs = num_api_method_recs > 0
+            # Process the waiting op-recs only if they may be called (replaying a build schedule calls graph_fns
+            # regardless of API-method op-recs).
+            process_waiting = have_api_method_recs is False or self.build_schedule is not None
             # Keep track of the highest nesting-level (depth of a component in the parent/child-component-tree) for
             # a called graph_fn. Graph_fns with a lower nesting level will not be called in the same iteration.
             # This allows for careful progress through the graph_fn-calls in case API methods of
@@ -1057,17 +1179,41 @@ class GraphBuilder(Specifiable):
             # as it will fail the build).
             highest_nesting_of_called_graph_fn_column = -1
 
-            # Collect op-recs to process in the next iteration.
+            # Collect op-recs to process in the next iteration and those to put back into the waiting heap.
             self.op_records_to_process = set()
+            recycled_op_records = []
+            num_processed = 0
 
             # Set of Components that have been tried last to get input-complete. If build gets stuck, it'll be because
             # of the Components in this set.
             non_complete_components = set()
-            for op_rec in op_records_list:  # type: DataOpRecord
+            while True:
+                # Pop the next op-rec in priority order from either heap.
+                if process_waiting and len(waiting_heap) > 0 and \
+                        (len(op_records_heap) == 0 or waiting_heap[0] < op_records_heap[0]):
+                    # All remaining waiting op-recs have a lower nesting level than an already called graph_fn and
+                    # would only be recycled.
+                    if self.build_schedule is None and highest_nesting_of_called_graph_fn_column > \
+                            waiting_heap[0][1].column.component.nesting_level:
+                        process_waiting = False
+                        continue
+                    op_rec = heapq.heappop(waiting_heap)[1]  # type: DataOpRecord
+                    waiting_op_records.discard(op_rec)
+                elif len(op_records_heap) > 0:
+                    op_rec = heapq.heappop(op_records_heap)[1]  # type: DataOpRecord
+                    if eager:
+                        queued_op_records.discard(op_rec)
+                        if self._is_api_method_rec(op_rec):
+                            num_queued_api_method_recs -= 1
+                else:
+                    break
+                num_processed += 1
+
                 # There are next records:
                 if len(op_rec.next) > 0:
                     # Push actual op and Space forward one op-rec at a time.
-                    for next_op_rec in self._sort_op_recs(op_rec.next):  # type: DataOpRecord
+                    next_op_records = op_rec.next if len(op_rec.next) == 1 else self._sort_op_recs(op_rec.next)
+                    for next_op_rec in next_op_records:  # type: DataOpRecord
                         # Assert that next-record's `previous` field points back to op_rec.
                         assert next_op_rec.previous is op_rec, \
                             "ERROR: Op-rec {} in meta-graph has {} as next, but {}'s previous field points to {}!". \
@@ -1075,7 +1221,7 @@ class GraphBuilder(Specifiable):
                         # If not last op in this API-method -> continue.
                         if next_op_rec.is_terminal_op is False:
                             assert next_op_rec.op is None or is_constant(next_op_rec.op) or next_op_rec.op is op_rec.op
-                            self.op_records_to_process.add(next_op_rec)
+                            num_queued_api_method_recs += reach([next_op_rec])
                         ## Push op and Space into next op-record.
                         ## With op-instructions?
                         #if "key-lookup" in next_op_rec.op_instructions:
@@ -1104,6 +1250,10 @@ class GraphBuilder(Specifiable):
                         if isinstance(op_rec.column, DataOpRecordColumnIntoAPIMethod):
                             param_name = get_call_param_name(op_rec)
                             component = op_rec.column.api_method_rec.component
+                            if self.build_profiler is not None:
+                                self.build_profiler.count_api_method_op_record(
+                                    component, op_rec.column.api_method_rec.name
+                                )
 
                             # Place Space for this input-param name (valid for all input params of same name even of
                             # different API-method of the same Component).
@@ -1142,20 +1292,25 @@ class GraphBuilder(Specifiable):
 
                 # No next records:
                 # - Op belongs to a column going into a graph_fn.
+                elif isinstance(op_rec.column, DataOpRecordColumnIntoGraphFn) and \
+                        self._scheduled_graph_fn_call_ready(op_rec.column):
+                    # Replaying a cached schedule: The recorded build called this graph_fn at this point.
+                    self.run_through_graph_fn_with_device_and_scope(op_rec.column)
+                    num_queued_api_method_recs += reach(op_rec.column.out_graph_fn_column.op_records)
                 elif isinstance(op_rec.column, DataOpRecordColumnIntoGraphFn):
                     # Only call the GraphFn iff:
                     # There are no more DataOpRecordColumnIntoAPIMethod ops in our list: We would like to hold off
                     # any graph fn calls for as long as possible.
                     # We don't want to run through a graph_fn, then have to call an API-method from within that graph_fn
                     # and the component of that API-method is not input-/variable-complete yet.
-                    if have_api_method_recs:
+                    if have_api_method_recs or num_queued_api_method_recs > 0:
                         # Recycle this op-rec.
-                        self.op_records_to_process.add(op_rec)
+                        recycled_op_records.append(op_rec)
                     # There are other graph_fn columns that have a higher Component nesting_level and are
                     # actually callable -> Call those first.
                     elif highest_nesting_of_called_graph_fn_column > op_rec.column.component.nesting_level:
                         # Recycle this op-rec.
-                        self.op_records_to_process.add(op_rec)
+                        recycled_op_records.append(op_rec)
                     # GraphFn column must be complete AND has not been sent through the graph_fn yet.
                     elif op_rec.column.is_complete() and op_rec.column.already_sent is False:
                         do_call = False  # Do the actual graph_fn call?
@@ -1168,7 +1323,7 @@ class GraphBuilder(Specifiable):
                         # Component not input-/variable-complete yet. Recycle this op-rec.
                         else:
                             self.build_component_when_input_complete(op_rec.column.component)
-                            self.op_records_to_process.add(op_rec)
+                            recycled_op_records.append(op_rec)
                             if op_rec.column.component.input_complete is False:
                                 non_complete_components.add(op_rec.column.component.global_scope)
                             # Call the graph_fn here right away iff component is ready now.
@@ -1180,7 +1335,7 @@ class GraphBuilder(Specifiable):
                             # Call the graph_fn with the given column and call-options.
                             self.run_through_graph_fn_with_device_and_scope(op_rec.column)
                             # Store all resulting op_recs (returned by the graph_fn) to be processed next.
-                            self.op_records_to_process.update(op_rec.column.out_graph_fn_column.op_records)
+                            num_queued_api_method_recs += reach(op_rec.column.out_graph_fn_column.op_records)
                             highest_nesting_of_called_graph_fn_column = op_rec.column.component.nesting_level
 
                     # - There are still into-API-method-op-recs that should be handled first.
@@ -1194,12 +1349,12 @@ class GraphBuilder(Specifiable):
             # TODO is this loop necessary for define by run?
             if get_backend() == "tf":
                 if len(self.op_recs_depending_on_variables) > 0:
-                    op_records_list = list(self.op_recs_depending_on_variables)
+                    variables_op_records = list(self.op_recs_depending_on_variables)
                     self.op_recs_depending_on_variables = set()
 
                     # Loop through the op_records list and sanity check for "variables"-dependent Spaces, then get these
                     # Spaces (iff respective component is input-complete), create the placeholders and keep building.
-                    for op_rec in op_records_list:
+                    for op_rec in variables_op_records:
                         space_desc = op_rec.space  # type: str
                         mo = re.search(r'^variables:(.+)', space_desc)
                         assert mo
@@ -1227,29 +1382,110 @@ class GraphBuilder(Specifiable):
                         else:
                             self.op_recs_depending_on_variables.add(op_rec)
 
-            # Sanity check, whether we are stuck.
-            new_op_records_list = self._sort_op_recs(self.op_records_to_process)
-            if op_records_list == new_op_records_list:
+            # Schedule the recycled and the newly reached op-recs for the next iteration.
+            for op_rec in recycled_op_records:
+                # Replaying, an op-rec may be reached and recycled more than once per iteration.
+                if op_rec not in waiting_op_records:
+                    heapq.heappush(waiting_heap, (self._op_rec_priority(op_rec), op_rec))
+                    waiting_op_records.add(op_rec)
+            num_api_method_recs = self._push_op_recs(op_records_heap, self.op_records_to_process, waiting_op_records)
+            if eager:
+                queued_op_records.update(self.op_records_to_process - waiting_op_records)
+                num_queued_api_method_recs = num_api_method_recs
+
+            # Sanity check, whether we are stuck (all processed op-recs recycled and no new ones reached).
+            if len(recycled_op_records) == num_processed and len(op_records_heap) == 0:
                 # Probably deadlocked. Do a premature sanity check to report possible problems.
                 if loop_counter > self.max_build_iterations:
                     self.sanity_check_build(still_building=True)
                     return
 
-            op_records_list = new_op_records_list
-
             loop_counter += 1
         return loop_counter
 
+    def _graph_fn_call_key(self, op_rec_column):
+        """
+        Returns the key of the next call of a column's graph_fn: Component scope, graph_fn name and the number of
+        previous calls of that graph_fn.
+        """
+        call_name = op_rec_column.component.global_scope + "/" + op_rec_column.graph_fn.__name__
+        return call_name + "#" + str(self.graph_fn_call_counts.get(call_name, 0))
+
+    def _index_build_schedule(self, schedule):
+        if schedule is None:
+            return None
+        return dict(
+            components={component.global_scope: component for component in
+                        self.root_component.get_all_sub_components(exclude_self=False)},
+            graph_fn_calls={call_key: (num_input_complete, num_variable_complete) for
+                            call_key, num_input_complete, num_variable_complete in schedule["graph_fn_calls"]},
+            # Per completeness kind: Recorded completion order, its prefix length complete in this build so far.
+            input_complete=[schedule["input_complete_components"], 0],
+            variable_complete=[schedule["variable_complete_components"], 0]
+        )
+
+    def _completed_schedule_prefix(self, kind):
+        """
+        Returns the length of the longest prefix of the recorded completion order (of kind "input_complete" or
+        "variable_complete") whose Components are all complete in this build.
+        """
+        recorded_order, prefix = self.build_schedule[kind]
+        while prefix < len(recorded_order):
+            component = self.build_schedule["components"].get(recorded_order[prefix], None)
+            if component is None or getattr(component, kind) is not True:
+                break
+            prefix += 1
+        self.build_schedule[kind][1] = prefix
+        return prefix
+
+    def _scheduled_graph_fn_call_ready(self, op_rec_column):
+        """
+        Checks whether a graph_fn column can be called right away according to the replayed build schedule: Its
+        inputs and Component are ready and all Components that were complete when the recorded build called it
+        are complete.
+        """
+        if self.build_schedule is None or op_rec_column.already_sent is not False or \
+                not op_rec_column.is_complete():
+            return False
+        component = op_rec_column.component
+        if not (component.variable_complete or (op_rec_column.requires_variable_completeness is False and
+                                                component.input_complete)):
+            return False
+        recorded_call = self.build_schedule["graph_fn_calls"].get(self._graph_fn_call_key(op_rec_column), None)
+        if recorded_call is None:
+            return False
+        num_input_complete, num_variable_complete = recorded_call
+        return self._completed_schedule_prefix("input_complete") >= num_input_complete and \
+            self._completed_schedule_prefix("variable_complete") >= num_variable_complete
+
     @staticmethod
-    def _sort_op_recs(recs):
+    def _op_rec_priority(rec):
         """
-        Sorts op-recs according to:
+        Returns the scheduling priority of an op-rec (smaller values first):
         - Give API-method calls priority over GraphFn calls (API-method call ops just have to be passed along without
         worrying about input-/variable-completeness).
         - Give deeper nested Components priority over shallower nested ones.
-        - Sort by op-rec ID to enforce determinism.
+        - Order by op-rec ID (highest first) to enforce determinism.
+
+        Args:
+            rec (DataOpRecord): The DataOpRecord to get the priority for.
+
+        Returns:
+            tuple: The priority key.
+        """
+        # Op-rec is a placeholder. Highest priority.
+        if rec.column is None:
+            return -2, 0, -rec.id
+        # API-methods have priority (over GraphFns).
+        elif isinstance(rec.column, DataOpRecordColumnIntoAPIMethod):
+            return -1, 0, -rec.id
+        # Deeper nested Components have priority. If same level, use op-rec's ID for determinism.
+        return 0, -rec.column.component.nesting_level, -rec.id
 
-        Note: We sort in reverse order, highest key-values first.
+    @staticmethod
+    def _sort_op_recs(recs):
+        """
+        Sorts op-recs by their priority (see `_op_rec_priority`).
 
         Args:
             recs (Set[DataOpRecord]): The DataOpRecords to sort.
@@ -1257,14 +1493,30 @@ class GraphBuilder(Specifiable):
         Returns:
             list: The sorted op-recs.
         """
-        def sorting_func(rec):
-            # Op-rec is a placeholder. Highest priority.
-            if rec.column is None:
-                return DataOpRecord.MAX_ID * 2 + rec.id
-            # API-methods have priority (over GraphFns).
-            elif isinstance(rec.column, DataOpRecordColumnIntoAPIMethod):
-                return DataOpRecord.MAX_ID + rec.id
-            # Deeper nested Components have priority. If same level, use op-rec's ID for determinism.
-            return rec.column.component.nesting_level + rec.id / DataOpRecord.MAX_ID
-
-        return sorted(recs, key=sorting_func, reverse=True)
+        return sorted(recs, key=GraphBuilder._op_rec_priority)
+
+    @staticmethod
+    def _push_op_recs(heap, recs, waiting_op_records):
+        """
+        Pushes op-recs onto a heap of (priority, op-rec) tuples, skipping those already in the waiting heap.
+
+        Args:
+            heap (list): The heap to push onto.
+            recs (Iterable[DataOpRecord]): The DataOpRecords to push.
+            waiting_op_records (Set[DataOpRecord]): The op-recs in the waiting heap.
+
+        Returns:
+            int: The number of pushed op-recs that are part of API-method columns.
+        """
+        num_api_method_recs = 0
+        for rec in recs:
+            if rec in waiting_op_records:
+                continue
+            heapq.heappush(heap, (GraphBuilder._op_rec_priority(rec), rec))
+            if GraphBuilder._is_api_method_rec(rec):
+                num_api_method_recs += 1
+        return num_api_method_recs
+
+    @staticmethod
+    def _is_api_method_rec(rec):
+        return isinstance(rec.column, (DataOpRecordColumnIntoAPIMethod, DataOpRecordColumnFromAPIMethod))
@@ -18,8 +18,11 @@ from __future__ import division
 from __future__ import print_function
 
 import logging
+import os
 
 from rlgraph.graphs import MetaGraphBuilder
+from rlgraph.graphs.build_cache import BuildCache
+from rlgraph.graphs.build_profiler import BuildProfiler
 from rlgraph.utils.input_parsing import parse_saver_spec, parse_execution_spec
 from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.utils.specifiable import Specifiable
@@ -81,6 +84,15 @@ class GraphExecutor(Specifiable):
 
         self.distributed_spec = self.execution_spec.get("distributed_spec")
 
+        # Persistent build schedules to replay on subsequent builds of the same graph (e.g. in other processes).
+        build_cache_dir = self.execution_spec.get("build_cache_dir", None)
+        self.build_cache = BuildCache(build_cache_dir) if build_cache_dir is not None else None
+
+        # Directory to write build profiles (JSON report and Chrome trace) to.
+        self.build_profile_dir = self.execution_spec.get("build_profile_dir", None)
+        if self.build_profile_dir is not None:
+            self.graph_builder.build_profiler = BuildProfiler()
+
         # Number of available GPUs and their names.
         self.gpus_enabled = None
         # Whether to fake GPUs in case there are none available (in which case, we place everything on the CPU).
@@ -148,6 +160,23 @@ class GraphExecutor(Specifiable):
         """
         pass  # not mandatory
 
+    def export_build_profile(self, build_index=0):
+        """
+        Writes the profile of the last build to `build_profile_dir` (if set) as JSON report and as Chrome trace.
+
+        Args:
+            build_index (int): Index of the build (root component) within the current `build` call.
+        """
+        if self.build_profile_dir is None:
+            return
+        directory = os.path.expanduser(self.build_profile_dir)
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "build-profile-{}-{}".format(os.getpid(), build_index))
+        self.graph_builder.build_profiler.export_json(path + ".json")
+        self.graph_builder.build_profiler.export_chrome_trace(path + ".trace.json")
+        self.logger.info("Wrote build profile to {}.json (Chrome trace: {}.trace.json).".format(path, path))
+
     def finish_graph_setup(self):
         """
         Initializes any remaining backend-specific monitoring or session handling.
@@ -73,6 +73,7 @@ class PyTorchExecutor(GraphExecutor):
                 meta_graph=meta_graph, input_spaces=input_spaces, available_devices=self.available_devices
             )
             build_times.append(build_time)
+            self.export_build_profile(len(build_times) - 1)
 
         return dict(
             total_build_time=time.perf_counter() - start,
@@ -25,6 +25,7 @@ from rlgraph.utils.rlgraph_errors import RLGraphError
 from rlgraph.graphs.graph_executor import GraphExecutor
 from rlgraph.utils.util import force_list
 from rlgraph.utils.op_records import gather_summaries
+from rlgraph.utils.ops import ContainerDataOp, DataOpDict, flatten_op
 
 if get_backend() == "tf":
     import tensorflow as tf
@@ -113,6 +114,11 @@ class TensorFlowExecutor(GraphExecutor):
             if not self.disable_monitoring:
                 self.tf_session_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
 
+        # Compiled session callables (or cached fetches and placeholders for monitored sessions) by call
+        # signature, see `get_call_signature`.
+        self.cache_execution_callables = self.execution_spec.get("cache_execution_callables", True)
+        self.execution_callables = {}
+
         self.init_device_strategy()
 
         # # Initialize distributed backend.
@@ -197,11 +203,12 @@ class TensorFlowExecutor(GraphExecutor):
             build_time = self.graph_builder.build_graph_with_options(
                 meta_graph=meta_graph, input_spaces=input_spaces, available_devices=self.available_devices,
                 device_strategy=self.device_strategy, default_device=self.default_device, device_map=self.device_map,
-                build_options=build_options
+                build_options=build_options, build_cache=self.build_cache
             )
 
             # Build time is a dict containing the cost of different parts of the build.
             build_times.append(build_time)
+            self.export_build_profile(len(build_times) - 1)
 
             # Check device assignments for inconsistencies or unused devices.
             self._sanity_check_devices()
@@ -216,22 +223,25 @@ class TensorFlowExecutor(GraphExecutor):
         )
 
     def execute(self, *api_method_calls):
-        # Fetch inputs for the different API-methods.
-        fetch_dict, feed_dict = self.graph_builder.get_execution_inputs(*api_method_calls)
-        for api_name in fetch_dict.keys():
-            if api_name in self.summary_ops:
-                fetch_dict[api_name].append(self.summary_ops[api_name])
-
-        fetch_dict["__GLOBAL_TRAINING_TIMESTEP"] = self.global_training_timestep
-        ret = self.monitored_session.run(
-            fetch_dict, feed_dict=feed_dict, options=self.tf_session_options, run_metadata=self.run_metadata
-        )
-        global_training_timestep_value = ret["__GLOBAL_TRAINING_TIMESTEP"]
-        del ret["__GLOBAL_TRAINING_TIMESTEP"]
+        if self.cache_execution_callables:
+            signature, feed_values = self.get_call_signature(*api_method_calls)
+            execution_callable = self.execution_callables.get(signature, None)
+            if execution_callable is None:
+                execution_callable = self.compile_execution_callable(signature, *api_method_calls)
+                self.execution_callables[signature] = execution_callable
+            ret = execution_callable(*feed_values)
+        else:
+            # Fetch inputs for the different API-methods.
+            fetch_dict, feed_dict = self.graph_builder.get_execution_inputs(*api_method_calls)
+            self.add_summary_fetches(fetch_dict)
+            ret = self.monitored_session.run(
+                fetch_dict, feed_dict=feed_dict, options=self.tf_session_options, run_metadata=self.run_metadata
+            )
 
-        for api_name in fetch_dict.keys():
+        global_training_timestep_value = ret.pop("__GLOBAL_TRAINING_TIMESTEP", None)
+        for api_name in ret.keys():
             if api_name in self.summary_ops:
-                assert len(ret[api_name]) > 1, "Expected multiple values, but {} found".format(len(fetch_dict[api_name]))
+                assert len(ret[api_name]) > 1, "Expected multiple values, but {} found".format(len(ret[api_name]))
                 summary = ret[api_name].pop()
                 # Assuming that all API methods are on the training timesteps.
                 self.summary_writer.add_summary(summary, global_training_timestep_value)
@@ -252,6 +262,114 @@ class TensorFlowExecutor(GraphExecutor):
 
         return ret
 
+    def add_summary_fetches(self, fetch_dict):
+        """
+        Adds the summary ops of the fetched API-methods (and the global training timestep they are written at)
+        to a fetch dict.
+
+        Args:
+            fetch_dict (dict): Fetch dict as returned by `GraphBuilder.get_execution_inputs`.
+        """
+        has_summaries = False
+        for api_name in fetch_dict.keys():
+            if api_name in self.summary_ops:
+                fetch_dict[api_name].append(self.summary_ops[api_name])
+                has_summaries = True
+        if has_summaries:
+            fetch_dict["__GLOBAL_TRAINING_TIMESTEP"] = self.global_training_timestep
+
+    def get_call_signature(self, *api_method_calls):
+        """
+        Computes the signature of an `execute` call: API-methods, requested return ops and input structure. Calls
+        with equal signatures fetch the same ops and feed the same placeholders.
+
+        Args:
+            api_method_calls (dict): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            Tuple[tuple,list]: Signature, values to feed in the order of the signature's placeholders.
+        """
+        api = self.graph_builder.api
+        signature = []
+        feed_values = []
+        for api_method_call in api_method_calls:
+            if api_method_call is None:
+                continue
+
+            api_method_name = api_method_call
+            params = []
+            return_ops = None
+            if isinstance(api_method_call, (list, tuple)):
+                api_method_name = api_method_call[0] if not callable(api_method_call[0]) else \
+                    api_method_call[0].__name__
+                if api_method_name not in api:
+                    raise RLGraphError("No API-method with name '{}' found!".format(api_method_name))
+                # See `GraphBuilder.get_execution_inputs`.
+                if isinstance(api_method_call[1], dict) and not isinstance(api[api_method_name][0][0].op, DataOpDict):
+                    params = [v for k, v in sorted(api_method_call[1].items())]
+                else:
+                    params = force_list(api_method_call[1])
+                if len(api_method_call) > 2 and api_method_call[2] is not None:
+                    return_ops = tuple(force_list(api_method_call[2]))
+            if callable(api_method_call):
+                api_method_name = api_method_call.__name__
+
+            input_op_records = api[api_method_name][0] if api_method_name in api else []
+            param_signatures = []
+            for i, param in enumerate(params):
+                if param is None:
+                    break
+                if i < len(input_op_records) and isinstance(input_op_records[i].op, ContainerDataOp):
+                    flat_param = flatten_op(param)
+                    param_signatures.append(tuple(flat_param.keys()))
+                    feed_values.extend(flat_param.values())
+                else:
+                    param_signatures.append(None)
+                    feed_values.append(param)
+            signature.append((api_method_name, return_ops, tuple(param_signatures)))
+
+        return tuple(signature), feed_values
+
+    def compile_execution_callable(self, signature, *api_method_calls):
+        """
+        Creates a callable running the fetches of `api_method_calls` given the values to feed (see
+        `get_call_signature`).
+
+        Uses `Session.make_callable` for plain sessions, monitored sessions are run with cached fetches and
+        placeholders so session hooks still run.
+
+        Args:
+            signature (tuple): Signature of the call as returned by `get_call_signature`.
+            api_method_calls (dict): See `rlgraph.graphs.graph_executor` for details.
+
+        Returns:
+            callable: Callable taking the values to feed and returning the fetched values.
+        """
+        # Validates the call and assembles fetches.
+        fetch_dict, _ = self.graph_builder.get_execution_inputs(*api_method_calls)
+        self.add_summary_fetches(fetch_dict)
+
+        placeholders = []
+        for api_method_name, _, param_signatures in signature:
+            input_op_records = self.graph_builder.api[api_method_name][0]
+            for i, flat_keys in enumerate(param_signatures):
+                if flat_keys is None:
+                    placeholders.append(input_op_records[i].op)
+                else:
+                    flat_placeholders = flatten_op(input_op_records[i].op)
+                    placeholders.extend(flat_placeholders[flat_key] for flat_key in flat_keys)
+
+        # Session callables neither run hooks nor collect run metadata and cannot feed a placeholder twice.
+        if self.disable_monitoring and self.run_metadata is None and len(set(placeholders)) == len(placeholders):
+            return self.session.make_callable(fetch_dict, feed_list=placeholders)
+
+        def execution_callable(*feed_values):
+            return self.monitored_session.run(
+                fetch_dict, feed_dict=dict(zip(placeholders, feed_values)), options=self.tf_session_options,
+                run_metadata=self.run_metadata
+            )
+        return execution_callable
+
     def update_profiler_if_necessary(self):
         """
         Updates profiler according to specification.
@@ -616,6 +734,9 @@ class TensorFlowExecutor(GraphExecutor):
                     checkpoint_dir=None
                 )
 
+        # Callables are bound to the session.
+        self.execution_callables = {}
+
         # Exit the graph-context and finalize the graph.
         if self.graph_default_context is not None:
             self.graph_default_context.__exit__(None, None, None)
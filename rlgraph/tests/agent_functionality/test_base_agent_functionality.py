@@ -20,8 +20,11 @@ from __future__ import print_function
 import logging
 import unittest
 
-from rlgraph.agents import Agent, PPOAgent
+import numpy as np
+
+from rlgraph.agents import Agent, PPOAgent, RandomAgent
 from rlgraph.environments import GridWorld, OpenAIGymEnv
+from rlgraph.spaces import BoolBox, Dict, FloatBox, IntBox, Tuple
 from rlgraph.tests.test_util import config_from_path, recursive_assert_almost_equal
 from rlgraph.utils import root_logger
 
@@ -102,3 +105,70 @@ class TestBaseAgentFunctionality(unittest.TestCase):
         self.assertGreater(build_times["op_creation"], 0.0)
         self.assertGreater(build_times["var_creation"], 0.0)
         self.assertGreater(build_times["total_build_time"], build_times["build_overhead"])
+
+    def test_observe_envs_buffers(self):
+        """
+        Tests array-backed observe buffers flushing per-environment segments on terminals and when full.
+        """
+        env = GridWorld(world="4x4", state_representation="xy")
+
+        class RecordingAgent(RandomAgent):
+            def __init__(self, **kwargs):
+                super(RecordingAgent, self).__init__(**kwargs)
+                self.observed = []
+
+            def _observe_graph(self, preprocessed_states, actions, internals, rewards, next_states, terminals):
+                self.observed.append((np.array(preprocessed_states), np.array(rewards), np.array(terminals)))
+
+        agent = RecordingAgent(state_space=env.state_space, action_space=env.action_space,
+                               observe_spec=dict(buffer_enabled=True, buffer_size=3))
+        env_ids = ["env_0", "env_1"]
+        for t in range(4):
+            states = np.array([[t, 0], [t, 1]], dtype=np.float32)
+            agent.observe_envs(states, np.array([0, 1]), [], [float(t), -float(t)], states + 1, [t == 1, False],
+                               env_ids=env_ids)
+
+        # env_0 terminated at t=1, env_1 filled its buffer at t=2 (artificial terminal).
+        self.assertEqual(len(agent.observed), 2)
+        recursive_assert_almost_equal(agent.observed[0][0], [[0, 0], [1, 0]])
+        recursive_assert_almost_equal(agent.observed[0][2], [False, True])
+        recursive_assert_almost_equal(agent.observed[1][1], [0.0, -1.0, -2.0])
+        recursive_assert_almost_equal(agent.observed[1][2], [False, False, True])
+
+    def test_stack_container_samples(self):
+        """
+        Tests stacking per-environment samples of nested container spaces for the unbuffered `observe_envs`.
+        """
+        space = Dict(
+            a=FloatBox(shape=(2,)),
+            b=Tuple(IntBox(3), Dict(c=FloatBox(), d=BoolBox()))
+        )
+        samples = [space.sample() for _ in range(3)]
+        # Per-environment samples may come with a batch rank of 1 (in some leaves only).
+        samples[1] = dict(
+            a=samples[1]["a"][np.newaxis],
+            b=(np.asarray([samples[1]["b"][0]]), dict(c=np.asarray([samples[1]["b"][1]["c"]]),
+                                                      d=samples[1]["b"][1]["d"]))
+        )
+
+        stacked = Agent._stack(space, samples)
+        self.assertEqual(stacked["a"].shape, (3, 2))
+        self.assertIsInstance(stacked["b"], tuple)
+        self.assertEqual(stacked["b"][0].shape, (3,))
+        self.assertEqual(stacked["b"][1]["c"].shape, (3,))
+        for i, sample in enumerate(samples):
+            recursive_assert_almost_equal(stacked["a"][i], np.reshape(sample["a"], (2,)))
+            recursive_assert_almost_equal(stacked["b"][0][i], np.reshape(sample["b"][0], ()))
+            recursive_assert_almost_equal(stacked["b"][1]["c"][i], np.reshape(sample["b"][1]["c"], ()))
+            self.assertEqual(stacked["b"][1]["d"][i], np.reshape(sample["b"][1]["d"], ()))
+
+        # Primitive spaces.
+        space = FloatBox(shape=(2,))
+        stacked = Agent._stack(space, [np.zeros(2), np.ones((1, 2)), np.full(2, 2.0)])
+        recursive_assert_almost_equal(stacked, [[0.0, 0.0], [1.0, 1.0], [2.0, 2.0]])
+
+        # Tuple spaces at the top level.
+        space = Tuple(FloatBox(shape=(2,)), IntBox(3))
+        stacked = Agent._stack(space, [space.sample() for _ in range(4)])
+        self.assertEqual(stacked[0].shape, (4, 2))
+        self.assertEqual(stacked[1].shape, (4,))
@@ -21,9 +21,13 @@ import unittest
 import numpy as np
 from six.moves import xrange as range_
 from rlgraph.components.memories.mem_prioritized_replay import MemPrioritizedReplay
+from rlgraph.execution.environment_sample import EnvironmentSample
 from rlgraph.execution.ray.apex.apex_memory import ApexMemory
-from rlgraph.execution.ray.ray_util import ray_compress
+from rlgraph.execution.ray.apex.ray_memory_actor import RayMemoryActor
+from rlgraph.execution.ray.ray_util import ray_compress, ray_compress_frames
 from rlgraph.spaces import Dict, IntBox, BoolBox, FloatBox
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+from rlgraph.utils import SMALL_NUMBER
 
 
 # TODO (Michael): Clean up memory semantics and tests re:
@@ -255,3 +259,263 @@ class TestPythonPrioritizedReplay(unittest.TestCase):
         self.assertEqual(tree.index_of_prefixsum(1.51), 2)
         self.assertEqual(tree.index_of_prefixsum(3.0), 3)
         self.assertEqual(tree.index_of_prefixsum(5.50), 3)
+
+    def test_batch_insert_matches_single_inserts(self):
+        """
+        Tests if batch inserts produce the same tree as a sequence of single inserts,
+        including repeated indices within one batch.
+        """
+        memory = ApexMemory(capacity=16)
+        batch_memory = ApexMemory(capacity=16)
+
+        indices = np.asarray([0, 3, 7, 3, 15, 8, 0])
+        priorities = np.random.uniform(size=len(indices))
+        for index, priority in zip(indices, priorities):
+            memory.merged_segment_tree.insert(index, priority)
+        batch_memory.merged_segment_tree.insert_batch(indices, priorities)
+
+        recursive_assert_almost_equal(
+            batch_memory.merged_segment_tree.sum_segment_tree.values,
+            memory.merged_segment_tree.sum_segment_tree.values
+        )
+        recursive_assert_almost_equal(
+            batch_memory.merged_segment_tree.min_segment_tree.values,
+            memory.merged_segment_tree.min_segment_tree.values
+        )
+
+    def test_prefixsum_idx_batch(self):
+        """
+        Tests if the batched prefix sum search returns the same indices as the single-element search.
+        """
+        memory = ApexMemory(
+            capacity=4
+        )
+        tree = memory.merged_segment_tree.sum_segment_tree
+        tree.insert_batch([0, 1, 2, 3], [0.5, 1.0, 1.0, 3.0])
+
+        prefix_sums = [0.0, 0.55, 0.99, 1.51, 3.0, 5.50]
+        indices = tree.index_of_prefixsum_batch(prefix_sums)
+        self.assertEqual(list(indices), [0, 1, 1, 2, 3, 3])
+        self.assertEqual(list(indices), [tree.index_of_prefixsum(prefix_sum) for prefix_sum in prefix_sums])
+
+    def test_apex_columnar_storage(self):
+        """
+        Tests if columnar storage returns the same records as tuple storage for single and batch inserts.
+        """
+        memory = ApexMemory(capacity=self.capacity)
+        columnar_memory = ApexMemory(capacity=self.capacity, columnar_storage=True)
+        columnar_batch_memory = ApexMemory(capacity=self.capacity, columnar_storage=True)
+
+        # Insert more records than capacity to test wrap-around.
+        for _ in range_(3):
+            observation = self.apex_space.sample(size=7)
+            for i in range_(7):
+                record = (
+                    observation["states"][i],
+                    observation["actions"][i],
+                    observation["reward"][i],
+                    observation["terminals"][i],
+                    observation["states"][i],
+                    observation["weights"][i]
+                )
+                memory.insert_records(record)
+                columnar_memory.insert_records(record)
+            columnar_batch_memory.insert_batch(dict(
+                states=observation["states"],
+                actions=observation["actions"],
+                rewards=observation["reward"],
+                terminals=observation["terminals"],
+                next_states=observation["states"],
+                importance_weights=observation["weights"]
+            ))
+
+        self.assertEqual(memory.index, columnar_batch_memory.index)
+        self.assertEqual(memory.size, columnar_batch_memory.size)
+        indices = np.random.randint(low=0, high=self.capacity, size=5)
+        expected = memory.read_records(indices)
+        recursive_assert_almost_equal(columnar_memory.read_records(indices), expected)
+        recursive_assert_almost_equal(columnar_batch_memory.read_records(indices), expected)
+        recursive_assert_almost_equal(
+            columnar_batch_memory.merged_segment_tree.sum_segment_tree.values,
+            memory.merged_segment_tree.sum_segment_tree.values
+        )
+
+    def test_apex_batch_larger_than_capacity(self):
+        """
+        Tests inserting a batch larger than the capacity into an empty memory (only the last `capacity` records
+        survive, written in ring order).
+        """
+        for columnar_storage in [False, True]:
+            memory = ApexMemory(capacity=4, columnar_storage=columnar_storage)
+            memory.insert_batch(dict(
+                states=np.arange(6, dtype=np.float32).reshape((6, 1)),
+                actions=np.arange(6),
+                rewards=np.arange(6) + 0.5,
+                terminals=np.zeros(shape=(6,), dtype=bool),
+                next_states=np.arange(6, dtype=np.float32).reshape((6, 1))
+            ))
+            self.assertEqual(memory.size, 4)
+            self.assertEqual(memory.index, 2)
+            records = memory.read_records(np.arange(4))
+            recursive_assert_almost_equal(records["actions"], [4, 5, 2, 3])
+            recursive_assert_almost_equal(records["states"], [[4.0], [5.0], [2.0], [3.0]])
+            _, indices, _ = memory.get_records(8)
+            self.assertTrue(np.all(np.asarray(indices) < 4))
+
+    def test_apex_columnar_reward_dtype(self):
+        """
+        Tests that an int first reward does not truncate later float rewards in columnar storage.
+        """
+        memory = ApexMemory(capacity=self.capacity, columnar_storage=True)
+        memory.insert_records((np.zeros(shape=(4,)), 0, 1, False, np.zeros(shape=(4,)), None))
+        memory.insert_records((np.zeros(shape=(4,)), 0, 0.5, True, np.zeros(shape=(4,)), None))
+        records = memory.read_records(np.arange(2))
+        recursive_assert_almost_equal(records["rewards"], [1.0, 0.5])
+        self.assertEqual(records["terminals"].dtype, bool)
+
+    def test_apex_frame_deduplication(self):
+        """
+        Tests if frame-deduplicated storage reconstructs stacked states and next states.
+        """
+        # Trajectory of 4-frame stacks where consecutive states share 3 frames.
+        frames = [np.random.randint(low=0, high=255, size=(2, 2, 1)).astype(np.uint8) for _ in range_(9)]
+        stacks = np.asarray([np.concatenate(frames[i:i + 4], axis=-1) for i in range_(6)])
+        frame_cache = dict()
+        states = ray_compress_frames(stacks[:-1], num_frames=4, frame_cache=frame_cache)
+        next_states = ray_compress_frames(stacks[1:], num_frames=4, frame_cache=frame_cache)
+        # Each frame was compressed exactly once.
+        self.assertEqual(len(frame_cache), len(frames))
+
+        for columnar_storage in [False, True]:
+            memory = ApexMemory(capacity=self.capacity, columnar_storage=columnar_storage, deduplicate_frames=True)
+            memory.insert_batch(dict(
+                states=states,
+                actions=np.zeros(shape=(5,)),
+                rewards=np.zeros(shape=(5,)),
+                terminals=np.zeros(shape=(5,), dtype=bool),
+                next_states=next_states
+            ))
+            records = memory.read_records(np.arange(5))
+            recursive_assert_almost_equal(records["states"], stacks[:-1])
+            recursive_assert_almost_equal(records["next_states"], stacks[1:])
+
+    def test_memory_actor_insert_batch(self):
+        """
+        Tests batched inserts of worker samples into the Ape-X replay actor.
+        """
+        memory_actor = RayMemoryActor(dict(
+            memory_spec=dict(capacity=self.capacity, alpha=self.alpha, beta=self.beta, columnar_storage=True),
+            min_sample_memory_size=1,
+            sample_batch_size=4,
+            clip_rewards=True
+        ))
+        observation = self.apex_space.sample(size=6)
+        memory_actor.observe(EnvironmentSample(sample_batch=dict(
+            states=observation["states"],
+            actions=observation["actions"],
+            rewards=observation["reward"] * 10.0 - 5.0,
+            terminals=observation["terminals"],
+            next_states=observation["states"],
+            importance_weights=observation["weights"] + 0.1
+        ), batch_size=6))
+        self.assertEqual(memory_actor.memory.size, 6)
+        self.assertEqual(memory_actor.memory.index, 6)
+
+        # Rewards are clipped to their sign.
+        rewards = memory_actor.memory.read_records(np.arange(6))["rewards"]
+        self.assertTrue(np.all(np.isin(rewards, [-1.0, 0.0, 1.0])))
+        recursive_assert_almost_equal(
+            memory_actor.memory.merged_segment_tree.sum_segment_tree.get_sum(),
+            np.sum((observation["weights"] + 0.1) ** self.alpha),
+            decimals=5
+        )
+
+        batch = memory_actor.get_batch()
+        self.assertEqual(len(batch["indices"]), 4)
+        self.assertEqual(len(batch["importance_weights"]), 4)
+
+    def test_apex_stratified_sampling(self):
+        """
+        Tests that stratified sampling draws one record per equal segment of the priority mass.
+        """
+        memory = ApexMemory(capacity=self.capacity, alpha=1.0, beta=self.beta, stratified_sampling=True)
+        num_records = 8
+        for i in range_(num_records):
+            memory.insert_records((np.full((4,), i), 0, 0.0, False, np.full((4,), i), 1.0))
+
+        # Equal priorities: each segment covers exactly one record.
+        # Weights are all equal (`get_records` adds SMALL_NUMBER to the min probability).
+        prob = 1.0 / num_records
+        expected_weight = (prob * num_records) ** (-self.beta) / ((prob + SMALL_NUMBER) * num_records) ** (-self.beta)
+        for _ in range_(10):
+            _, indices, weights = memory.get_records(num_records)
+            self.assertEqual(sorted(indices), list(range_(num_records)))
+            recursive_assert_almost_equal(weights, np.full(num_records, expected_weight))
+
+    def test_memory_actor_sample_ring(self):
+        """
+        Tests serving batches from the precomputed sample ring.
+        """
+        memory_actor = RayMemoryActor(dict(
+            memory_spec=dict(capacity=self.capacity, alpha=self.alpha, beta=self.beta),
+            min_sample_memory_size=4,
+            sample_batch_size=4,
+            clip_rewards=False,
+            sample_ring_size=2
+        ))
+        self.assertIsNone(memory_actor.get_batch())
+        self.assertIsNone(memory_actor.sample_thread)
+
+        observation = self.apex_space.sample(size=6)
+        memory_actor.observe(EnvironmentSample(sample_batch=dict(
+            states=observation["states"],
+            actions=observation["actions"],
+            rewards=observation["reward"],
+            terminals=observation["terminals"],
+            next_states=observation["states"],
+            importance_weights=observation["weights"] + 0.1
+        ), batch_size=6))
+        for _ in range_(10):
+            batch = memory_actor.get_batch()
+            self.assertEqual(len(batch["indices"]), 4)
+            self.assertEqual(len(batch["importance_weights"]), 4)
+            memory_actor.update_priorities(batch["indices"], np.random.random(size=4))
+        self.assertTrue(memory_actor.sample_thread.is_alive())
+        self.assertLessEqual(memory_actor.sample_ring.qsize(), 2)
+
+    def test_memory_actor_discards_overwritten_ring_batches(self):
+        """
+        Tests detecting pre-sampled batches whose records were overwritten since sampling.
+        """
+        memory_actor = RayMemoryActor(dict(
+            memory_spec=dict(capacity=self.capacity, alpha=self.alpha, beta=self.beta),
+            min_sample_memory_size=4,
+            sample_batch_size=4,
+            clip_rewards=False
+        ))
+
+        def observe(num_records):
+            observation = self.apex_space.sample(size=num_records)
+            memory_actor.observe(EnvironmentSample(sample_batch=dict(
+                states=observation["states"],
+                actions=observation["actions"],
+                rewards=observation["reward"],
+                terminals=observation["terminals"],
+                next_states=observation["states"],
+                importance_weights=observation["weights"] + 0.1
+            ), batch_size=num_records))
+
+        observe(6)
+        num_inserted, batch = memory_actor._sample_batch(return_num_inserted=True)
+        self.assertEqual(num_inserted, 6)
+        self.assertFalse(memory_actor._is_overwritten(num_inserted, batch["indices"]))
+
+        # Fills slots 6 to 9 and wraps around to slot 0.
+        observe(5)
+        self.assertEqual(memory_actor.memory.num_inserted, 11)
+        self.assertTrue(memory_actor._is_overwritten(num_inserted, np.array([0, 3])))
+        self.assertFalse(memory_actor._is_overwritten(num_inserted, np.array([1, 5])))
+
+        # All slots overwritten.
+        observe(5)
+        self.assertTrue(memory_actor._is_overwritten(num_inserted, np.array([1, 5])))
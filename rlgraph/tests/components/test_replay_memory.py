@@ -17,12 +17,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import time
 import unittest
 
+import numpy as np
+from rlgraph import get_backend
+from rlgraph.components.memories.mem_prioritized_replay import MemPrioritizedReplay
 from rlgraph.components.memories.replay_memory import ReplayMemory
-from rlgraph.spaces import Dict, BoolBox
+from rlgraph.spaces import Dict, BoolBox, IntBox, FloatBox
 from rlgraph.tests import ComponentTest
-from rlgraph.tests.test_util import non_terminal_records
+from rlgraph.tests.test_util import non_terminal_records, recursive_assert_almost_equal
 
 
 class TestReplayMemory(unittest.TestCase):
@@ -123,3 +127,83 @@ class TestReplayMemory(unittest.TestCase):
         num_records = self.capacity
         batch, _, _ = test.test(("get_records", num_records), expected_outputs=None)
         self.assertEqual(self.capacity, len(batch['terminals']))
+
+    def test_prefetched_retrieve(self):
+        """
+        Tests serving get_records from the background sampler (define-by-run only).
+        """
+        if get_backend() != "pytorch":
+            return
+        memory = ReplayMemory(
+            capacity=self.capacity
+        )
+        test = ComponentTest(component=memory, input_spaces=self.input_spaces)
+        memory.start_prefetching(num_records=4, num_batches=2)
+
+        # Sampler waits until enough records are present.
+        time.sleep(0.05)
+        self.assertEqual(memory.prefetcher.queue.qsize(), 0)
+
+        observation = non_terminal_records(self.record_space, self.capacity)
+        test.test(("insert_records", observation), expected_outputs=None)
+        for _ in range(10):
+            batch, _, _ = test.test(("get_records", 4), expected_outputs=None)
+            self.assertEqual(4, len(batch['terminals']))
+            # Queue is bounded by the number of prefetched batches.
+            self.assertLessEqual(memory.prefetcher.queue.qsize(), 2)
+
+        # Other batch sizes are sampled on request.
+        batch, _, _ = test.test(("get_records", 3), expected_outputs=None)
+        self.assertEqual(3, len(batch['terminals']))
+        memory.stop_prefetching()
+        self.assertIsNone(memory.prefetcher)
+
+    def test_prefetched_prioritized_retrieve(self):
+        """
+        Tests that prefetched prioritized batches are discarded once their slots are overwritten.
+        """
+        if get_backend() != "pytorch":
+            return
+        memory = MemPrioritizedReplay(
+            capacity=self.capacity
+        )
+        input_spaces = dict(records=self.record_space, indices=IntBox(add_batch_rank=True),
+                            update=FloatBox(add_batch_rank=True))
+        test = ComponentTest(component=memory, input_spaces=input_spaces)
+        memory.start_prefetching(num_records=4, num_batches=1)
+
+        observation = non_terminal_records(self.record_space, self.capacity)
+        test.test(("insert_records", observation), expected_outputs=None)
+        while memory.prefetcher.queue.qsize() == 0:
+            time.sleep(0.001)
+        # Overwrite all slots: the prefetched batch must not be served.
+        observation = non_terminal_records(self.record_space, self.capacity)
+        test.test(("insert_records", observation), expected_outputs=None)
+        self.assertIsNone(memory._get_prefetched_records(4))
+
+        _, indices, _ = test.test(("get_records", 4), expected_outputs=None)
+        test.test(("update_records", [indices, np.full((4,), 0.5)]), expected_outputs=None)
+        memory.stop_prefetching()
+
+    def test_preallocated_tensor_storage(self):
+        """
+        Tests that define-by-run memories write and read whole batches of preallocated tensor slots.
+        """
+        if get_backend() != "pytorch":
+            return
+        prioritized_input_spaces = dict(records=self.record_space, indices=IntBox(add_batch_rank=True),
+                                        update=FloatBox(add_batch_rank=True))
+        for memory, input_spaces in [(ReplayMemory(capacity=self.capacity), self.input_spaces),
+                                     (MemPrioritizedReplay(capacity=self.capacity), prioritized_input_spaces)]:
+            test = ComponentTest(component=memory, input_spaces=input_spaces)
+            rewards = memory.memory["/reward"]
+            self.assertEqual(tuple(rewards.shape), (self.capacity,))
+
+            # Wrap around: the last 4 records overwrite slots 0-3.
+            observation = non_terminal_records(self.record_space, self.capacity + 4)
+            test.test(("insert_records", observation), expected_outputs=None)
+            expected = np.concatenate([observation["reward"][self.capacity:], observation["reward"][4:self.capacity]])
+            recursive_assert_almost_equal(rewards.numpy(), expected, decimals=5)
+
+            batch, indices, _ = test.test(("get_records", 6), expected_outputs=None)
+            recursive_assert_almost_equal(batch["reward"], expected[np.asarray(indices)], decimals=5)
@@ -101,6 +101,36 @@ class TestSequencePreprocessor(unittest.TestCase):
                 out, np.asarray([[[1.1, 1.11, 10]], [[2.2, 2.22, 20]], [[3.3, 3.33, 30]], [[4.4, 4.44, 40]]])
             )
 
+    def test_python_sequence_preprocessor_slot_resets(self):
+        seq_len = 3
+        space = FloatBox(shape=(1,), add_batch_rank=True)
+        sequencer = Sequence(sequence_length=seq_len, add_rank=True, backend="python")
+        sequencer.create_variables(input_spaces=dict(inputs=space))
+
+        sequencer._graph_fn_reset()
+        sequencer._graph_fn_call(np.asarray([[1.0], [2.0], [3.0]]))
+        out = sequencer._graph_fn_call(np.asarray([[1.1], [2.2], [3.3]]))
+        recursive_assert_almost_equal(out, np.asarray([[[1.0, 1.0, 1.1]], [[2.0, 2.0, 2.2]], [[3.0, 3.0, 3.3]]]))
+
+        # Reset slot 1 and refill it only, slots 0 and 2 must not advance.
+        sequencer.reset_slots([1])
+        sequencer.active_slots = [1]
+        out = sequencer._graph_fn_call(np.asarray([[5.0]]))
+        sequencer.active_slots = None
+        recursive_assert_almost_equal(out, np.asarray([[[5.0, 5.0, 5.0]]]))
+
+        out = sequencer._graph_fn_call(np.asarray([[1.11], [5.5], [3.33]]))
+        recursive_assert_almost_equal(
+            out, np.asarray([[[1.0, 1.1, 1.11]], [[5.0, 5.0, 5.5]], [[3.0, 3.3, 3.33]]])
+        )
+
+        # A reset slot is refilled by the next full call.
+        sequencer.reset_slots(np.asarray([True, False, False]))
+        out = sequencer._graph_fn_call(np.asarray([[7.0], [5.55], [30.0]]))
+        recursive_assert_almost_equal(
+            out, np.asarray([[[7.0, 7.0, 7.0]], [[5.0, 5.5, 5.55]], [[3.3, 3.33, 30.0]]])
+        )
+
     def test_sequence_preprocessor_with_batch(self):
         space = FloatBox(shape=(2,), add_batch_rank=True)
         sequencer = Sequence(sequence_length=2, batch_size=3, add_rank=True)
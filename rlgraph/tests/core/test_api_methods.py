@@ -64,6 +64,21 @@ class TestAPIMethods(unittest.TestCase):
         test.test(("run", 1.1), expected_outputs=3.1)
         test.test(("run", -5.1), expected_outputs=-3.1)
 
+    def test_execution_callables_cached_per_signature(self):
+        """
+        Repeats calls with the same signature and checks that they reuse one compiled session callable.
+        """
+        a = DummyWithSubComponents(scope="A")
+        test = ComponentTest(component=a, input_spaces=dict(input_=float))
+
+        test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+        test.test(("run1", -1.0), expected_outputs=[1.0, 2.0], decimals=4)
+        self.assertEqual(len(test.graph_executor.execution_callables), 1)
+        # Different return ops: new signature.
+        test.test(("run1", 1.1, [1]), expected_outputs=4.1, decimals=4)
+        test.test(("run2", 1.1), expected_outputs=0.1, decimals=4)
+        self.assertEqual(len(test.graph_executor.execution_callables), 3)
+
     def test_connecting_1to2_to_2to1(self):
         """
         Adds two components with 1-to-2 and 2-to-1 graph_fns to the core, connects them and passes a value through it.
@@ -0,0 +1,76 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from rlgraph import get_backend
+from rlgraph.tests import ComponentTest
+from rlgraph.tests.dummy_components_with_sub_components import DummyWithSubComponents
+
+
+class TestBuildCache(unittest.TestCase):
+    """
+    Tests recording and replaying build schedules.
+    """
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def build(self, constant_value=1.0):
+        test = ComponentTest(component=DummyWithSubComponents(scope="A", constant_value=constant_value),
+                             input_spaces=dict(input_=float), execution_spec=dict(build_cache_dir=self.cache_dir),
+                             auto_build=False)
+        return test, test.build()["build_times"][0]
+
+    def test_replay_cached_schedule(self):
+        # Build schedules are only cached for static graphs.
+        if get_backend() != "tf":
+            return
+        # First build records the schedule.
+        test, build_stats = self.build()
+        self.assertIsNone(test.graph_builder.build_schedule)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        recorded_calls = [call_key for call_key, _, _ in test.graph_builder.graph_fn_calls]
+        recorded_iterations = build_stats["build_iterations"]
+        test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+        test.terminate()
+
+        # Second build of the same graph replays it, calls the same graph_fns and needs fewer iterations.
+        test, build_stats = self.build()
+        self.assertIsNotNone(test.graph_builder.build_schedule)
+        self.assertEqual(sorted(call_key for call_key, _, _ in test.graph_builder.graph_fn_calls),
+                         sorted(recorded_calls))
+        self.assertLess(build_stats["build_iterations"], recorded_iterations)
+        test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+        test.test(("run2", 1.1), expected_outputs=0.1, decimals=4)
+        test.terminate()
+
+    def test_key_depends_on_component_config(self):
+        if get_backend() != "tf":
+            return
+        # Same Component tree with a different constant does not replay the schedule.
+        test, _ = self.build()
+        test.terminate()
+        test, _ = self.build(constant_value=2.0)
+        self.assertIsNone(test.graph_builder.build_schedule)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+        test.terminate()
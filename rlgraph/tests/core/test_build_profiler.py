@@ -0,0 +1,67 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import, division, print_function
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from rlgraph.tests import ComponentTest
+from rlgraph.tests.dummy_components_with_sub_components import DummyWithSubComponents
+
+
+class TestBuildProfiler(unittest.TestCase):
+    """
+    Tests build profiles and their export.
+    """
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir)
+
+    def test_build_profile(self):
+        test = ComponentTest(component=DummyWithSubComponents(scope="A"), input_spaces=dict(input_=float),
+                             execution_spec=dict(build_profile_dir=self.profile_dir))
+        report = test.graph_builder.build_profiler.get_report()
+        test.test(("run1", 1.1), expected_outputs=[3.1, 4.1], decimals=4)
+        test.terminate()
+
+        self.assertGreater(report["num_iterations"], 0)
+        # Every Component was checked and became input-complete.
+        self.assertIn("A", report["components"])
+        for scope, stats in report["components"].items():
+            self.assertGreater(stats["num_calls"], 0)
+            self.assertGreater(stats["build_iterations"], 0)
+            self.assertIsNotNone(stats["input_complete_iteration"])
+            self.assertGreaterEqual(stats["input_incomplete_time"], 0.0)
+            self.assertGreaterEqual(stats["total_self_time"], stats["self_time"])
+        self.assertGreater(len(report["graph_fns"]), 0)
+        for stats in report["graph_fns"].values():
+            self.assertGreater(stats["num_calls"], 0)
+            self.assertGreaterEqual(stats["time"], stats["self_time"])
+
+        # JSON report and Chrome trace were written.
+        files = sorted(os.listdir(self.profile_dir))
+        self.assertEqual(len(files), 2)
+        with open(os.path.join(self.profile_dir, files[0])) as f:
+            self.assertEqual(sorted(json.load(f)["components"].keys()), sorted(report["components"].keys()))
+        with open(os.path.join(self.profile_dir, files[1])) as f:
+            trace = json.load(f)
+        categories = set(event["cat"] for event in trace["traceEvents"])
+        self.assertTrue({"component", "graph_fn", "iteration", "input_complete"}.issubset(categories))
@@ -0,0 +1,134 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.environments import GridWorld, SubprocVectorEnv, SequentialVectorEnv, VectorEnv
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+
+class FailingGridWorld(GridWorld):
+    """
+    2x2 GridWorld raising an error when stepped with action 3.
+    """
+    def __init__(self):
+        super(FailingGridWorld, self).__init__(world="2x2")
+
+    def step(self, actions, set_discrete_pos=None):
+        if actions == 3:
+            raise ValueError("Failing test action.")
+        return super(FailingGridWorld, self).step(actions, set_discrete_pos)
+
+
+class TestSubprocVectorEnv(unittest.TestCase):
+    """
+    Tests resetting and stepping GridWorld entities in environment processes.
+    """
+    def test_subproc_vector_env(self):
+        num_envs = 4
+        # Two processes with two environments each.
+        env = SubprocVectorEnv(num_environments=num_envs, env_spec={"type": "gridworld", "world": "2x2"},
+                               num_processes=2)
+
+        s = env.reset(index=0)  # ["XH", " G"]  X=player's position
+        self.assertTrue(s == 0)
+
+        s = env.reset_all()
+        recursive_assert_almost_equal(s, np.zeros(num_envs))
+
+        s, r, t, _ = env.step([2 for _ in range(num_envs)])  # down: [" H", "XG"]
+        recursive_assert_almost_equal(s, np.ones(num_envs))
+        recursive_assert_almost_equal(r, [-0.1] * num_envs)
+        self.assertFalse(any(t))
+
+        # Only step env 1 into the hole, others move to the goal.
+        env.reset(index=1)
+        s, r, t, _ = env.step([1, 1, 1, 1])
+        recursive_assert_almost_equal(s, [3, 2, 3, 3])
+        recursive_assert_almost_equal(r, [1.0, -5.0, 1.0, 1.0])
+        self.assertTrue(all(t))
+
+        env.terminate_all()
+
+    def test_matches_sequential_vector_env(self):
+        num_envs = 3
+        env_spec = {"type": "gridworld", "world": "4x4"}
+        subproc_env = VectorEnv.from_spec(dict(type="subproc-vector", num_environments=num_envs, env_spec=env_spec))
+        self.assertTrue(isinstance(subproc_env, SubprocVectorEnv))
+        sequential_env = SequentialVectorEnv(num_environments=num_envs, env_spec=env_spec)
+
+        recursive_assert_almost_equal(subproc_env.reset_all(), np.asarray(sequential_env.reset_all()))
+        for _ in range(50):
+            actions = np.random.randint(0, 4, size=num_envs)
+            subproc_out = subproc_env.step(actions)
+            sequential_out = sequential_env.step(actions)
+            for subproc_value, sequential_value in zip(subproc_out[:3], sequential_out[:3]):
+                recursive_assert_almost_equal(np.asarray(subproc_value), np.asarray(sequential_value))
+            for i, terminal in enumerate(sequential_out[2]):
+                if terminal:
+                    recursive_assert_almost_equal(subproc_env.reset(i), sequential_env.reset(i))
+        subproc_env.terminate_all()
+
+    def test_step_async_and_wait(self):
+        num_envs = 4
+        env_spec = {"type": "gridworld", "world": "2x2"}
+        for env in [SubprocVectorEnv(num_environments=num_envs, env_spec=env_spec),
+                    SequentialVectorEnv(num_environments=num_envs, env_spec=env_spec)]:
+            env.reset_all()
+            # Step envs 3 and 1 only (down: [" H", "XG"]).
+            env.step_async([2, 2], env_indices=[3, 1])
+            env_indices, s, r, t, _ = env.step_wait()
+            self.assertEqual(env_indices, [1, 3])
+            recursive_assert_almost_equal(np.asarray(s), [1, 1])
+            recursive_assert_almost_equal(r, [-0.1, -0.1])
+
+            # Envs 0 and 2 are still at the start, step all and collect at least one.
+            env.step_async([1, 1, 1, 1])
+            env_indices, s, r, t, _ = env.step_wait(min_ready=1)
+            self.assertGreaterEqual(len(env_indices), 1)
+            rest = env.step_wait()
+            self.assertEqual(sorted(env_indices + rest[0]), list(range(num_envs)))
+            # Right from the start hits the hole, right from below reaches the goal.
+            rewards = dict(zip(env_indices + rest[0], r + rest[2]))
+            recursive_assert_almost_equal([rewards[i] for i in range(num_envs)], [-5.0, 1.0, -5.0, 1.0])
+            env.terminate_all()
+
+    def test_process_survives_env_errors(self):
+        num_envs = 4
+        env = SubprocVectorEnv(num_environments=num_envs, env_spec=FailingGridWorld, num_processes=2)
+        env.reset_all()
+
+        # The error of env 0 is raised after the replies of both processes are received.
+        with self.assertRaises(RLGraphError):
+            env.step([3, 2, 2, 2])
+
+        # The processes keep serving commands.
+        s = env.reset_all()
+        recursive_assert_almost_equal(s, np.zeros(num_envs))
+        s, r, t, _ = env.step([2 for _ in range(num_envs)])
+        recursive_assert_almost_equal(s, np.ones(num_envs))
+        # Errors of asynchronous steps are raised on collection.
+        env.step_async([3], env_indices=[1])
+        with self.assertRaises(RLGraphError):
+            env.step_wait()
+        recursive_assert_almost_equal(env.reset(index=1), 0)
+        env.terminate_all()
@@ -23,6 +23,8 @@ import numpy as np
 from rlgraph.components import PreprocessorStack
 from rlgraph.environments import OpenAIGymEnv, Environment
 from rlgraph.execution.ray.apex import ApexExecutor
+from rlgraph.execution.ray.apex.apex_executor import UpdateWorker
+from rlgraph.execution.ray.ray_util import CompressedArray, TransportCodec
 from rlgraph.tests.test_util import config_from_path, recursive_assert_almost_equal
 
 
@@ -73,6 +75,48 @@ class TestApexExecutor(unittest.TestCase):
                 "ERROR: state '{}' not expected in q-table as it's a terminal state!".format(state)
             recursive_assert_almost_equal(q_values, expected_q_values_per_state[state], decimals=0)
 
+    def test_pipelined_learner_with_compressed_batches(self):
+        """
+        Tests learning with transport-compressed replay batches and coalesced priority updates.
+        """
+        env_spec = dict(
+            type="grid-world",
+            world="2x2",
+            save_mode=False
+        )
+        agent_config = config_from_path("configs/apex_agent_for_2x2_gridworld.json")
+        agent_config["execution_spec"]["ray_spec"]["apex_replay_spec"]["transport_codec"] = "lz4"
+        agent_config["execution_spec"]["ray_spec"]["executor_spec"]["priority_update_batches"] = 4
+        executor = ApexExecutor(
+            environment_spec=env_spec,
+            agent_config=agent_config,
+        )
+        result = executor.execute_workload(workload=dict(
+            num_timesteps=2000, report_interval=100, report_interval_min_seconds=1)
+        )
+        print(result)
+        self.assertGreater(result["learner_updates"], 0)
+        self.assertGreater(result["learner_utilization"], 0.0)
+        self.assertLessEqual(result["learner_utilization"], 1.0)
+        # Partial batches of coalesced priority updates are flushed at the end of the workload.
+        self.assertEqual(executor.pending_priority_updates, {})
+
+    def test_stage_batch_reuses_buffers(self):
+        codec = TransportCodec("none")
+        states = np.random.randint(0, 255, size=(8, 4, 4), dtype=np.uint8)
+        compressed = CompressedArray(states.tobytes(), states.shape, states.dtype.str, codec.codec)
+        buffers = {}
+        staged = UpdateWorker.stage_batch(dict(states=compressed, indices=np.arange(8)), buffers)
+        recursive_assert_almost_equal(staged["states"], states)
+        self.assertIs(staged["states"], buffers["states"])
+
+        # The same buffer is reused for the next batch of the same shape.
+        next_states = states + 1
+        compressed = CompressedArray(next_states.tobytes(), states.shape, states.dtype.str, codec.codec)
+        staged_next = UpdateWorker.stage_batch(dict(states=compressed, indices=np.arange(8)), buffers)
+        self.assertIs(staged_next["states"], staged["states"])
+        recursive_assert_almost_equal(staged_next["states"], next_states)
+
     def test_learning_2x2_grid_world_container_actions(self):
         """
         Tests Apex container action functionality.
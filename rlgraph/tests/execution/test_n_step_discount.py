@@ -0,0 +1,62 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+from rlgraph.utils.numpy import n_step_discount
+
+
+class TestNStepDiscount(unittest.TestCase):
+    """
+    Tests vectorized n-step reward discounting and next-state shifting.
+    """
+    def test_single_trajectory(self):
+        rewards = np.array([1.0, 2.0, 3.0, 4.0, 5.0])
+        terminals = np.array([False, True, False, False, False])
+        n_step_rewards, next_indices, n_step_terminals, complete = n_step_discount(rewards, terminals, 3, 0.5)
+
+        # Step 0 stops at the terminal at step 1, steps 3 and 4 run out of trajectory.
+        recursive_assert_almost_equal(n_step_rewards, [2.0, 2.0, 3.0 + 2.0 + 1.25, 4.0 + 2.5, 5.0])
+        recursive_assert_almost_equal(next_indices, [1, 1, 4, 4, 4])
+        recursive_assert_almost_equal(n_step_terminals, [True, True, False, False, False])
+        recursive_assert_almost_equal(complete, [True, True, True, False, False])
+
+    def test_matches_per_env_loop(self):
+        num_envs, num_steps, n_step, discount = 4, 200, 4, 0.99
+        rewards = np.random.random(size=(num_envs, num_steps))
+        terminals = np.random.random(size=(num_envs, num_steps)) < 0.05
+        n_step_rewards, next_indices, n_step_terminals, complete = n_step_discount(
+            rewards, terminals, n_step, discount
+        )
+
+        for env in range(num_envs):
+            for t in range(num_steps):
+                expected_reward, k = rewards[env, t], t
+                for j in range(1, n_step):
+                    if terminals[env, k] or t + j >= num_steps:
+                        break
+                    k = t + j
+                    expected_reward += discount ** j * rewards[env, k]
+                self.assertAlmostEqual(n_step_rewards[env, t], expected_reward)
+                self.assertEqual(next_indices[env, t], k)
+                self.assertEqual(n_step_terminals[env, t], terminals[env, k])
+                self.assertEqual(complete[env, t], bool(terminals[env, k]) or k == t + n_step - 1)
@@ -0,0 +1,98 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+from rlgraph import get_distributed_backend
+from rlgraph.execution.ray.ray_util import RayTaskPool, wait_any
+
+if get_distributed_backend() == "ray":
+    import ray
+
+
+def delayed_value(value, delay):
+    time.sleep(delay)
+    return value
+
+
+class TestRayTaskPool(unittest.TestCase):
+    """
+    Tests incremental readiness tracking and blocking waits of the RayTaskPool.
+    """
+    def setUp(self):
+        ray.init()
+        self.delayed_value = ray.remote(delayed_value)
+
+    def tearDown(self):
+        ray.shutdown()
+
+    def test_wait_any_and_fetch_completed(self):
+        pool = RayTaskPool()
+        pool.add_task("fast", self.delayed_value.remote(1, 0.0))
+        pool.add_task("slow", [self.delayed_value.remote(2, 2.0), self.delayed_value.remote(20, 2.0)])
+        self.assertEqual(len(pool), 2)
+
+        # Returns once the fast task is done, long before the slow one.
+        start = time.time()
+        self.assertEqual(pool.wait_any(num_returns=1, timeout=10.0), 1)
+        self.assertLess(time.time() - start, 1.5)
+
+        completed = pool.fetch_completed()
+        self.assertEqual([(worker, result) for worker, _, result in completed], [("fast", 1)])
+        self.assertEqual(len(pool), 1)
+
+        # Deadline passes before the slow task completes.
+        self.assertEqual(pool.wait_any(num_returns=1, timeout=0.1), 0)
+        self.assertEqual(pool.fetch_completed(), [])
+
+        # Results of tasks with multiple object ids are fetched by index.
+        completed = pool.fetch_completed(result_index=1, timeout=10.0)
+        self.assertEqual([(worker, result) for worker, _, result in completed], [("slow", 20)])
+        self.assertEqual(len(pool), 0)
+
+    def test_wait_any_across_pools(self):
+        sample_tasks, replay_tasks = RayTaskPool(), RayTaskPool()
+        sample_tasks.add_task("sample", self.delayed_value.remote(1, 2.0))
+        replay_tasks.add_task("replay", self.delayed_value.remote(2, 0.0))
+
+        self.assertEqual(wait_any([sample_tasks, replay_tasks], num_returns=1, timeout=10.0), 1)
+        self.assertEqual(sample_tasks.num_ready(), 0)
+        self.assertEqual(replay_tasks.num_ready(), 1)
+        self.assertEqual([worker for worker, _ in replay_tasks.get_completed()], ["replay"])
+
+        # Waiting for more tasks than exist waits for all of them.
+        self.assertEqual(wait_any([sample_tasks, replay_tasks], num_returns=5, timeout=10.0), 1)
+        self.assertEqual([worker for worker, _ in sample_tasks.get_completed()], ["sample"])
+
+    def test_wait_any_collects_all_completed(self):
+        pool = RayTaskPool()
+        pool.add_task("first", self.delayed_value.remote(1, 0.0))
+        pool.add_task("second", self.delayed_value.remote(2, 0.0))
+        pool.add_task("slow", self.delayed_value.remote(3, 2.0))
+        # Let both fast tasks complete before waiting.
+        time.sleep(0.5)
+
+        # Waiting for one task marks every task complete at the deadline as ready.
+        self.assertEqual(pool.wait_any(num_returns=1, timeout=10.0), 2)
+        self.assertEqual(pool.num_ready(), 2)
+        self.assertTrue(pool.swept)
+        self.assertEqual(sorted(worker for worker, _ in pool.get_completed()), ["first", "second"])
+        self.assertFalse(pool.swept)
+        self.assertEqual(len(pool), 1)
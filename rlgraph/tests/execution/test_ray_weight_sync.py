@@ -0,0 +1,99 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph import get_distributed_backend
+from rlgraph.execution.ray.ray_util import RayWeight, RayWeightSync
+from rlgraph.utils.rlgraph_errors import RLGraphError
+
+if get_distributed_backend() == "ray":
+    import ray
+
+
+class WeightHolder(object):
+    """
+    Minimal worker applying received weights like the Ray workers do.
+    """
+    def __init__(self):
+        self.weights_version = None
+        self.weights_reference = None
+        self.policy_weights = None
+        self.num_sets = 0
+
+    def set_weights(self, weights):
+        if weights.version is not None and weights.version == self.weights_version:
+            return
+        self.policy_weights, vf_weights = weights.decode(self.weights_reference)
+        self.weights_version = weights.version
+        self.weights_reference = (self.policy_weights, vf_weights) if weights.keep_reference else None
+        self.num_sets += 1
+
+    def get_state(self):
+        return self.weights_version, self.policy_weights, self.num_sets
+
+
+class TestRayWeightSync(unittest.TestCase):
+    """
+    Tests versioned, quantized and delta weight transport.
+    """
+    def test_quantized_delta_decode(self):
+        base = dict(policy_weights=dict(a=np.ones(4, dtype=np.float32), b=np.zeros(2, dtype=np.float32)),
+                    value_function_weights=dict(v=np.full(3, 2.0, dtype=np.float32)))
+        full = RayWeight(base, version=1, dtype="float16")
+        self.assertEqual(full.policy_values[0].dtype, np.float16)
+        policy_weights, vf_weights = full.decode()
+        self.assertEqual(policy_weights["a"].dtype, np.float32)
+        np.testing.assert_array_equal(vf_weights["v"], base["value_function_weights"]["v"])
+
+        # Delta only containing the changed variable.
+        delta = RayWeight(dict(policy_weights=dict(a=np.full(4, 0.5, dtype=np.float32)), value_function_weights={}),
+                          version=2, base_version=1, dtype="float16")
+        self.assertRaises(RLGraphError, delta.decode)
+        policy_weights, vf_weights = delta.decode((policy_weights, vf_weights))
+        np.testing.assert_array_equal(policy_weights["a"], np.full(4, 1.5))
+        np.testing.assert_array_equal(policy_weights["b"], np.zeros(2))
+        np.testing.assert_array_equal(vf_weights["v"], np.full(3, 2.0))
+
+    def test_sync_skips_current_workers_and_sends_deltas(self):
+        ray.init()
+        try:
+            workers = [ray.remote(WeightHolder).remote() for _ in range(2)]
+            weight_sync = RayWeightSync(dtype="float16", delta=True)
+
+            weights = dict(policy_weights=dict(a=np.ones(4, dtype=np.float32)))
+            weight_sync.publish(weights)
+            self.assertTrue(weight_sync.sync(workers[0]))
+            self.assertFalse(weight_sync.sync(workers[0]))
+
+            weights = dict(policy_weights=dict(a=np.full(4, 1.1, dtype=np.float32)))
+            weight_sync.publish(weights)
+            # Worker 0 receives a delta, worker 1 full weights. Both decode to the same values.
+            self.assertTrue(weight_sync.sync(workers[0]))
+            self.assertTrue(weight_sync.sync(workers[1]))
+            states = ray.get([worker.get_state.remote() for worker in workers])
+            for version, policy_weights, num_sets in states:
+                self.assertEqual(version, 2)
+                np.testing.assert_array_equal(policy_weights["a"], weight_sync.reference[0]["a"])
+                np.testing.assert_allclose(policy_weights["a"], np.full(4, 1.1), rtol=1e-3)
+            self.assertEqual([num_sets for _, _, num_sets in states], [2, 1])
+        finally:
+            ray.shutdown()
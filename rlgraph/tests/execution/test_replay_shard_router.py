@@ -0,0 +1,57 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+from rlgraph.execution.ray.ray_util import ReplayShardRouter
+
+
+class TestReplayShardRouter(unittest.TestCase):
+    """
+    Tests locality-aware, fill-balanced routing of env samples to replay shards.
+    """
+    def test_routing(self):
+        shards = ["shard_a0", "shard_a1", "shard_b0"]
+        router = ReplayShardRouter(shards, shard_hosts=["a", "a", "b"], shard_capacity=100)
+        router.add_worker("worker_a", "a")
+        router.add_worker("worker_b", "b")
+        router.add_worker("worker_c", "c")
+        self.assertEqual(router.num_local_workers(), 2)
+
+        # Same-node shards, balanced by fill level.
+        self.assertEqual([router.route("worker_a", 40) for _ in range(4)],
+                         ["shard_a0", "shard_a1", "shard_a0", "shard_a1"])
+        self.assertEqual(router.route("worker_b", 40), "shard_b0")
+        # No shard on the worker's node: least filled of all shards.
+        self.assertEqual(router.route("worker_c", 10), "shard_b0")
+
+        # Full shards are balanced by records routed.
+        self.assertEqual(router.route("worker_a", 40), "shard_a0")
+        self.assertEqual(router.route("worker_a", 40), "shard_a1")
+
+        rates = router.get_ingest_rates()
+        self.assertEqual(len(rates), 3)
+        self.assertGreater(rates[0], rates[2])
+
+    def test_no_locality(self):
+        router = ReplayShardRouter(["shard_a", "shard_b"], shard_hosts=["a", "b"], shard_capacity=10,
+                                   locality=False)
+        router.add_worker("worker_a", "a")
+        self.assertEqual(router.num_local_workers(), 0)
+        self.assertEqual([router.route("worker_a", 5) for _ in range(2)], ["shard_a", "shard_b"])
@@ -0,0 +1,56 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.execution.environment_sample import EnvironmentSample
+from rlgraph.execution.ray.ray_util import SampleBatchMerger, TransportCodec
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+
+
+class TestSampleBatchMerger(unittest.TestCase):
+    """
+    Tests merging samples into preallocated arrays as they arrive.
+    """
+    def make_sample(self, start, size, codec):
+        states = np.arange(start, start + size * 2, dtype=np.float32).reshape((size, 2))
+        return EnvironmentSample(sample_batch=dict(
+            states=codec.compress(states),
+            actions=dict(a=np.arange(start, start + size), b=np.ones(size, dtype=np.float32)),
+            terminals=np.zeros(size, dtype=np.bool_)
+        ), batch_size=size)
+
+    def test_merge_and_grow(self):
+        codec = TransportCodec("lz4")
+        # Capacity is too small for all samples: output arrays grow.
+        merger = SampleBatchMerger(capacity=4, decompress=True)
+        merger.add(self.make_sample(0, 3, codec))
+        merger.add(self.make_sample(6, 2, codec))
+        merger.add(self.make_sample(10, 4, codec))
+        self.assertEqual(merger.num_records, 9)
+
+        batch = merger.get_batch()
+        recursive_assert_almost_equal(batch["states"], np.concatenate([
+            np.arange(0, 6).reshape((3, 2)), np.arange(6, 10).reshape((2, 2)), np.arange(10, 18).reshape((4, 2))
+        ]))
+        recursive_assert_almost_equal(batch["actions"]["a"], [0, 1, 2, 6, 7, 10, 11, 12, 13])
+        self.assertEqual(batch["actions"]["b"].dtype, np.float32)
+        self.assertEqual(batch["terminals"].shape, (9,))
@@ -71,3 +71,54 @@ class TestSingleThreadedWorker(unittest.TestCase):
         self.assertEqual(result['episodes_executed'], 5)
         self.assertLessEqual(result['env_frames'], 50)
         self.assertGreaterEqual(result['runtime'], 0.0)
+
+    def test_async_env_steps(self):
+        """
+        Tests acting only for ready environments of asynchronously stepped sub-processes.
+        """
+        agent = RandomAgent(
+            action_space=self.environment.action_space,
+            state_space=self.environment.state_space
+        )
+        worker = SingleThreadedWorker(
+            env_spec=lambda: OpenAIGymEnv(gym_env='CartPole-v0'),
+            vector_env_spec=dict(type="subproc-vector"),
+            num_environments=4,
+            min_ready_envs=2,
+            agent=agent,
+            frameskip=1,
+            worker_executes_preprocessing=False
+        )
+
+        result = worker.execute_timesteps(100)
+        self.assertGreaterEqual(result['timesteps_executed'], 100)
+        self.assertGreaterEqual(result['env_frames'], 100)
+        result = worker.execute_episodes(5, max_timesteps_per_episode=10)
+        self.assertEqual(result['episodes_executed'], 5)
+        worker.vector_env.terminate_all()
+
+    def test_batch_preprocessing(self):
+        """
+        Tests preprocessing the states of all environments in one preprocessor call.
+        """
+        preprocessing_spec = [dict(type="sequence", sequence_length=3, add_rank=False)]
+        agent = RandomAgent(
+            action_space=self.environment.action_space,
+            state_space=self.environment.state_space,
+            preprocessing_spec=preprocessing_spec
+        )
+        worker = SingleThreadedWorker(
+            env_spec=lambda: OpenAIGymEnv(gym_env='CartPole-v0'),
+            num_environments=4,
+            agent=agent,
+            frameskip=1,
+            preprocessing_spec=preprocessing_spec,
+            batch_preprocessing=True
+        )
+
+        result = worker.execute_timesteps(100)
+        self.assertEqual(result['timesteps_executed'], 100)
+        self.assertEqual(len(worker.preprocessed_states_buffer), 4)
+        self.assertEqual(worker.preprocessed_states_buffer[0].shape, (12,))
+        result = worker.execute_episodes(5, max_timesteps_per_episode=10)
+        self.assertEqual(result['episodes_executed'], 5)
@@ -50,6 +50,42 @@ class TestSyncBatchExecutor(unittest.TestCase):
         print("Finished executing workload:")
         print(result)
 
+    def test_ppo_learning_cartpole_async_sampling(self):
+        """
+        Tests sync-batch ppo on cartpole with workers sampling the next batch during updates.
+        """
+        env_spec = dict(
+            type="openai",
+            gym_env="CartPole-v0"
+        )
+        agent_config = config_from_path("configs/sync_batch_ppo_cartpole.json")
+        agent_config["execution_spec"]["ray_spec"]["executor_spec"]["async_sampling"] = True
+
+        executor = SyncBatchExecutor(
+            environment_spec=env_spec,
+            agent_config=agent_config,
+        )
+        # Record the number of sample tasks in flight whenever the learner updates.
+        tasks_in_flight = []
+        update = executor.local_agent.update
+
+        def update_spy(*args, **kwargs):
+            tasks_in_flight.append(len(executor.sample_tasks))
+            return update(*args, **kwargs)
+
+        executor.local_agent.update = update_spy
+
+        result = executor.execute_workload(workload=dict(num_timesteps=20000, report_interval=1000,
+                                                         report_interval_min_seconds=1))
+        print("Finished executing workload:")
+        print(result)
+
+        self.assertGreaterEqual(result["timesteps_executed"], 20000)
+        self.assertGreater(result["mean_worker_reward"], 0.0)
+        # Sampling of the next batch overlaps every update.
+        self.assertGreater(len(tasks_in_flight), 0)
+        self.assertTrue(all(num_tasks > 0 for num_tasks in tasks_in_flight))
+
     def test_learning_2x2_grid_world_container_actions(self):
         """
         Tests sync batch container action functionality.
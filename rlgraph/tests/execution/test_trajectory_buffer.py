@@ -0,0 +1,59 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import unittest
+
+import numpy as np
+
+from rlgraph.execution.ray.ray_util import TrajectoryBuffer
+from rlgraph.spaces import FloatBox, IntBox
+from rlgraph.tests.test_util import recursive_assert_almost_equal
+
+
+class TestTrajectoryBuffer(unittest.TestCase):
+    """
+    Tests in-place rollout storage of Ray workers.
+    """
+    def test_flat_views_and_next_states(self):
+        num_envs, capacity = 2, 3
+        buffer = TrajectoryBuffer(num_envs, capacity, FloatBox(shape=(2,)), IntBox(4))
+        states = np.arange(num_envs * capacity * 2, dtype=np.float32).reshape((capacity, num_envs, 2))
+        for t in range(capacity):
+            buffer.add(states[t], [t, t + 1], [1.0, 2.0], [t == 1, False])
+            if t == 1:
+                buffer.end_segment(0, np.full((2,), -1.0))
+        buffer.end_segment(0, np.full((2,), -2.0), episode_end=False)
+        buffer.end_segment(1, np.full((2,), -3.0), episode_end=False)
+
+        flat_states = buffer.flat(buffer.states)
+        # Full buffer: flattened env by env without copying.
+        self.assertTrue(np.shares_memory(flat_states, buffer.states))
+        recursive_assert_almost_equal(flat_states, np.concatenate([states[:, 0], states[:, 1]]))
+        recursive_assert_almost_equal(buffer.flat_actions(), [0, 1, 2, 1, 2, 3])
+        recursive_assert_almost_equal(buffer.flat(buffer.episode_ends), [False, True, False, False, False, False])
+
+        next_states = buffer.next_states(np.tile(np.arange(capacity), (num_envs, 1)))
+        recursive_assert_almost_equal(next_states, [
+            states[1, 0], [-1.0, -1.0], [-2.0, -2.0], states[1, 1], states[2, 1], [-3.0, -3.0]
+        ])
+
+        # Smaller rollouts reuse the storage.
+        buffer.reset(capacity=2)
+        self.assertEqual(buffer.capacity, capacity)
+        self.assertEqual(buffer.num_steps, 0)
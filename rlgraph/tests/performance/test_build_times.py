@@ -0,0 +1,108 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import inspect
+import logging
+import time
+import unittest
+
+from rlgraph import get_backend
+from rlgraph.agents import Agent
+from rlgraph.environments import GridWorld, OpenAIGymEnv
+from rlgraph.tests.test_util import config_from_path
+from rlgraph.utils import root_logger
+from rlgraph.utils.ops import TraceContext
+
+
+class TestBuildTimes(unittest.TestCase):
+    """
+    Measures graph build times of the standard agents.
+    """
+    root_logger.setLevel(level=logging.INFO)
+
+    # Number of frames on the stack when calling into the check. Builds call graph_fns many frames deep.
+    stack_depth = 60
+    num_checks = 1000
+
+    def _build(self, config_path, env, **kwargs):
+        agent_config = config_from_path(config_path)
+        agent_config["auto_build"] = False
+        agent = Agent.from_spec(
+            agent_config,
+            state_space=env.state_space,
+            action_space=env.action_space,
+            **kwargs
+        )
+        build = agent.build()
+        build_times = build["build_times"][0]
+        print("{}: total build time = {:.3f}s, build overhead = {:.3f}s".format(
+            type(agent).__name__, build["total_build_time"], build_times["build_overhead"]
+        ))
+        agent.terminate()
+        self.assertGreater(build_times["total_build_time"], build_times["build_overhead"])
+
+    def test_dqn_build_time(self):
+        env = GridWorld("2x2")
+        self._build("configs/dqn_agent_for_2x2_gridworld.json", env)
+
+    def test_ppo_build_time(self):
+        env = GridWorld("2x2")
+        self._build("configs/ppo_agent_for_2x2_gridworld.json", env)
+
+    def test_impala_build_time(self):
+        if get_backend() == "pytorch":
+            return
+        env = GridWorld("2x2")
+        self._build(
+            "configs/impala_agent_for_2x2_gridworld.json", env,
+            update_spec=dict(batch_size=16), execution_spec=dict(disable_monitoring=True)
+        )
+
+    def test_sac_build_time(self):
+        if get_backend() == "pytorch":
+            return
+        env = OpenAIGymEnv("CartPole-v0")
+        self._build("configs/sac_agent_for_cartpole.json", env)
+
+    def test_call_context_check(self):
+        """
+        Compares the explicit call-context check against the `inspect.stack()` frame scan it replaces.
+        """
+        def stack_scan():
+            for stack_item in inspect.stack()[1:]:
+                if stack_item[3] == "api_method_wrapper":
+                    return False
+                elif stack_item[3] == "run_through_graph_fn":
+                    return True
+            return False
+
+        def nested(depth, check):
+            if depth > 0:
+                return nested(depth - 1, check)
+            start = time.perf_counter()
+            for _ in range(self.num_checks):
+                check()
+            return time.perf_counter() - start
+
+        scan_time = nested(self.stack_depth, stack_scan)
+        context_time = nested(self.stack_depth, TraceContext.in_graph_fn_context)
+        print("{} checks at stack depth {}: inspect.stack() = {:.4f}s, call context stack = {:.4f}s".format(
+            self.num_checks, self.stack_depth, scan_time, context_time
+        ))
+        self.assertLess(context_time, scan_time)
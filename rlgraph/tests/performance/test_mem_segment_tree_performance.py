@@ -0,0 +1,92 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import operator
+import time
+import unittest
+
+import numpy as np
+from six.moves import xrange as range_
+
+from rlgraph.components.helpers.mem_segment_tree import MemSegmentTree, MinSumSegmentTree
+
+
+class TestMemSegmentTreePerformance(unittest.TestCase):
+    """
+    Compares element-wise and batched insert/prefix-sum search on the in-memory segment tree.
+    """
+    capacity = 2 ** 20
+    batches = 2000
+    batch_size = 512
+
+    def create_tree(self):
+        sum_tree = MemSegmentTree(np.zeros(shape=(2 * self.capacity,)), self.capacity, operator.add)
+        min_tree = MemSegmentTree(np.full(shape=(2 * self.capacity,), fill_value=float('inf')), self.capacity, min)
+        return MinSumSegmentTree(sum_tree=sum_tree, min_tree=min_tree, capacity=self.capacity)
+
+    def test_insert_performance(self):
+        indices = [np.random.randint(low=0, high=self.capacity, size=self.batch_size) for _ in range_(self.batches)]
+        priorities = [np.random.random(size=self.batch_size) for _ in range_(self.batches)]
+
+        tree = self.create_tree()
+        start = time.monotonic()
+        for batch_indices, batch_priorities in zip(indices, priorities):
+            for index, priority in zip(batch_indices, batch_priorities):
+                tree.insert(index, priority)
+        single_time = time.monotonic() - start
+
+        batch_tree = self.create_tree()
+        start = time.monotonic()
+        for batch_indices, batch_priorities in zip(indices, priorities):
+            batch_tree.insert_batch(batch_indices, batch_priorities)
+        batch_time = time.monotonic() - start
+
+        print('#### Testing MemSegmentTree insert performance ####')
+        print('Single inserts: {} batches of {}, throughput: {} records/s, total time: {} s'.format(
+            self.batches, self.batch_size, self.batches * self.batch_size / single_time, single_time
+        ))
+        print('Batch inserts: {} batches of {}, throughput: {} records/s, total time: {} s'.format(
+            self.batches, self.batch_size, self.batches * self.batch_size / batch_time, batch_time
+        ))
+        self.assertTrue(np.allclose(tree.sum_segment_tree.values, batch_tree.sum_segment_tree.values))
+
+    def test_prefixsum_performance(self):
+        tree = self.create_tree()
+        tree.insert_batch(np.arange(self.capacity), np.random.random(size=self.capacity))
+        sum_tree = tree.sum_segment_tree
+        prefix_sums = [np.random.random(size=self.batch_size) * sum_tree.get_sum() for _ in range_(self.batches)]
+
+        start = time.monotonic()
+        for batch_prefix_sums in prefix_sums:
+            for prefix_sum in batch_prefix_sums:
+                sum_tree.index_of_prefixsum(prefix_sum)
+        single_time = time.monotonic() - start
+
+        start = time.monotonic()
+        for batch_prefix_sums in prefix_sums:
+            sum_tree.index_of_prefixsum_batch(batch_prefix_sums)
+        batch_time = time.monotonic() - start
+
+        print('#### Testing MemSegmentTree prefix-sum search performance ####')
+        print('Single searches: {} batches of {}, throughput: {} searches/s, total time: {} s'.format(
+            self.batches, self.batch_size, self.batches * self.batch_size / single_time, single_time
+        ))
+        print('Batch searches: {} batches of {}, throughput: {} searches/s, total time: {} s'.format(
+            self.batches, self.batch_size, self.batches * self.batch_size / batch_time, batch_time
+        ))
@@ -0,0 +1,112 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+import numpy as np
+from six.moves import xrange as range_
+
+from rlgraph.execution.environment_sample import EnvironmentSample
+from rlgraph.execution.ray.ray_util import merge_samples, ray_compress, ray_decompress, TransportCodec
+from rlgraph.spaces import IntBox
+
+
+def concatenate_samples(samples, decompress=False):
+    """
+    Previous merge path: One concatenation per key, then per-state decompression.
+    """
+    batch = {}
+    sample_layout = samples[0].sample_batch
+    for key in sample_layout.keys():
+        if isinstance(sample_layout[key], dict):
+            batch[key] = {}
+            for name in sample_layout[key].keys():
+                batch[key][name] = np.concatenate([sample.sample_batch[key][name] for sample in samples])
+        else:
+            batch[key] = np.concatenate([sample.sample_batch[key] for sample in samples])
+    if decompress:
+        batch["states"] = np.asarray([ray_decompress(state) for state in batch["states"]])
+    return batch
+
+
+class TestMergeSamples(unittest.TestCase):
+    """
+    Compares merging PPO-sized sample batches by concatenation with the preallocated merge.
+    """
+    # Atari-like frame stacks.
+    state_space = IntBox(low=0, high=255, shape=(84, 84, 4), dtype="uint8")
+    sample_size = 128
+    num_samples = 16
+    num_threads = 4
+
+    def make_samples(self, compress_states):
+        samples = []
+        for _ in range_(self.num_samples):
+            states = self.state_space.sample(size=self.sample_size)
+            samples.append(EnvironmentSample(sample_batch=dict(
+                states=compress_states(states),
+                actions=dict(a=np.random.randint(0, 4, size=self.sample_size),
+                             b=np.random.random(size=self.sample_size)),
+                rewards=np.random.random(size=self.sample_size),
+                terminals=np.zeros(self.sample_size, dtype=np.bool_),
+                sequence_indices=np.zeros(self.sample_size, dtype=np.bool_)
+            ), batch_size=self.sample_size))
+        return samples
+
+    def test_merge_throughput(self):
+        num_records = self.sample_size * self.num_samples
+        print('#### Testing merge throughput ####')
+
+        samples = self.make_samples(lambda states: [ray_compress(state) for state in states])
+        start = time.monotonic()
+        expected = concatenate_samples(samples, decompress=True)
+        end = time.monotonic() - start
+        print('Concatenate, per-state compression: throughput: {} records/s, total time: {} s'.format(
+            num_records / end, end))
+        for num_threads in [1, self.num_threads]:
+            start = time.monotonic()
+            batch = merge_samples(samples, decompress=True, num_threads=num_threads)
+            end = time.monotonic() - start
+            print('Preallocated, per-state compression, {} thread(s): throughput: {} records/s, '
+                  'total time: {} s'.format(num_threads, num_records / end, end))
+            np.testing.assert_array_equal(batch["states"], expected["states"])
+            np.testing.assert_array_equal(batch["actions"]["b"], expected["actions"]["b"])
+
+        codec = TransportCodec("lz4")
+        samples = self.make_samples(codec.compress)
+        for num_threads in [1, self.num_threads]:
+            start = time.monotonic()
+            batch = merge_samples(samples, decompress=True, num_threads=num_threads)
+            end = time.monotonic() - start
+            print('Preallocated, batch lz4 compression, {} thread(s): throughput: {} records/s, '
+                  'total time: {} s'.format(num_threads, num_records / end, end))
+            np.testing.assert_array_equal(batch["states"][-self.sample_size:],
+                                          TransportCodec.decompress(samples[-1].sample_batch["states"]))
+
+        samples = self.make_samples(lambda states: states)
+        start = time.monotonic()
+        expected = concatenate_samples(samples)
+        end = time.monotonic() - start
+        print('Concatenate, uncompressed: throughput: {} records/s, total time: {} s'.format(num_records / end, end))
+        start = time.monotonic()
+        batch = merge_samples(samples)
+        end = time.monotonic() - start
+        print('Preallocated, uncompressed: throughput: {} records/s, total time: {} s'.format(num_records / end, end))
+        np.testing.assert_array_equal(batch["states"], expected["states"])
@@ -0,0 +1,68 @@
+# Copyright 2018/2019 The RLgraph authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+import unittest
+
+import numpy as np
+from six.moves import xrange as range_
+
+from rlgraph.execution.ray.ray_util import ray_compress, ray_decompress, TransportCodec
+from rlgraph.spaces import IntBox
+
+
+class TestTransportCodecs(unittest.TestCase):
+    """
+    Compares round-trip throughput of per-state compression and batch transport codecs.
+    """
+    # Atari-like frame stacks.
+    state_space = IntBox(low=0, high=255, shape=(84, 84, 4), dtype="uint8")
+    batch_size = 256
+    num_batches = 20
+
+    def test_round_trip_throughput(self):
+        batches = [self.state_space.sample(size=self.batch_size) for _ in range_(self.num_batches)]
+        num_states = self.batch_size * self.num_batches
+        print('#### Testing transport round-trip throughput ####')
+
+        start = time.monotonic()
+        for batch in batches:
+            compressed = [ray_compress(state) for state in batch]
+            np.asarray([ray_decompress(state) for state in compressed])
+        end = time.monotonic() - start
+        print('Per-state ray_compress: throughput: {} states/s, total time: {} s'.format(num_states / end, end))
+
+        out = np.empty(shape=(self.batch_size,) + self.state_space.shape, dtype=np.uint8)
+        for codec_name in TransportCodec.CODECS:
+            try:
+                codec = TransportCodec(codec_name)
+            except Exception as e:
+                print('Skipping codec {}: {}'.format(codec_name, e))
+                continue
+            compressed_bytes = 0
+            start = time.monotonic()
+            for batch in batches:
+                compressed = codec.compress(batch)
+                compressed_bytes += compressed.nbytes if codec_name == "none" else len(compressed.data)
+                TransportCodec.decompress(compressed, out=out)
+            end = time.monotonic() - start
+            print('Batch codec {}: throughput: {} states/s, compression ratio: {}, total time: {} s'.format(
+                codec_name, num_states / end, sum(batch.nbytes for batch in batches) / compressed_bytes, end
+            ))
+            np.testing.assert_array_equal(out, batches[-1])
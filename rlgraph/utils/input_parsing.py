@@ -130,6 +130,13 @@ def parse_execution_spec(execution_spec):
             distributed_spec=None,
             # Using a monitored session enabling summaries and hooks per default.
             disable_monitoring=False,
+            # Cache a compiled session callable per `execute` call signature.
+            cache_execution_callables=True,
+            # Directory to persist build schedules in, so later builds of the same graph need fewer build iterations
+            # (None: off). Static graphs (tf) only.
+            build_cache_dir=None,
+            # Directory to write build profiles (per Component/API-method/graph_fn) to (None: no profiling).
+            build_profile_dir=None,
             # Gpu settings.
             gpu_spec=dict(
                 # Are GPUs allowed to be used if they are detected?
@@ -194,6 +201,13 @@ def parse_execution_spec(execution_spec):
             distributed_spec=None,
             # Using a monitored session enabling summaries and hooks per default.
             disable_monitoring=False,
+            # Cache a compiled session callable per `execute` call signature.
+            cache_execution_callables=True,
+            # Directory to persist build schedules in, so later builds of the same graph need fewer build iterations
+            # (None: off). Static graphs (tf) only.
+            build_cache_dir=None,
+            # Directory to write build profiles (per Component/API-method/graph_fn) to (None: no profiling).
+            build_profile_dir=None,
             # Gpu settings.
             gpu_spec=dict(
                 # Are GPUs allowed to be used if they are detected?
@@ -282,7 +296,10 @@ def parse_update_spec(update_spec):
         update_steps=1,
         # The batch size with which to update (e.g. when pulling records from a memory).
         batch_size=64,
-        sync_interval=128
+        sync_interval=128,
+        # The number of memory batches to sample ahead on a background thread (0=sample on update).
+        # Only supported in define-by-run mode.
+        prefetch_batches=0
     )
     update_spec = default_dict(update_spec, default_spec)
 
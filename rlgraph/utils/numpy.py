@@ -130,6 +130,61 @@ def dense_layer(x, weights, biases=None):
     return np.matmul(x, weights) + (0.0 if biases is None else biases)
 
 
+def n_step_discount(rewards, terminals, n_step, discount, episode_ends=None):
+    """
+    Computes n-step discounted rewards and n-step next-state offsets for whole trajectories.
+
+    The n-step window starting at time step t stops early at the first episode end at t' >= t (no rewards
+    beyond it are added) and at the end of the trajectory.
+
+    Args:
+        rewards (np.ndarray): Rewards of shape [num_envs, T] or [T].
+        terminals (np.ndarray): Terminal flags of the same shape as `rewards`.
+        n_step (int): The number of steps to look ahead (1 = no adjustment).
+        discount (float): The discount factor.
+        episode_ends (Optional[np.ndarray]): Flags marking the time steps at which n-step windows stop.
+            Defaults to `terminals`. Can differ from `terminals` e.g. for episodes cut off by a time limit.
+
+    Returns:
+        tuple:
+            - np.ndarray: The n-step discounted rewards.
+            - np.ndarray: Per time step, the (int) time step of the n-step next state (in the same trajectory).
+            - np.ndarray: The n-step terminal flags, True if the window reached an episode end after t.
+            - np.ndarray: Whether the window is complete, i.e. spans n steps or reaches an episode end. Incomplete
+                windows at the end of a trajectory need subsequent time steps to be computed.
+    """
+    rewards = np.asarray(rewards)
+    if not np.issubdtype(rewards.dtype, np.floating):
+        rewards = rewards.astype(np.float64)
+    terminals = np.asarray(terminals, dtype=np.bool_)
+    episode_ends = terminals if episode_ends is None else np.asarray(episode_ends, dtype=np.bool_)
+    squeeze = rewards.ndim == 1
+    if squeeze:
+        rewards, terminals, episode_ends = rewards[None], terminals[None], episode_ends[None]
+    num_steps = rewards.shape[1]
+
+    time_steps = np.arange(num_steps)
+    # The first episode end at or after each time step (num_steps if none).
+    end_positions = np.where(episode_ends, time_steps, num_steps)
+    next_ends = np.minimum.accumulate(end_positions[:, ::-1], axis=1)[:, ::-1]
+    # Number of steps actually looked ahead.
+    look_ahead = np.minimum(np.minimum(next_ends, num_steps - 1) - time_steps, n_step - 1)
+
+    n_step_rewards = rewards.copy()
+    padded_rewards = np.concatenate([rewards, np.zeros((rewards.shape[0], n_step - 1), rewards.dtype)], axis=1)
+    for j in range(1, n_step):
+        n_step_rewards += np.where(look_ahead >= j, discount ** j * padded_rewards[:, j:j + num_steps], 0.0)
+
+    next_indices = time_steps + look_ahead
+    reached_end = (look_ahead > 0) & np.take_along_axis(episode_ends, next_indices, axis=1)
+    n_step_terminals = terminals | reached_end
+    complete = (look_ahead == n_step - 1) | (next_ends - time_steps <= look_ahead)
+
+    if squeeze:
+        return n_step_rewards[0], next_indices[0], n_step_terminals[0], complete[0]
+    return n_step_rewards, next_indices, n_step_terminals, complete
+
+
 def lstm_layer(x, weights, biases=None, initial_internal_states=None, time_major=False, forget_bias=1.0):
     """
     Calculates the outputs of an LSTM layer given weights/biases, internal_states, an input.
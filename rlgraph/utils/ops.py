@@ -41,6 +41,19 @@ class TraceContext(object):
     ACTIVE_CALL_CONTEXT = False
     CONTEXT_START = None
 
+    # Stack of currently active API-method ("api_method") and graph_fn ("graph_fn") calls, innermost call last.
+    # Maintained by the API-method wrapper and the GraphBuilder.
+    CALL_CONTEXT_STACK = []
+
+    @staticmethod
+    def in_graph_fn_context():
+        """
+        Returns:
+            bool: True if the innermost active call is a graph_fn. API-methods and graph_fns called from within a
+                graph_fn return ops, all other calls return op-records.
+        """
+        return len(TraceContext.CALL_CONTEXT_STACK) > 0 and TraceContext.CALL_CONTEXT_STACK[-1] == "graph_fn"
+
 
 class DataOp(object):
     """